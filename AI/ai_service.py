@@ -1,20 +1,135 @@
-import google.generativeai as genai
-import json
+import asyncio
 import os
+import threading
+import time
+import anyio
 from dotenv import load_dotenv
+from fhir_parser import parse_bundle_file
+from patient_index import open_compiled_index
+from llm_limiter import LLMLimiter, AIBusyError, AITimeoutError
+from llm_backend import create_backend
+from result_cache import ResultCache, make_key
+from singleflight import SingleFlight, AsyncSingleFlight
+from prompt_builder import PromptBuilder, estimate_tokens
+from response_parser import ResponseParser, ResponseParseError, StreamExtractor, RESPONSE_SCHEMA, BATCH_RESPONSE_SCHEMA
+from patient_record import CompactPatientDB
+from graph_service import GraphService, graph_hash
+from sharding import ShardSpec
+from ingest import Ingestor, IngestWatcher, PatientOverlay, VitalHistory, write_ndjson
+import metrics
+from metrics import REGISTRY, LLM_CALLS, observe_stage, span
 
 # --- KONFIGURASI SIMPEL (Relative Path) ---
 # Syarat: Terminal harus dijalankan di dalam folder AI
 load_dotenv() # Otomatis cari .env di folder yang sama
 JSON_FILENAME = os.getenv("FILENAME")
 API_KEY = os.getenv("GOOGLE_API_KEY")
+# Streaming ingest (satu kali lewat, memori tidak sebesar file). Set 0 untuk mode json.load lama
+STREAM_INGEST = os.getenv("STREAM_INGEST", "1") != "0"
+# Pakai index terkompilasi (python patient_index.py build <file>) kalau ada & masih valid
+USE_COMPILED_INDEX = os.getenv("COMPILED_INDEX", "1") != "0"
+# Simpan pasien sebagai record ringkas (__slots__ + vocabulary) untuk hemat RAM
+COMPACT_RECORDS = os.getenv("COMPACT_RECORDS", "1") != "0"
+# Mode shard: proses ini hanya memuat pasien dengan crc32(NIK) % SHARD_COUNT == SHARD_INDEX.
+# Request diarahkan ke shard pemiliknya oleh router.py
+SHARD = ShardSpec(int(os.getenv("SHARD_INDEX", "0")), int(os.getenv("SHARD_COUNT", "1")))
 
-if API_KEY:
-    genai.configure(api_key=API_KEY)
-    model = genai.GenerativeModel('gemini-2.5-flash') 
-else:
-    model = None
-    print("⚠️ PERINGATAN: API Key tidak ditemukan.")
+# Ingest inkremental (POST /ingest, INGEST=0 untuk mematikan). INGEST_DIR = folder delta (*.ndjson / *.json)
+# yang dipantau tiap INGEST_POLL detik dan diterapkan ulang saat restart
+INGEST_ENABLED = os.getenv("INGEST", "1") != "0"
+INGEST_DIR = os.getenv("INGEST_DIR")
+INGEST_POLL = float(os.getenv("INGEST_POLL", "5"))
+
+# Knowledge graph di server: cache layout per hash data pasien, render gambar
+# di process pool. GRAPH_PRERENDER=png|svg -> gambar langsung dirender di belakang
+GRAPH_CACHE_SIZE = int(os.getenv("GRAPH_CACHE_SIZE", "1024"))
+GRAPH_RENDER_WORKERS = int(os.getenv("GRAPH_RENDER_WORKERS", "2"))
+GRAPH_PRERENDER = os.getenv("GRAPH_PRERENDER") or None
+
+# Batas panggilan LLM di jalur async (/analyze)
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", "64"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "256"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_RETRY_AFTER = int(os.getenv("LLM_RETRY_AFTER", "5"))
+
+# Cache hasil analisis (0 = mati). RESULT_CACHE_DB = file SQLite agar tahan restart
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB")
+
+# Analisis batch: beberapa pasien dalam satu prompt (hanya yang konteksnya kecil)
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "10"))
+BATCH_MAX_CONTEXT = int(os.getenv("BATCH_MAX_CONTEXT", "2000"))
+BATCH_PARALLEL = int(os.getenv("BATCH_PARALLEL", "8"))
+
+# Konteks prompt: compact (default) | json | legacy (json indent=2 lama).
+# PROMPT_MAX_TOKENS = anggaran token konteks satu pasien (riwayat obat dipangkas)
+PROMPT_FORMAT = os.getenv("PROMPT_FORMAT", "compact")
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "3000"))
+
+# Structured output: minta JSON langsung dari SDK (response_mime_type + schema).
+# PARSE_RETRIES = berapa kali LLM dipanggil ulang kalau jawabannya tetap tidak bisa diparse
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "1") != "0"
+PARSE_RETRIES = int(os.getenv("PARSE_RETRIES", "1"))
+
+# Rule engine: "skip" = kasus jelas (AMAN/BAHAYA) tidak ke LLM,
+# "narrative" = status & skor dari aturan, LLM hanya menulis narasi, "off" = mati
+RULE_ENGINE_MODE = os.getenv("RULE_ENGINE", "skip")
+
+# Provider LLM: gemini | stub (model palsu lokal, LLM_STUB=1 = cara lama).
+# LLM_REQUEST_TIMEOUT = timeout satu request ke provider, LLM_RETRIES/LLM_BACKOFF =
+# retry error sementara (429/5xx). LLM_HEDGE=1 -> request kedua dikirim kalau yang
+# pertama belum selesai setelah LLM_HEDGE_DELAY detik (kosong = p95 latency terakhir)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER") or ("stub" if os.getenv("LLM_STUB") == "1" else "gemini")
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "30"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "0.5"))
+LLM_TRANSPORT = os.getenv("LLM_TRANSPORT") or None
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY")) if os.getenv("LLM_HEDGE_DELAY") else None
+
+# Metrik /metrics (METRICS=0 = span & middleware tidak mencatat apa pun).
+# PROFILER=1 mengaktifkan /metrics/profile (sampling profiler, untuk debugging)
+METRICS_ENABLED = os.getenv("METRICS", "1") != "0"
+PROFILER_ENABLED = os.getenv("PROFILER", "0") == "1"
+metrics.set_enabled(METRICS_ENABLED)
+
+MODEL_NAME = 'gemini-2.5-flash'
+
+def stub_options():
+    # Model palsu untuk load test / benchmark tanpa Gemini
+    return {
+        "latency": float(os.getenv("LLM_STUB_LATENCY", "1.0")),
+        "latency_per_1k_token": float(os.getenv("LLM_STUB_TOKEN_LATENCY", "0")),
+        "messy_rate": float(os.getenv("LLM_STUB_MESSY", "0")),
+        "failure_rate": float(os.getenv("LLM_STUB_FAILURE_RATE", "0")),
+        "slow_rate": float(os.getenv("LLM_STUB_SLOW_RATE", "0")),
+        "slow_factor": float(os.getenv("LLM_STUB_SLOW_FACTOR", "5")),
+        "seed": int(os.getenv("LLM_STUB_SEED", "0")),
+    }
+
+# Client LLM dibuat saat load (init_backend), bukan saat import: import SDK
+# Gemini sendiri butuh ~1 detik.
+model = None
+
+def init_backend():
+    global model, MODEL_NAME, STRUCTURED_OUTPUT
+    if LLM_PROVIDER == "gemini" and not API_KEY:
+        print("⚠️ PERINGATAN: API Key tidak ditemukan.")
+        return None
+    backend = create_backend(LLM_PROVIDER, MODEL_NAME, API_KEY, timeout=LLM_REQUEST_TIMEOUT,
+                             retries=LLM_RETRIES, backoff=LLM_BACKOFF, transport=LLM_TRANSPORT,
+                             hedge=LLM_HEDGE, hedge_delay=LLM_HEDGE_DELAY,
+                             stub_options=stub_options() if LLM_PROVIDER == "stub" else None)
+    if LLM_PROVIDER == "stub":
+        MODEL_NAME = "stub"
+        print("🧪 Memakai model STUB (bukan Gemini).")
+    if STRUCTURED_OUTPUT and not backend.supports_structured_output():
+        # SDK lama belum mengenal response_mime_type -> parsing toleran saja
+        STRUCTURED_OUTPUT = False
+        print("⚠️ SDK google-generativeai belum mendukung structured output, memakai parsing toleran.")
+    model = backend
+    return backend
 
 # --- DATA DARURAT ---
 def create_emergency_data():
@@ -24,7 +139,27 @@ def create_emergency_data():
     }
 
 # --- LOAD DATA ---
+# Riwayat tanda vital bertimestamp (record hanya menyimpan nilai terbaru)
+VITAL_HISTORY = VitalHistory()
+# File data yang terakhir di-load (untuk metrik ukuran data).
+# index: None (parsing biasa) / "terverifikasi" / "memverifikasi" / "basi"
+DATA_FILE = {"path": None, "bytes": 0, "index": None}
+
+def verify_compiled_index(index, path):
+    # mtime sumber berubah tapi sampel isinya cocok: sha256 penuh di thread
+    # latar, tidak menahan startup
+    if index.verify(path):
+        DATA_FILE["index"] = "terverifikasi"
+        print("✅ Index terkompilasi terverifikasi (sha256 penuh cocok).")
+    else:
+        DATA_FILE["index"] = "basi"
+        print(f"❌ Isi {path} berubah tapi ukurannya sama: data dari index terkompilasi BASI. "
+              f"Jalankan 'python patient_index.py build {path}' lalu restart.")
+
 def load_and_parse_data(filename=JSON_FILENAME):
+    global VITAL_HISTORY
+    # Hasil: (database, uuid_to_nik). Dari index terkompilasi uuid_to_nik berupa
+    # PatientRefs yang membaca tabel referensi index; kosong untuk data darurat.
     print(f"\n📂 Mencari file: {filename}")
     print(f"📍 Di folder: {os.getcwd()}") # Cek kita lagi ada di folder mana
     
@@ -45,106 +180,720 @@ def load_and_parse_data(filename=JSON_FILENAME):
     
     if not file_found:
         print(f"❌ FILE TIDAK DITEMUKAN di semua lokasi yang dicoba!")
-        return create_emergency_data()
+        return create_emergency_data(), {}
+    DATA_FILE.update(path=file_found, bytes=os.path.getsize(file_found))
+
+    # Index terkompilasi berisi semua pasien -> tidak dipakai di mode shard
+    if USE_COMPILED_INDEX and not SHARD.enabled:
+        index = open_compiled_index(file_found)
+        if index is not None:
+            print("⚡ Memakai index terkompilasi (mmap), parsing dilewati.")
+            if index.verified:
+                DATA_FILE["index"] = "terverifikasi"
+            else:
+                DATA_FILE["index"] = "memverifikasi"
+                threading.Thread(target=verify_compiled_index, args=(index, file_found),
+                                 name="index-verify", daemon=True).start()
+            # Riwayat tanda vital & referensi UUID pasien ikut dari index
+            VITAL_HISTORY = index.history()
+            return index, index.refs()
+        print(f"💡 Tip: jalankan 'python patient_index.py build {file_found}' agar startup instan.")
 
+    mode = "streaming" if STREAM_INGEST else "json.load"
+    if SHARD.enabled:
+        mode += f", shard {SHARD}"
+    print(f"✅ Sedang parsing ({mode})...")
     try:
-        with open(file_found, 'r') as f:
-            bundle = json.load(f)
-        print("✅ Sedang parsing...")
+        into = CompactPatientDB() if COMPACT_RECORDS else None
+        database, uuid_to_nik = parse_bundle_file(file_found, stream=STREAM_INGEST, into=into,
+                                                  on_vital=VITAL_HISTORY.add, keep=SHARD.keep(),
+                                                  progress=lambda n: set_load_stage("parsing", resource=n))
     except Exception as e:
         print(f"❌ ERROR BACA JSON: {e}")
-        return create_emergency_data()
+        return create_emergency_data(), {}
+
+    return database, uuid_to_nik
+
+# Diisi load_data() (lihat SIKLUS HIDUP di bawah), bukan saat import.
+# Overlay: pasien baru/berubah dari ingest inkremental ditumpuk di atas data awal
+DATABASE_CACHE = None
+# Index pencarian sidebar (NIK prefix + nama), ikut diperbarui saat ingest
+SEARCH_INDEX = None
+DATA_LOAD_SECONDS = 0.0
+SEARCH_INDEX_SECONDS = 0.0
+
+# --- AI LOGIC ---
+# Instruksi statis di depan, data pasien di akhir: awalan prompt selalu sama
+# sehingga prompt caching di sisi provider bisa dipakai.
+PROMPT_TEMPLATE = """Bertindaklah sebagai Asisten Medis. Analisis data pasien di bagian akhir.
+
+Output JSON Murni:
+{{
+  "status": "AMAN" | "BAHAYA" | "PERINGATAN",
+  "skor_risiko": 0-100,
+  "ringkasan_pasien": "Ringkasan...",
+  "analisis_obat": "Analisis...",
+  "rekomendasi": "Saran..."
+}}
+
+Data pasien:
+{context}
+"""
+
+RESULT_CACHE = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_DB)
+
+PROMPT_BUILDER = PromptBuilder(PROMPT_FORMAT, PROMPT_MAX_TOKENS)
+
+def build_prompt(context):
+    return PROMPT_TEMPLATE.format(context=context)
+
+RESPONSE_PARSER = ResponseParser()
+RETRY_NOTE = "\n\nPENTING: jawaban sebelumnya bukan JSON yang valid. Balas HANYA dengan JSON sesuai format di atas."
 
-    database = {}
-    uuid_to_nik = {}
-    entries = bundle.get('entry', [])
+def generation_kwargs(batch=False, stream=False):
+    if not STRUCTURED_OUTPUT:
+        return {}
+    if stream:
+        # Tanpa schema: Gemini mengurutkan properti schema menurut abjad, padahal
+        # saat streaming "status" harus keluar lebih dulu (urutan di prompt)
+        return {"generation_config": {"response_mime_type": "application/json"}}
+    schema = BATCH_RESPONSE_SCHEMA if batch else RESPONSE_SCHEMA
+    return {"generation_config": {"response_mime_type": "application/json", "response_schema": schema}}
+
+def attempt_prompt(prompt, attempt):
+    # Percobaan ulang (hanya karena jawaban tidak bisa diparse) diberi pengingat format
+    if attempt == 0:
+        return prompt
+    RESPONSE_PARSER.retried()
+    return prompt + RETRY_NOTE
+
+def response_text(response):
+    # .text melempar ValueError kalau jawaban diblokir / kosong
+    try:
+        return response.text
+    except ValueError:
+        return None
+
+# Dibuat di load_data(): rule engine & struktur populasi memakai numpy, yang
+# import-nya (~90 ms) tidak perlu ditunggu sebelum port terbuka
+RULE_ENGINE = None
+RULE_STATS = {"diputus_aturan": 0, "ke_llm": 0}
+
+def rule_verdict(data):
+    # Hasil: (hasil_langsung, verdict_untuk_narasi)
+    if RULE_ENGINE_MODE == "skip":
+        verdict = RULE_ENGINE.verdict(data)
+        if verdict is not None:
+            RULE_STATS["diputus_aturan"] += 1
+            return verdict, None
+    elif RULE_ENGINE_MODE == "narrative":
+        verdict, jelas = RULE_ENGINE.assess(data)
+        if jelas:
+            return None, verdict
+    return None, None
+
+# Hasil error membawa "kode" = status HTTP yang dipakai endpoint:
+# 404 pasien tidak ada, 502 LLM gagal / tidak bisa dipakai, 504 LLM timeout
+def error_result(message, kode=502):
+    return {"error": message, "kode": kode}
+
+def timeout_message():
+    return f"AI Timeout: tidak ada respons dalam {LLM_TIMEOUT:g} detik"
+
+def prepare_analysis(nik_target):
+    # Hasil: (hasil_langsung, prompt, cache_key, verdict_aturan)
+    # hasil_langsung terisi kalau error, diputus rule engine, atau cache hit
+    # -> tidak perlu panggil LLM
+    with span("lookup"):
+        data = DATABASE_CACHE.get(nik_target)
+    if not data:
+        return error_result(f"Pasien NIK {nik_target} tidak ditemukan. Pastikan data sudah ter-load.", 404), None, None, None
+
+    with span("rules"):
+        result, verdict = rule_verdict(data)
+    if result is not None:
+        return result, None, None, None
+
+    if not model:
+        return error_result("Server AI Error: API Key Missing"), None, None, None
+
+    with span("prompt"):
+        context, info = PROMPT_BUILDER.context(data)
+        key = make_key(context, PROMPT_TEMPLATE, MODEL_NAME)
+    with span("cache"):
+        cached = RESULT_CACHE.get(key)
+    if cached is not None:
+        return dict(cached), None, key, verdict
+
+    RULE_STATS["ke_llm"] += 1
+    with span("prompt"):
+        prompt = build_prompt(context)
+        PROMPT_BUILDER.record(data, info, estimate_tokens(prompt))
+    return None, prompt, key, verdict
+
+def finish_analysis(result, key, verdict=None, nik=None):
+    # result: hasil LLM yang sudah lolos validasi skema
+    # Mode narrative: status & skor mengikuti aturan, teks dari LLM
+    if verdict is not None and isinstance(result, dict):
+        result.update(status=verdict["status"], skor_risiko=verdict["skor_risiko"],
+                      aturan=verdict["aturan"], sumber="rule_engine+llm")
+    # Hanya hasil sukses yang di-cache
+    if isinstance(result, dict) and "error" not in result:
+        RESULT_CACHE.set(key, result, nik=nik)
+    return result
+
+async def off_loop(fn, *args):
+    # Tier disk cache (SQLite) aktif -> lookup/simpan hasil bisa menunggu I/O
+    # disk, jadi dijalankan di thread supaya event loop tidak ikut tertahan.
+    # Cache memori saja -> cukup dipanggil langsung (tanpa biaya pindah thread).
+    if RESULT_CACHE.disk:
+        return await anyio.to_thread.run_sync(fn, *args)
+    return fn(*args)
+
+# Request bersamaan untuk konteks pasien yang sama (key cache sama)
+# hanya memicu satu panggilan LLM, sisanya menunggu hasilnya.
+SINGLE_FLIGHT = SingleFlight()
+ASYNC_SINGLE_FLIGHT = AsyncSingleFlight()
+
+def analyze_patient_risk(nik_target):
+    result, prompt, key, verdict = prepare_analysis(nik_target)
+    if result is not None:
+        return result
     
-    # 1. Parsing Pasien
-    for entry in entries:
-        res = entry['resource']
-        if res['resourceType'] == 'Patient':
-            full_id = "urn:uuid:" + res['id']
-            nik = res['identifier'][0]['value'] if 'identifier' in res else "UNKNOWN"
-            nama = res['name'][0]['text']
-            uuid_to_nik[full_id] = nik
-            
-            database[nik] = {
-                "profil": {"nama": nama, "nik": nik},
-                "tanda_vital": {"tb": "-", "bb": "-", "tensi": "-"},
-                "medis": []
-            }
-
-    # 2. Parsing Observation
-    for entry in entries:
-        res = entry['resource']
-        if res['resourceType'] == 'Observation':
-            subject_ref = res['subject']['reference']
-            if subject_ref in uuid_to_nik:
-                nik_pemilik = uuid_to_nik[subject_ref]
+    def call_llm():
+        for attempt in range(PARSE_RETRIES + 1):
+            try:
+                with span("llm"):
+                    response = model.generate_content(attempt_prompt(prompt, attempt), **generation_kwargs())
+            except Exception as e:
+                LLM_CALLS.inc(mode="sync", outcome="error")
+                return error_result(f"AI Error: {str(e)}")
+            LLM_CALLS.inc(mode="sync", outcome="ok")
+            try:
+                with span("parse"):
+                    result = RESPONSE_PARSER.parse(response_text(response))
+            except ResponseParseError as e:
+                error = e
+                continue
+            return finish_analysis(result, key, verdict, nik_target)
+        RESPONSE_PARSER.give_up()
+        return error_result(f"AI Error: {error}")
+
+    return dict(SINGLE_FLIGHT.do(key, call_llm))
+
+# --- AI LOGIC (ASYNC) ---
+# Versi non-blocking untuk FastAPI: tidak memakan thread selama menunggu LLM.
+# AIBusyError (antrian penuh) dan AITimeoutError dilempar ke pemanggil.
+LLM_LIMITER = LLMLimiter(LLM_MAX_INFLIGHT, LLM_MAX_QUEUE, LLM_RETRY_AFTER)
+
+async def analyze_patient_risk_async(nik_target):
+    result, prompt, key, verdict = await off_loop(prepare_analysis, nik_target)
+    if result is not None:
+        return result
+    return await complete_analysis_async(nik_target, prompt, key, verdict)
+
+async def complete_analysis_async(nik_target, prompt, key, verdict, retry=False):
+    # Panggilan LLM + parse (dengan retry) untuk hasil prepare_analysis.
+    # retry=True: jawaban sebelumnya (stream) tidak bisa diparse, jadi
+    # percobaan pertama pun sudah diberi pengingat format.
+    async def call_llm():
+        for attempt in range(retry, PARSE_RETRIES + 1 + retry):
+            async with LLM_LIMITER.slot():
                 try:
-                    code = res['code']['coding'][0]['code']
-                    if code == "29463-7": # BB
-                        val = res['valueQuantity']['value']
-                        unit = res['valueQuantity']['unit']
-                        database[nik_pemilik]['tanda_vital']['bb'] = f"{val} {unit}"
-                    elif code == "8302-2": # TB
-                        val = res['valueQuantity']['value']
-                        unit = res['valueQuantity']['unit']
-                        database[nik_pemilik]['tanda_vital']['tb'] = f"{val} {unit}"
-                    elif code == "85354-9": # Tensi
-                        sys = res['component'][0]['valueQuantity']['value']
-                        dia = res['component'][1]['valueQuantity']['value']
-                        database[nik_pemilik]['tanda_vital']['tensi'] = f"{sys}/{dia} mmHg"
-                except: continue
-
-    # 3. Parsing Obat
-    for entry in entries:
-        res = entry['resource']
-        if res['resourceType'] == 'MedicationRequest':
-            subject_ref = res['subject']['reference']
-            if subject_ref in uuid_to_nik:
-                nik_pemilik = uuid_to_nik[subject_ref]
+                    with span("llm"):
+                        response = await asyncio.wait_for(
+                            model.generate_content_async(attempt_prompt(prompt, attempt), **generation_kwargs()),
+                            LLM_TIMEOUT)
+                except asyncio.TimeoutError:
+                    LLM_CALLS.inc(mode="async", outcome="timeout")
+                    raise AITimeoutError(timeout_message())
+                except Exception as e:
+                    LLM_CALLS.inc(mode="async", outcome="error")
+                    return error_result(f"AI Error: {str(e)}")
+            LLM_CALLS.inc(mode="async", outcome="ok")
+            try:
+                with span("parse"):
+                    result = RESPONSE_PARSER.parse(response_text(response))
+            except ResponseParseError as e:
+                error = e
+                continue
+            return await off_loop(finish_analysis, result, key, verdict, nik_target)
+        RESPONSE_PARSER.give_up()
+        return error_result(f"AI Error: {error}")
+
+    return dict(await ASYNC_SINGLE_FLIGHT.do(key, call_llm))
+
+# --- AI LOGIC (STREAMING) ---
+# Field hasil dikirim begitu lengkap (status -> ringkasan -> rekomendasi),
+# tidak menunggu seluruh JSON selesai. Event: ("field", {field, value}),
+# lalu ("done", hasil_lengkap) atau ("error", {error, kode}).
+STREAM_STATS = {"request": 0, "field_pertama_ms": 0.0, "selesai_ms": 0.0}
+
+async def analyze_patient_risk_stream(nik_target):
+    start = time.perf_counter()
+    result, prompt, key, verdict = await off_loop(prepare_analysis, nik_target)
+    if result is not None:
+        # Error / rule engine / cache hit: langsung lengkap
+        if "error" in result:
+            yield "error", result
+            return
+        for field, value in result.items():
+            yield "field", {"field": field, "value": value}
+        yield "done", result
+        return
+
+    # Slot diambil sebelum event pertama: antrian penuh -> AIBusyError
+    # masih bisa dijawab 503 oleh endpoint
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LLM_TIMEOUT
+    extractor = StreamExtractor()
+    first = None
+    async with LLM_LIMITER.slot():
+        if verdict is not None:
+            # Mode narrative: status & skor dari aturan, dikirim duluan
+            for field in ("status", "skor_risiko"):
+                extractor.emitted[field] = verdict[field]
+                yield "field", {"field": field, "value": verdict[field]}
+        llm_start = time.perf_counter()
+        try:
+            stream = await asyncio.wait_for(
+                model.generate_content_async(prompt, stream=True, **generation_kwargs(stream=True)), LLM_TIMEOUT)
+            chunks = stream.__aiter__()
+            while True:
                 try:
-                    nama_obat = res['medicationCodeableConcept']['coding'][0].get('display', 'Obat')
-                    diagnosa = res.get('reasonCode', [{}])[0].get('text', '-')
-                    database[nik_pemilik]['medis'].append({"obat": nama_obat, "diagnosa": diagnosa})
-                except: pass
-                
-    return database
-
-# --- EKSEKUSI LOAD ---
-DATABASE_CACHE = load_and_parse_data()
-print(f"🎉 SUKSES! Total Pasien Terload: {len(DATABASE_CACHE)}")
-print("--------------------------------------------------\n")
+                    chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    break
+                for field, value in extractor.feed(response_text(chunk)):
+                    if first is None:
+                        first = time.perf_counter() - start
+                    yield "field", {"field": field, "value": value}
+        except asyncio.TimeoutError:
+            LLM_CALLS.inc(mode="stream", outcome="timeout")
+            yield "error", error_result(timeout_message(), 504)
+            return
+        except Exception as e:
+            LLM_CALLS.inc(mode="stream", outcome="error")
+            yield "error", error_result(f"AI Error: {str(e)}")
+            return
+        # Span llm stream = sampai potongan terakhir diterima
+        observe_stage("llm", time.perf_counter() - llm_start)
+        LLM_CALLS.inc(mode="stream", outcome="ok")
 
-# --- AI LOGIC ---
-def analyze_patient_risk(nik_target):
-    if not model:
-        return {"error": "Server AI Error: API Key Missing"}
+    try:
+        with span("parse"):
+            parsed = RESPONSE_PARSER.parse(extractor.text)
+    except ResponseParseError:
+        # Jawaban stream rusak -> ulangi panggilan LLM biasa (dengan retry) untuk
+        # prompt yang sama, hasilnya dikirim utuh. Tanpa prepare_analysis lagi:
+        # statistik prompt & lookup cache sudah dihitung sekali di atas.
+        try:
+            result = await complete_analysis_async(nik_target, prompt, key, verdict, retry=True)
+        except AITimeoutError as e:
+            result = error_result(str(e), 504)
+        except AIBusyError as e:
+            result = error_result(str(e), 503)
+        if "error" in result:
+            yield "error", result
+            return
+    else:
+        result = await off_loop(finish_analysis, parsed, key, verdict, nik_target)
+    for field, value in extractor.rest(result):
+        if first is None:
+            first = time.perf_counter() - start
+        yield "field", {"field": field, "value": value}
+    STREAM_STATS["request"] += 1
+    STREAM_STATS["field_pertama_ms"] += (first or 0.0) * 1000
+    STREAM_STATS["selesai_ms"] += (time.perf_counter() - start) * 1000
+    yield "done", result
+
+def stream_stats():
+    n = STREAM_STATS["request"]
+    return {
+        "request": n,
+        "field_pertama_ms_rata2": round(STREAM_STATS["field_pertama_ms"] / n, 1) if n else 0.0,
+        "selesai_ms_rata2": round(STREAM_STATS["selesai_ms"] / n, 1) if n else 0.0
+    }
+
+# --- ANALISIS BATCH ---
+BATCH_PROMPT_TEMPLATE = """Bertindaklah sebagai Asisten Medis. Analisis SETIAP pasien di bagian akhir secara terpisah.
+
+Output JSON Array Murni, satu objek per pasien (urutan bebas, "nik" wajib):
+[
+  {{
+    "nik": "NIK pasien",
+    "status": "AMAN" | "BAHAYA" | "PERINGATAN",
+    "skor_risiko": 0-100,
+    "ringkasan_pasien": "Ringkasan...",
+    "analisis_obat": "Analisis...",
+    "rekomendasi": "Saran..."
+  }}
+]
+
+Data pasien:
+{contexts}
+"""
+
+def pack_batches(items, batch_size=BATCH_SIZE, max_context=BATCH_MAX_CONTEXT):
+    # items: [(nik, context)]. Pasien dengan konteks besar dianalisis sendiri
+    # supaya satu prompt tidak kepanjangan / hasilnya tidak tercampur.
+    batches, current = [], []
+    for nik, context in items:
+        if context is None or len(context) > max_context:
+            batches.append([(nik, context)])
+            continue
+        current.append((nik, context))
+        if len(current) >= batch_size:
+            batches.append(current)
+            current = []
+    if current:
+        batches.append(current)
+    return batches
+
+def cached_batch_result(context):
+    # Hasil tersimpan dari analisis tunggal maupun batch untuk konteks yang sama
+    cached = RESULT_CACHE.get(make_key(context, PROMPT_TEMPLATE, MODEL_NAME))
+    if cached is None:
+        cached = RESULT_CACHE.get(make_key(context, BATCH_PROMPT_TEMPLATE, MODEL_NAME))
+    return cached
+
+async def analyze_batch_async(nik_list, parallel=BATCH_PARALLEL, on_result=None, batch_size=BATCH_SIZE):
+    # Hasil: dict nik -> hasil. on_result(nik, hasil) dipanggil begitu satu
+    # batch selesai (dipakai bulk runner untuk menulis hasil secara streaming).
+    results = {}
+
+    def done(nik, result):
+        results[nik] = result
+        if on_result:
+            on_result(nik, result)
+
+    todo = []
+    prompt_info = {}
+    for nik in dict.fromkeys(nik_list):
+        data = DATABASE_CACHE.get(nik)
+        if not data:
+            done(nik, {"error": f"Pasien NIK {nik} tidak ditemukan. Pastikan data sudah ter-load."})
+            continue
+        # Kasus jelas (mode skip) langsung dari rule engine; mode narrative
+        # dianalisis tunggal supaya status/skor tetap mengikuti aturan
+        result, verdict = rule_verdict(data)
+        if result is not None:
+            done(nik, result)
+            continue
+        if verdict is not None:
+            todo.append((nik, None))
+            continue
+        if not model:
+            done(nik, {"error": "Server AI Error: API Key Missing"})
+            continue
+        context, info = PROMPT_BUILDER.context(data)
+        cached = await off_loop(cached_batch_result, context)
+        if cached is not None:
+            done(nik, dict(cached))
+        else:
+            prompt_info[nik] = (data, info)
+            todo.append((nik, context))
+
+    sem = asyncio.Semaphore(parallel)
+
+    async def analyze_single(nik):
+        # Timeout / antrian penuh untuk satu pasien jadi hasil error per NIK,
+        # bukan menggagalkan seluruh batch
+        try:
+            done(nik, await analyze_patient_risk_async(nik))
+        except Exception as e:
+            done(nik, {"error": f"AI Error: {str(e)}"})
+
+    async def run_batch(batch):
+        async with sem:
+            if len(batch) == 1:
+                await analyze_single(batch[0][0])
+                return
+            contexts = "\n\n".join(context for _, context in batch)
+            prompt = BATCH_PROMPT_TEMPLATE.format(contexts=contexts)
+            RULE_STATS["ke_llm"] += len(batch)
+            for nik, _ in batch:
+                PROMPT_BUILDER.record(*prompt_info[nik])
+            by_nik = {}
+            response = None
+            try:
+                async with LLM_LIMITER.slot():
+                    with span("llm_batch"):
+                        response = await asyncio.wait_for(
+                            model.generate_content_async(prompt, **generation_kwargs(batch=True)), LLM_TIMEOUT)
+                LLM_CALLS.inc(mode="batch", outcome="ok")
+                # Batch tidak di-retry: pasien yang gagal dianalisis tunggal (dengan retry)
+                with span("parse"):
+                    by_nik = RESPONSE_PARSER.parse_batch(response_text(response))
+            except Exception as e:
+                if response is None:
+                    LLM_CALLS.inc(mode="batch", outcome="error")
+                print(f"⚠️ Batch gagal ({e}), dianalisis satu per satu.")
+
+            leftover = []
+            for nik, context in batch:
+                result = by_nik.get(nik)
+                if result is None:
+                    leftover.append(nik)
+                    continue
+                result = {k: v for k, v in result.items() if k != "nik"}
+                await off_loop(RESULT_CACHE.set, make_key(context, BATCH_PROMPT_TEMPLATE, MODEL_NAME), result, nik)
+                done(nik, result)
+            # Pasien yang hilang dari jawaban batch -> analisis tunggal
+            for nik in leftover:
+                await analyze_single(nik)
+
+    await asyncio.gather(*(run_batch(b) for b in pack_batches(todo, batch_size)))
+    return results
+
+# --- DATA POPULASI (KOLOMNAR) ---
+# Dibangun saat query populasi pertama, bukan saat startup
+VITAL_STORE = None
+_vital_store_lock = threading.Lock()
+
+def get_vital_store():
+    global VITAL_STORE
+    if VITAL_STORE is None:
+        with _vital_store_lock:
+            if VITAL_STORE is None:
+                from vital_store import VitalStore
+                VITAL_STORE = VitalStore.build(DATABASE_CACHE, RULE_ENGINE)
+                print(f"📊 Vital store kolomnar siap: {len(VITAL_STORE)} pasien")
+    return VITAL_STORE
+
+# --- GRAPH POPULASI (CSR) ---
+# Juga dibangun saat query pertama
+POPULATION_GRAPH = None
+_population_graph_lock = threading.Lock()
+
+def get_population_graph():
+    global POPULATION_GRAPH
+    if POPULATION_GRAPH is None:
+        with _population_graph_lock:
+            if POPULATION_GRAPH is None:
+                from population_graph import PopulationGraph
+                POPULATION_GRAPH = PopulationGraph.build(DATABASE_CACHE)
+                print(f"🕸️ Graph populasi siap: {POPULATION_GRAPH.stats()}")
+    return POPULATION_GRAPH
+
+# --- INGEST INKREMENTAL ---
+def on_patients_changed(changes):
+    # Hanya NIK yang berubah: hapus hasil cache-nya & perbarui baris vital store
+    global VITAL_STORE, POPULATION_GRAPH
+    for nik in changes:
+        RESULT_CACHE.invalidate_nik(nik)
+    SEARCH_INDEX.update(changes)
+    with _vital_store_lock:
+        if VITAL_STORE is not None:
+            VITAL_STORE = VITAL_STORE.upsert(changes, RULE_ENGINE)
+    with _population_graph_lock:
+        # Overlay terlalu besar -> dibangun ulang saat query berikutnya
+        if POPULATION_GRAPH is not None and not POPULATION_GRAPH.update(changes):
+            POPULATION_GRAPH = None
+
+INGESTOR = None
+INGEST_WATCHER = None
+
+def ingest_resources(resources):
+    # resources: list resource FHIR. Kalau INGEST_DIR diisi, delta ikut
+    # ditulis ke sana supaya diterapkan ulang setelah restart.
+    summary = INGESTOR.apply(resources)
+    if INGEST_DIR and summary["resource"] > summary["duplikat"] + summary["usang"]:
+        # Ditandai selesai sebelum rename: watcher tidak menerapkannya lagi
+        write_ndjson(INGEST_DIR, resources,
+                     before_replace=INGEST_WATCHER.mark_done if INGEST_WATCHER is not None else None)
+    return summary
+
+def start_ingest_watcher():
+    global INGEST_WATCHER
+    if INGEST_ENABLED and INGEST_DIR and INGEST_WATCHER is None:
+        os.makedirs(INGEST_DIR, exist_ok=True)
+        INGEST_WATCHER = IngestWatcher(INGEST_DIR, INGESTOR.apply, INGEST_POLL)
+        INGEST_WATCHER.start()
+        print(f"👀 Memantau folder ingest: {INGEST_DIR} (tiap {INGEST_POLL:g} detik)")
+    return INGEST_WATCHER
 
-    data = DATABASE_CACHE.get(nik_target)
+# --- KNOWLEDGE GRAPH ---
+GRAPH_SERVICE = GraphService(GRAPH_CACHE_SIZE, GRAPH_RENDER_WORKERS, GRAPH_PRERENDER)
+
+def get_patient_graph(nik):
+    # Hasil: (hash, graph) atau None kalau pasien tidak ada
+    data = DATABASE_CACHE.get(nik)
     if not data:
-        return {"error": f"Pasien NIK {nik_target} tidak ditemukan. Pastikan data sudah ter-load."}
+        return None
+    with span("graph_layout"):
+        return GRAPH_SERVICE.get(data)
 
-    context = json.dumps(data, indent=2)
-    
-    prompt = f"""
-    Bertindaklah sebagai Asisten Medis. Analisis data pasien:
-    {context}
-    
-    Output JSON Murni:
-    {{
-      "status": "AMAN" | "BAHAYA" | "PERINGATAN",
-      "skor_risiko": 0-100,
-      "ringkasan_pasien": "Ringkasan...",
-      "analisis_obat": "Analisis...",
-      "rekomendasi": "Saran..."
-    }}
-    """
-    
+def data_version(nik):
+    # Hash data pasien (sama dengan ETag graph): dipakai client untuk cache hasil
+    data = DATABASE_CACHE.get(nik)
+    return graph_hash(data) if data else None
+
+def search_patients(query, limit=20):
+    return SEARCH_INDEX.search(query, limit=limit)
+
+def get_vital_history(nik):
+    if nik not in DATABASE_CACHE:
+        return None
+    return {
+        "nik": nik,
+        "tanda_vital": DATABASE_CACHE[nik].get("tanda_vital", {}),
+        "riwayat": VITAL_HISTORY.get(nik)
+    }
+
+def get_stats():
+    sync_sf, async_sf = SINGLE_FLIGHT.stats(), ASYNC_SINGLE_FLIGHT.stats()
+    return {
+        "cache": RESULT_CACHE.stats(),
+        "llm": dict(LLM_LIMITER.stats(), backend=model.stats() if model else None),
+        "singleflight": {k: sync_sf[k] + async_sf[k] for k in sync_sf},
+        "rule_engine": dict(RULE_STATS, mode=RULE_ENGINE_MODE),
+        "prompt": PROMPT_BUILDER.stats(),
+        "respons": dict(RESPONSE_PARSER.stats(), structured_output=STRUCTURED_OUTPUT),
+        "stream": stream_stats(),
+        "graph": GRAPH_SERVICE.stats(),
+        "ingest": dict(INGESTOR.stats, pasien=len(DATABASE_CACHE), riwayat_vital=len(VITAL_HISTORY)),
+        "shard": {"index": SHARD.index, "count": SHARD.count},
+        "data": dict(DATA_FILE)
+    }
+
+# --- METRIK PROMETHEUS (/metrics) ---
+# Angka dari statistik modul lain dibaca saat scrape, jadi tidak ada biaya
+# tambahan di jalur request.
+@REGISTRY.collector
+def service_metrics():
+    def one(name, kind, help_text, value):
+        return name, kind, help_text, {(): value}, ()
+
+    def labeled(name, kind, help_text, label, values):
+        return name, kind, help_text, {(k,): v for k, v in values.items()}, (label,)
+
+    cache, limiter, parser = RESULT_CACHE.stats(), LLM_LIMITER.stats(), RESPONSE_PARSER.stats()
+    graph = GRAPH_SERVICE.stats()
+    families = [
+        one("data_load_seconds", "gauge", "Durasi load data saat startup", round(DATA_LOAD_SECONDS, 3)),
+        one("data_file_bytes", "gauge", "Ukuran file data yang di-load", DATA_FILE["bytes"]),
+        one("ready", "gauge", "1 kalau data sudah selesai di-load", int(is_ready())),
+        one("data_patients", "gauge", "Jumlah pasien di database", len(DATABASE_CACHE) if is_ready() else 0),
+        one("search_index_build_seconds", "gauge", "Durasi build index pencarian", round(SEARCH_INDEX_SECONDS, 3)),
+        labeled("result_cache_requests_total", "counter", "Lookup cache hasil analisis", "result",
+                {"hit": cache["hits"], "disk_hit": cache["disk_hits"], "miss": cache["misses"]}),
+        one("result_cache_items", "gauge", "Item di cache hasil analisis", cache["items"]),
+        one("result_cache_evictions_total", "counter", "Item cache yang dibuang (LRU)", cache["evictions"]),
+        one("llm_inflight", "gauge", "Panggilan LLM yang sedang berjalan", limiter["inflight"]),
+        one("llm_waiting", "gauge", "Panggilan LLM yang antre", limiter["waiting"]),
+        one("llm_rejected_total", "counter", "Request ditolak karena antrian LLM penuh", limiter["rejected"]),
+        labeled("response_parse_total", "counter", "Hasil parsing jawaban LLM", "result",
+                {"valid": parser["langsung_valid"], "repaired": parser["diperbaiki"], "failed": parser["gagal_parse"]}),
+        one("response_parse_retries_total", "counter", "LLM dipanggil ulang karena jawaban rusak", parser["retry"]),
+        one("singleflight_deduplicated_total", "counter", "Request yang menumpang panggilan LLM yang sama",
+            SINGLE_FLIGHT.deduplicated + ASYNC_SINGLE_FLIGHT.deduplicated),
+        labeled("rule_engine_decisions_total", "counter", "Keputusan rule engine", "path",
+                {"rule": RULE_STATS["diputus_aturan"], "llm": RULE_STATS["ke_llm"]}),
+        labeled("graph_cache_requests_total", "counter", "Lookup cache layout graph", "result",
+                {"hit": graph["hits"], "miss": graph["misses"]}),
+        one("graph_renders_total", "counter", "Gambar graph yang dirender", graph["render"]),
+    ]
+    if model is not None:
+        backend = model.stats()
+        families += [
+            one("llm_backend_requests_total", "counter", "Request ke provider LLM", backend["panggilan"]),
+            one("llm_backend_retries_total", "counter", "Retry error sementara ke provider", backend["retry"]),
+            one("llm_backend_errors_total", "counter", "Request provider yang gagal setelah retry", backend["gagal"]),
+        ]
+        if "hedge" in backend:
+            families.append(one("llm_hedged_total", "counter", "Request hedge yang dikirim", backend["hedge"]))
+    return families
+
+def render_metrics():
+    return REGISTRY.render()
+
+# --- SIKLUS HIDUP (LOAD DI BELAKANG) ---
+# Import modul ini murah: client LLM, data pasien, index pencarian, dan ingestor
+# baru dibuat di load_data(). Server memanggil start_loading() dari lifespan
+# (thread latar) sehingga port langsung terbuka; /ready melaporkan progres dan
+# endpoint data dijawab 503 sampai semuanya selesai, jadi tidak ada request
+# yang melihat index setengah jadi. Skrip & benchmark memanggil ensure_loaded().
+_ready = threading.Event()
+_load_lock = threading.Lock()
+_load_thread = None
+LOAD_STATE = {"status": "belum", "tahap": None, "error": None, "detik": 0.0, "resource": 0, "pasien": 0}
+_load_started = None
+
+def set_load_stage(stage, **info):
+    LOAD_STATE.update(info, tahap=stage)
+
+def load_data():
+    global DATABASE_CACHE, SEARCH_INDEX, INGESTOR, RULE_ENGINE, DATA_LOAD_SECONDS, SEARCH_INDEX_SECONDS
+    from rule_engine import RuleEngine
+    from search_index import PatientSearchIndex
+    set_load_stage("backend")
+    init_backend()
+    RULE_ENGINE = RuleEngine()
+
+    set_load_stage("parsing")
+    start = time.perf_counter()
+    database, uuid_to_nik = load_and_parse_data()
+    DATA_LOAD_SECONDS = time.perf_counter() - start
+    cache = PatientOverlay(database)
+    print(f"🎉 SUKSES! Total Pasien Terload: {len(cache)}")
+
+    set_load_stage("index_pencarian", pasien=len(cache))
+    start = time.perf_counter()
+    search_index = PatientSearchIndex.build(cache)
+    SEARCH_INDEX_SECONDS = time.perf_counter() - start
+    print(f"🔎 Index pencarian siap dalam {SEARCH_INDEX_SECONDS:.2f} detik")
+    print("--------------------------------------------------\n")
+
+    set_load_stage("ingest")
+    ingestor = Ingestor(cache, uuid_to_nik if INGEST_ENABLED else None,
+                        VITAL_HISTORY, on_change=on_patients_changed, keep=SHARD.keep())
+    # Dipasang sekaligus di akhir: sebelum _ready diset tidak ada yang membaca
+    DATABASE_CACHE, SEARCH_INDEX, INGESTOR = cache, search_index, ingestor
+
+def _run_load(on_ready=None):
+    global _load_started
+    _load_started = time.perf_counter()
+    LOAD_STATE["status"] = "memuat"
     try:
-        response = model.generate_content(prompt)
-        clean_json = response.text.replace('```json', '').replace('```', '').strip()
-        return json.loads(clean_json)
+        load_data()
+        if on_ready is not None:
+            on_ready()
     except Exception as e:
-        return {"error": f"AI Error: {str(e)}"}
\ No newline at end of file
+        LOAD_STATE.update(status="gagal", error=f"{type(e).__name__}: {e}")
+        print(f"❌ Load data gagal: {LOAD_STATE['error']}")
+        raise
+    finally:
+        LOAD_STATE["detik"] = round(time.perf_counter() - _load_started, 3)
+    LOAD_STATE.update(status="siap", tahap=None)
+    _ready.set()
+    print(f"✅ Siap melayani request ({LOAD_STATE['detik']:.2f} detik setelah start)")
+
+def start_loading(on_ready=None):
+    # Tidak memblokir; on_ready() dipanggil di thread load setelah data siap
+    global _load_thread
+    with _load_lock:
+        if _load_thread is None and not _ready.is_set():
+            _load_thread = threading.Thread(target=_run_load, args=(on_ready,), name="data-load", daemon=True)
+            _load_thread.start()
+    return _load_thread
+
+def ensure_loaded(timeout=None):
+    # Blocking: menunggu load yang sedang berjalan, atau load di thread ini
+    with _load_lock:
+        thread = _load_thread
+        if thread is None and not _ready.is_set():
+            _run_load()
+    if thread is not None:
+        thread.join(timeout)
+    if not _ready.is_set():
+        raise RuntimeError(f"Data belum siap: {LOAD_STATE['error'] or 'timeout'}")
+
+def is_ready():
+    return _ready.is_set()
+
+def load_status():
+    state = dict(LOAD_STATE)
+    if state["status"] == "memuat" and _load_started is not None:
+        state["detik"] = round(time.perf_counter() - _load_started, 3)
+    return state
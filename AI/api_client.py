@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- CLIENT API UNTUK DASHBOARD ---
+# Satu requests.Session (koneksi keep-alive dipakai ulang) untuk semua rerun
+# Streamlit, dengan timeout connect/read supaya backend macet tidak membuat
+# halaman menggantung. Hasil analisis di-cache sebentar per (NIK, versi data):
+# versi = hash data pasien dari backend (header X-Data-Version / ETag graph),
+# jadi data yang berubah lewat ingest tidak memakai hasil lama.
+
+DEFAULT_TIMEOUT = (3.05, 60)
+# Maksimal gambar graph yang disimpan (yang paling lama dibuang)
+GRAPH_CACHE_ITEMS = 128
+
+
+class ApiClient:
+    def __init__(self, base_url, timeout=DEFAULT_TIMEOUT, pool_size=10, cache_ttl=60.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._analysis = {}     # nik -> (kedaluwarsa, versi, hasil)
+        self._graphs = {}       # (nik, format) -> (etag, bytes)
+        self._pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="api")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(self.base_url + path, **kwargs)
+
+    # --- Cache hasil analisis ---
+    def cached_analysis(self, nik, version=None):
+        # version=None -> cukup belum kedaluwarsa; diisi -> harus sama persis
+        with self._lock:
+            entry = self._analysis.get(nik)
+            if entry is None or entry[0] < time.monotonic() or (version is not None and entry[1] != version):
+                self._analysis.pop(nik, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[2]
+
+    def remember_analysis(self, nik, version, result):
+        if not version or not self.cache_ttl:
+            return
+        with self._lock:
+            self._analysis[nik] = (time.monotonic() + self.cache_ttl, version, result)
+
+    def forget_analysis(self, nik):
+        with self._lock:
+            self._analysis.pop(nik, None)
+
+    def analysis_version(self, nik):
+        with self._lock:
+            entry = self._analysis.get(nik)
+        return entry[1] if entry else None
+
+    def analysis(self, nik):
+        # Versi non-streaming: hasil (dict) atau melempar requests.HTTPError
+        cached = self.cached_analysis(nik)
+        if cached is not None:
+            return cached
+        response = self.get(f"/analyze/{nik}")
+        response.raise_for_status()
+        result = response.json()
+        self.remember_analysis(nik, response.headers.get("X-Data-Version"), result)
+        return result
+
+    def stream_analysis(self, nik):
+        # Generator (event, data) dari /analyze/{nik}/stream. Hasil "done" ikut di-cache.
+        # Status HTTP selain 200 -> requests.HTTPError sebelum event pertama.
+        with self.get(f"/analyze/{nik}/stream", stream=True) as response:
+            response.raise_for_status()
+            version = response.headers.get("X-Data-Version")
+            for event, data in sse_events(response):
+                if event == "done":
+                    self.remember_analysis(nik, version, data)
+                yield event, data
+
+    # --- Kesiapan backend ---
+    def readiness(self):
+        # (siap, progres load) dari /ready; backend belum jalan -> requests.ConnectionError
+        response = self.get("/ready", timeout=(3.05, 5))
+        return response.status_code == 200, response.json()
+
+    # --- Pencarian pasien ---
+    def search(self, query, limit=20):
+        response = self.get("/patients/search", params={"q": query, "limit": limit})
+        response.raise_for_status()
+        return response.json()["hasil"]
+
+    # --- Graph ---
+    def graph(self, nik, fmt="png"):
+        # Hasil: (versi_data, bytes) atau (None, None) kalau tidak ada.
+        # If-None-Match: gambar yang sama tidak dikirim ulang (304)
+        with self._lock:
+            cached = self._graphs.get((nik, fmt))
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        response = self.get(f"/graph/{nik}", params={"format": fmt}, headers=headers)
+        if response.status_code == 304 and cached:
+            body = cached[1]
+        elif response.status_code == 200:
+            body = response.content
+            with self._lock:
+                self._graphs.pop((nik, fmt), None)
+                self._graphs[(nik, fmt)] = (response.headers.get("ETag"), body)
+                while len(self._graphs) > GRAPH_CACHE_ITEMS:
+                    self._graphs.pop(next(iter(self._graphs)))
+        else:
+            return None, None
+        etag = response.headers.get("ETag") or (cached[0] if cached else None)
+        if not etag:
+            return None, body
+        # ETag = "<hash data>-<format>"
+        return etag.strip('"').rsplit("-", 1)[0], body
+
+    def graph_async(self, nik, fmt="png"):
+        # Diambil paralel dengan analisis (Future)
+        return self._pool.submit(self.graph, nik, fmt)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+def sse_events(response):
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
@@ -1,10 +1,9 @@
 import streamlit as st
 import requests
-import json
-import networkx as nx
-import matplotlib.pyplot as plt
 import os
+import time
 from dotenv import load_dotenv
+from api_client import ApiClient
 
 # --- KONFIGURASI HALAMAN ---
 st.set_page_config(
@@ -13,124 +12,52 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- KONFIGURASI FILE (Relatif) ---
-# Syarat: Terminal harus dijalankan di dalam folder AI
 load_dotenv() # Otomatis cari .env di folder yang sama
-file_path = os.getenv("FILENAME")
 
-@st.cache_data
-def load_data():
-    options = {}
-    bundle = {}
-    
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, 'r') as f:
-                bundle = json.load(f)
-            
-            entries = bundle.get('entry', [])
-            for entry in entries:
-                if entry['resource']['resourceType'] == 'Patient':
-                    res = entry['resource']
-                    # Ambil NIK aman
-                    if 'identifier' in res and len(res['identifier']) > 0:
-                        nik = res['identifier'][0]['value']
-                    else:
-                        nik = "UNKNOWN"
-                    
-                    nama = res['name'][0]['text']
-                    options[f"{nama} ({nik})"] = nik
-                    
-        except Exception as e:
-            st.error(f"Error membaca JSON: {e}")
-    else:
-        # Fallback jika file tidak ketemu
-        st.error(f"❌ File '{file_path}' tidak ditemukan di: {os.path.dirname(file_path)}")
-        st.warning("👉 Pastikan Anda menjalankan perintah 'streamlit run app.py' DARI DALAM folder AI.")
-        
-    return options, bundle
+# --- CLIENT BACKEND ---
+# Satu session keep-alive untuk semua rerun & sesi (cache_resource), dengan
+# timeout connect/read. Hasil analisis di-cache sebentar per NIK + versi data.
+BACKEND_URL = f"http://{os.getenv('BACKEND_HOST', 'localhost')}:8000"
 
-# Load Data
-patient_options, full_bundle = load_data()
+@st.cache_resource
+def get_client():
+    return ApiClient(BACKEND_URL, timeout=(3.05, float(os.getenv("BACKEND_READ_TIMEOUT", "120"))),
+                     cache_ttl=float(os.getenv("CLIENT_CACHE_TTL", "60")))
 
-# --- FUNGSI VISUALISASI GRAPH (LENGKAP VITAL SIGN) ---
-def draw_graph(nik_target, bundle_data):
-    G = nx.DiGraph()
-    uuid_to_nik = {}
-    entries = bundle_data.get('entry', [])
-    
-    patient_uuid = ""
-    
-    # 1. Node Pasien
-    for entry in entries:
-        res = entry['resource']
-        if res['resourceType'] == 'Patient':
-            curr_nik = res['identifier'][0]['value'] if 'identifier' in res else "UNK"
-            uuid_to_nik["urn:uuid:" + res['id']] = curr_nik
-            
-            if curr_nik == nik_target:
-                nama_pasien = res['name'][0]['text']
-                patient_uuid = "urn:uuid:" + res['id']
-                G.add_node("PASIEN", label=f"{nama_pasien}\n(Pasien)", color='#ADD8E6', shape='s', size=3000)
-                
-                # Alergi
-                if "extension" in res:
-                    for ext in res["extension"]:
-                        if "allergy" in ext["url"]:
-                            for a in ext["valueString"].split(","):
-                                G.add_node(f"ALG_{a}", label=f"ALERGI:\n{a}", color='#FFB6C1', shape='o', size=2000)
-                                G.add_edge("PASIEN", f"ALG_{a}", label="MEMILIKI")
-
-    # 2. Node Vital Sign (TB/BB/Tensi) - UNGU
-    for entry in entries:
-        res = entry['resource']
-        if res['resourceType'] == 'Observation':
-            if res['subject']['reference'] == patient_uuid:
-                try:
-                    code = res['code']['coding'][0]['code']
-                    val = ""
-                    label = ""
-                    
-                    if code == "29463-7": # BB
-                        val = f"{res['valueQuantity']['value']} kg"
-                        label = "Berat"
-                    elif code == "8302-2": # TB
-                        val = f"{res['valueQuantity']['value']} cm"
-                        label = "Tinggi"
-                    elif code == "85354-9": # Tensi
-                        sys = res['component'][0]['valueQuantity']['value']
-                        dia = res['component'][1]['valueQuantity']['value']
-                        val = f"{sys}/{dia}"
-                        label = "Tensi"
-                    
-                    if val:
-                        node_id = f"VITAL_{label}"
-                        G.add_node(node_id, label=f"{label}\n{val}", color='#D8BFD8', shape='o', size=2000) # Ungu Thistle
-                        G.add_edge("PASIEN", node_id, label="STATUS")
-                except:
-                    pass
-
-    # 3. Node Obat & Diagnosa
-    for entry in entries:
-        res = entry['resource']
-        if res['resourceType'] == 'MedicationRequest':
-            if res['subject']['reference'] == patient_uuid:
-                try:
-                    obat = res['medicationCodeableConcept']['coding'][0].get('display', 'Obat')
-                    diag = res.get('reasonCode', [{}])[0].get('text', '?')
-                    
-                    node_obat = f"OBT_{obat}"
-                    node_diag = f"DIA_{diag}"
-                    
-                    G.add_node(node_obat, label=f"OBAT\n{obat}", color='#90EE90', shape='o', size=2500)
-                    G.add_node(node_diag, label=f"DIAGNOSA\n{diag}", color='#FFD700', shape='o', size=2500)
-                    
-                    G.add_edge("PASIEN", node_obat, label="DIRESEPKAN")
-                    G.add_edge(node_obat, node_diag, label="UNTUK")
-                except:
-                    pass
-
-    return G
+# --- MENUNGGU BACKEND SIAP ---
+# Backend langsung membuka port lalu me-load data di belakang (/ready). Selama
+# belum siap, halaman menampilkan progres dan memeriksa ulang tiap detik.
+# Sekali siap, tidak dicek lagi di sesi ini.
+def wait_for_backend():
+    if st.session_state.get("backend_siap"):
+        return
+    try:
+        ready, state = get_client().readiness()
+    except requests.RequestException:
+        ready, state = False, {"status": "belum", "tahap": "menunggu backend menyala"}
+    if ready:
+        st.session_state["backend_siap"] = True
+        return
+    if state.get("status") == "gagal":
+        st.error(f"Backend gagal memuat data: {state.get('error')}")
+        st.stop()
+    progres = f"{state.get('tahap') or 'persiapan'}"
+    if state.get("resource"):
+        progres += f", {state['resource']:,} resource dibaca"
+    st.info(f"⏳ Backend sedang memuat data pasien ({progres}, {state.get('detik', 0):.0f} detik)...")
+    time.sleep(1)
+    st.rerun()
+
+wait_for_backend()
+
+# --- PENCARIAN PASIEN ---
+# Daftar pasien tidak lagi dikirim seluruhnya ke browser: sidebar hanya
+# menampilkan hasil /patients/search (maks SEARCH_LIMIT), berapa pun jumlah pasiennya.
+SEARCH_LIMIT = 20
+
+@st.cache_data(ttl=30, show_spinner=False)
+def search_patients(query):
+    return get_client().search(query, limit=SEARCH_LIMIT)
 
 # --- UI SIDEBAR ---
 with st.sidebar:
@@ -140,11 +67,19 @@ with st.sidebar:
     st.markdown("---")
     st.subheader("Pilih Pasien")
     
-    if patient_options:
-        selected_label = st.selectbox("Cari Nama / NIK:", options=list(patient_options.keys()))
+    query = st.text_input("Cari Nama / NIK:", placeholder="mis. Budi, Siti Rahma, atau 3374...")
+    try:
+        matches = search_patients(query.strip())
+    except Exception as e:
+        st.error(f"Gagal koneksi Backend (Main.py sudah jalan?): {e}")
+        matches = []
+
+    if matches:
+        patient_options = {f"{m['nama']} ({m['nik']})": m["nik"] for m in matches}
+        selected_label = st.selectbox("Hasil pencarian:", options=list(patient_options.keys()))
         selected_nik = patient_options[selected_label]
     else:
-        st.error("Database Kosong / Tidak Terbaca")
+        st.warning("Pasien tidak ditemukan." if query.strip() else "Database Kosong / Tidak Terbaca")
         selected_nik = ""
         
     if selected_nik:
@@ -154,70 +89,80 @@ with st.sidebar:
 st.title("🏥 Doctor's Copilot Dashboard")
 st.markdown("Sistem integrasi data rekam medis & tanda vital berbasis **Knowledge Graph**.")
 
+# --- HASIL ANALISIS ---
+# /analyze/{nik}/stream mengirim field satu per satu (Server-Sent Events),
+# jadi status tampil duluan tanpa menunggu seluruh jawaban AI selesai.
+def render_field(slots, field, value):
+    if field == "status":
+        if value == "BAHAYA": slots["status"].error(f"## STATUS: {value}")
+        elif value == "PERINGATAN": slots["status"].warning(f"## STATUS: {value}")
+        else: slots["status"].success(f"## STATUS: {value}")
+    elif field == "skor_risiko":
+        slots["skor"].metric("Skor Risiko", f"{value}/100")
+    elif field == "ringkasan_pasien":
+        slots["ringkasan"].info(f"**Ringkasan Pasien:**\n\n{value}")
+    elif field == "analisis_obat":
+        slots["analisis"].write(value)
+    elif field == "rekomendasi":
+        slots["rekomendasi"].success(value)
+
+def render_analysis(client, nik, slots):
+    slots["status"].info("🤖 AI sedang menganalisis Tanda Vital & Interaksi Obat...")
+    for event, data in client.stream_analysis(nik):
+        if event == "field":
+            render_field(slots, data["field"], data["value"])
+        elif event == "done":
+            for field, value in data.items():
+                render_field(slots, field, value)
+        elif event == "error":
+            st.error(f"Backend Error: {data.get('error')}")
+
 if st.button("🔍 ANALISA DATA PASIEN", type="primary", use_container_width=True):
     if not selected_nik:
         st.warning("Pilih pasien dulu.")
     else:
+        client = get_client()
         try:
-            with st.spinner('🤖 AI sedang menganalisis Tanda Vital & Interaksi Obat...'):
-                # API Call - gunakan hostname Docker service jika di container, localhost jika lokal
-                backend_host = os.getenv("BACKEND_HOST", "localhost")
-                api_url = f"http://{backend_host}:8000/analyze/{selected_nik}"
-                response = requests.get(api_url)
-                
-            if response.status_code == 200:
-                result = response.json()
-                
-                # 1. Header Status
-                status = result.get('status', 'AMAN')
-                skor = result.get('skor_risiko', 0)
-                
-                c1, c2 = st.columns([2, 1])
-                with c1:
-                    if status == "BAHAYA": st.error(f"## STATUS: {status}")
-                    elif status == "PERINGATAN": st.warning(f"## STATUS: {status}")
-                    else: st.success(f"## STATUS: {status}")
-                with c2:
-                    st.metric("Skor Risiko", f"{skor}/100")
-                
-                # 2. Ringkasan Klinis (Teks dari AI)
-                st.info(f"**Ringkasan Pasien:**\n\n{result.get('ringkasan_pasien', '-')}")
-                
-                # 3. Kolom Analisis
-                col_kiri, col_kanan = st.columns(2)
-                with col_kiri:
-                    st.subheader("💊 Analisis Farmasi")
-                    st.write(result.get('analisis_obat', '-'))
-                with col_kanan:
-                    st.subheader("💡 Rekomendasi Medis")
-                    st.success(result.get('rekomendasi', '-'))
-                
-                # 4. Visualisasi Graph
-                st.markdown("---")
-                st.subheader("🕸️ Knowledge Graph Visualization")
-                
-                G = draw_graph(selected_nik, full_bundle)
-                if G.number_of_nodes() > 0:
-                    fig, ax = plt.subplots(figsize=(12, 7))
-                    pos = nx.spring_layout(G, k=0.9, seed=42) # Layout renggang
-                    
-                    # Ambil atribut visual
-                    colors = [nx.get_node_attributes(G, 'color').get(n, '#ddd') for n in G.nodes()]
-                    sizes = [nx.get_node_attributes(G, 'size').get(n, 1500) for n in G.nodes()]
-                    labels = nx.get_node_attributes(G, 'label')
-                    
-                    # Gambar
-                    nx.draw(G, pos, ax=ax, node_color=colors, node_size=sizes, edge_color='gray', width=1.5, arrowsize=15)
-                    nx.draw_networkx_labels(G, pos, labels, font_size=8)
-                    edge_labels = nx.get_edge_attributes(G, 'label')
-                    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=7)
-                    
-                    st.pyplot(fig)
-                else:
-                    st.warning("Data graph kosong.")
+            # Graph diambil paralel dengan analisis, bukan setelahnya
+            graph_future = client.graph_async(selected_nik)
+
+            # 1. Header Status, 2. Ringkasan Klinis, 3. Kolom Analisis:
+            # tempatnya disiapkan dulu, isinya muncul begitu field-nya tiba
+            c1, c2 = st.columns([2, 1])
+            slots = {"status": c1.empty(), "skor": c2.empty()}
+            slots["ringkasan"] = st.empty()
+            col_kiri, col_kanan = st.columns(2)
+            with col_kiri:
+                st.subheader("💊 Analisis Farmasi")
+                slots["analisis"] = st.empty()
+            with col_kanan:
+                st.subheader("💡 Rekomendasi Medis")
+                slots["rekomendasi"] = st.empty()
 
+            cached = client.cached_analysis(selected_nik)
+            if cached is not None:
+                for field, value in cached.items():
+                    render_field(slots, field, value)
             else:
-                st.error(f"Backend Error: {response.text}")
-                
+                render_analysis(client, selected_nik, slots)
+
+            # 4. Visualisasi Graph
+            st.markdown("---")
+            st.subheader("🕸️ Knowledge Graph Visualization")
+            
+            # Graph dibangun & dirender di backend (layout di-cache per data pasien)
+            version, image = graph_future.result()
+            if image is not None:
+                st.image(image, use_column_width=True)
+            else:
+                st.warning("Data graph kosong.")
+
+            # Data pasien berubah sejak hasil di-cache -> analisis ulang
+            if cached is not None and version and version != client.analysis_version(selected_nik):
+                client.forget_analysis(selected_nik)
+                render_analysis(client, selected_nik, slots)
+
+        except requests.HTTPError as e:
+            st.error(f"Backend Error: {e.response.text}")
         except Exception as e:
-            st.error(f"Gagal koneksi Backend (Main.py sudah jalan?): {e}")
\ No newline at end of file
+            st.error(f"Gagal koneksi Backend (Main.py sudah jalan?): {e}")
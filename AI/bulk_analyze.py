@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import ai_service
+
+# --- BULK RISK SCORING (JOB MALAM) ---
+# Menilai risiko seluruh populasi DATABASE_CACHE:
+# - beberapa pasien dikemas dalam satu prompt (analyze_batch_async)
+# - paralel terbatas (--parallel)
+# - hasil ditulis streaming ke JSONL; file ini sekaligus checkpoint,
+#   jadi kalau proses mati, jalankan ulang perintah yang sama untuk lanjut
+#
+#   python bulk_analyze.py --output hasil_risiko.jsonl [--parquet hasil_risiko.parquet]
+
+RESULT_FIELDS = ["nik", "status", "skor_risiko", "ringkasan_pasien", "analisis_obat", "rekomendasi"]
+
+
+def load_checkpoint(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["nik"])
+            except (ValueError, KeyError):
+                continue  # baris terakhir bisa terpotong saat crash
+    return done
+
+
+def open_append(path):
+    # Pastikan baris baru tidak menempel ke baris terpotong dari run sebelumnya
+    needs_newline = False
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    f = open(path, 'a', encoding='utf-8')
+    if needs_newline:
+        f.write("\n")
+    return f
+
+
+async def run_bulk(output, niks, batch_size, parallel, window):
+    done = load_checkpoint(output)
+    todo = [nik for nik in niks if nik not in done]
+    print(f"📋 Total {len(niks)} pasien, {len(done)} sudah selesai (checkpoint), sisa {len(todo)}")
+
+    stats = {"ok": 0, "error": 0}
+    start = time.perf_counter()
+    with open_append(output) as out, open_append(output + ".errors.jsonl") as err:
+        def on_result(nik, result):
+            # Hasil error ditulis terpisah dan tidak dihitung selesai -> dicoba lagi saat resume
+            target = err if "error" in result else out
+            target.write(json.dumps({"nik": nik, **result}, ensure_ascii=False) + "\n")
+            stats["error" if "error" in result else "ok"] += 1
+
+        for i in range(0, len(todo), window):
+            await ai_service.analyze_batch_async(todo[i:i + window], parallel, on_result, batch_size)
+            out.flush()
+            err.flush()
+            elapsed = time.perf_counter() - start
+            selesai = stats["ok"] + stats["error"]
+            print(f"⏳ {selesai}/{len(todo)} | {selesai / elapsed * 60:.0f} pasien/menit | error {stats['error']}")
+
+    elapsed = time.perf_counter() - start
+    rate = (stats["ok"] + stats["error"]) / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"✅ Selesai: {stats['ok']} sukses, {stats['error']} error, {elapsed:.1f} detik ({rate:.0f} pasien/menit)")
+    return stats, rate
+
+
+def jsonl_to_parquet(src, dst, rows_per_group=10000):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("❌ pyarrow belum terinstal (pip install pyarrow), konversi Parquet dilewati.")
+        return
+
+    schema = pa.schema([(name, pa.int64() if name == "skor_risiko" else pa.string()) for name in RESULT_FIELDS])
+
+    def to_row(rec):
+        row = {name: rec.get(name) for name in RESULT_FIELDS}
+        try:
+            row["skor_risiko"] = int(row["skor_risiko"])
+        except (TypeError, ValueError):
+            row["skor_risiko"] = None
+        for name in RESULT_FIELDS:
+            if name != "skor_risiko" and row[name] is not None:
+                row[name] = str(row[name])
+        return row
+
+    # Ditulis per row group, jadi file JSONL besar tidak dimuat utuh
+    with pq.ParquetWriter(dst, schema) as writer, open(src, 'r', encoding='utf-8') as f:
+        rows = []
+        for line in f:
+            try:
+                rows.append(to_row(json.loads(line)))
+            except ValueError:
+                continue
+            if len(rows) >= rows_per_group:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                rows = []
+        if rows:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    print(f"✅ Parquet ditulis: {dst}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk risk scoring seluruh pasien")
+    parser.add_argument("--output", default="hasil_risiko.jsonl")
+    parser.add_argument("--parquet", help="Konversi hasil akhir ke file Parquet")
+    parser.add_argument("--niks", help="File berisi daftar NIK (satu per baris); default semua pasien")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--batch-size", type=int, default=ai_service.BATCH_SIZE)
+    parser.add_argument("--parallel", type=int, default=ai_service.BATCH_PARALLEL)
+    parser.add_argument("--window", type=int, default=1000, help="Jumlah NIK per putaran checkpoint")
+    args = parser.parse_args()
+
+    ai_service.ensure_loaded()
+    if args.niks:
+        with open(args.niks, 'r') as f:
+            niks = [line.strip() for line in f if line.strip()]
+    else:
+        niks = list(ai_service.DATABASE_CACHE)
+    if args.limit:
+        niks = niks[:args.limit]
+
+    asyncio.run(run_bulk(args.output, niks, args.batch_size, args.parallel, args.window))
+    if args.parquet:
+        jsonl_to_parquet(args.output, args.parquet)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import json
+
+# --- KODE LOINC TANDA VITAL ---
+KODE_BB = "29463-7"
+KODE_TB = "8302-2"
+KODE_TENSI = "85354-9"
+
+# Ukuran potongan file yang dibaca per langkah (karakter)
+CHUNK_SIZE = 1 << 20
+# Progres parsing dilaporkan tiap sekian resource
+PROGRESS_EVERY = 10000
+
+WHITESPACE = " \t\r\n"
+
+
+# --- PEMBACA JSON BERTAHAP ---
+# Membaca file sepotong-sepotong dan men-decode satu nilai JSON per panggilan,
+# jadi array "entry" tidak pernah dimuat utuh ke memori.
+class _StreamReader:
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        data = self.f.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        # Buang bagian buffer yang sudah dibaca sebelum menambah potongan baru
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def next_char(self):
+        c = self.peek()
+        self.pos += 1
+        return c
+
+    def expect(self, ch):
+        c = self.next_char()
+        if c != ch:
+            raise ValueError(f"JSON tidak valid: harusnya '{ch}', ketemu '{c}'")
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Nilai terpotong di batas chunk -> baca lagi lalu ulangi
+                if self._fill():
+                    continue
+                raise
+            # Angka di ujung buffer bisa jadi belum lengkap
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_bundle_resources(path, chunk_size=CHUNK_SIZE):
+    # Streaming: yield resource dari Bundle satu per satu (satu kali lewat)
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _StreamReader(f, chunk_size)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            key = reader.value()
+            reader.expect(':')
+            if key == 'entry':
+                reader.expect('[')
+                if reader.peek() == ']':
+                    reader.next_char()
+                else:
+                    while True:
+                        entry = reader.value()
+                        if isinstance(entry, dict) and 'resource' in entry:
+                            yield entry['resource']
+                        c = reader.next_char()
+                        if c == ']':
+                            break
+                        if c != ',':
+                            raise ValueError(f"JSON tidak valid di array entry: '{c}'")
+            else:
+                reader.value()  # Field lain (resourceType, type, ...) dilewati
+            c = reader.next_char()
+            if c == '}':
+                break
+            if c != ',':
+                raise ValueError(f"JSON tidak valid di Bundle: '{c}'")
+
+
+def iter_ndjson_resources(lines):
+    # FHIR NDJSON: satu resource per baris (baris kosong dilewati).
+    # Baris berupa entry Bundle ({"resource": {...}}) juga diterima.
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        obj = json.loads(line)
+        if isinstance(obj, dict) and 'resourceType' not in obj and 'resource' in obj:
+            obj = obj['resource']
+        yield obj
+
+
+def iter_file_resources(path):
+    # *.ndjson dibaca per baris, selain itu dianggap Bundle JSON
+    if path.endswith('.ndjson'):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from iter_ndjson_resources(f)
+    else:
+        yield from iter_bundle_resources(path)
+
+
+def iter_loaded_resources(path):
+    # Mode lama: json.load seluruh file baru di-iterasi
+    with open(path, 'r', encoding='utf-8') as f:
+        bundle = json.load(f)
+    for entry in bundle.get('entry', []):
+        yield entry['resource']
+
+
+# --- EKSTRAK DATA PER RESOURCE ---
+def extract_item(res):
+    # Hasil: ("vital", kunci, nilai, waktu) / ("obat", dict) / None kalau tidak relevan
+    # waktu = effectiveDateTime / issued (string ISO) atau None
+    rtype = res.get('resourceType')
+    try:
+        if rtype == 'Observation':
+            code = res['code']['coding'][0]['code']
+            waktu = res.get('effectiveDateTime') or res.get('issued')
+            if code == KODE_BB:
+                q = res['valueQuantity']
+                return ("vital", "bb", f"{q['value']} {q['unit']}", waktu)
+            elif code == KODE_TB:
+                q = res['valueQuantity']
+                return ("vital", "tb", f"{q['value']} {q['unit']}", waktu)
+            elif code == KODE_TENSI:
+                sys = res['component'][0]['valueQuantity']['value']
+                dia = res['component'][1]['valueQuantity']['value']
+                return ("vital", "tensi", f"{sys}/{dia} mmHg", waktu)
+        elif rtype == 'MedicationRequest':
+            coding = res['medicationCodeableConcept']['coding'][0]
+            nama_obat = coding.get('display', 'Obat')
+            diagnosa = res.get('reasonCode', [{}])[0].get('text', '-')
+            return ("obat", {"obat": nama_obat, "kfa": coding.get('code', '-'), "diagnosa": diagnosa})
+    except (KeyError, IndexError, TypeError):
+        pass
+    return None
+
+
+def subject_key(ref):
+    # "urn:uuid:<id>", "Patient/<id>" atau "<id>" -> 16 byte UUID (kalau id-nya
+    # UUID) atau string id. Kunci persis, bukan hash: dipakai juga PatientRefs.
+    ident = ref.rsplit(':', 1)[-1].rsplit('/', 1)[-1]
+    if len(ident) == 36:
+        try:
+            return bytes.fromhex(ident.replace('-', ''))
+        except ValueError:
+            pass
+    return ident
+
+
+def new_patient_record(res):
+    nik = res['identifier'][0]['value'] if 'identifier' in res else "UNKNOWN"
+    nama = res['name'][0]['text']
+    alergi = []
+    for ext in res.get('extension', []):
+        if 'allergy' in ext.get('url', ''):
+            alergi.extend(a.strip() for a in ext.get('valueString', '').split(',') if a.strip())
+    return nik, {
+        "profil": {
+            "nama": nama,
+            "nik": nik,
+            "gender": res.get('gender', '-'),
+            "tanggal_lahir": res.get('birthDate', '-'),
+            "alergi": alergi
+        },
+        "tanda_vital": {"tb": "-", "bb": "-", "tensi": "-"},
+        "medis": []
+    }
+
+
+def apply_item(record, item):
+    if item[0] == "vital":
+        record['tanda_vital'][item[1]] = item[2]
+    else:
+        record['medis'].append(item[1])
+
+
+# --- PARSING SATU KALI LEWAT ---
+# Hasilnya index per pasien (NIK -> profil, tanda vital, obat) yang dipakai
+# bersama oleh ai_service (konteks AI) dan app.py (knowledge graph).
+def parse_resources(resources, into=None, on_vital=None, keep=None):
+    # into: objek dengan put(nik, record) dan [nik] (mis. CompactPatientDB).
+    # Kalau diisi, record pasien sebelumnya langsung dipindah ke sana begitu
+    # Patient berikutnya muncul, jadi record dict tidak menumpuk di memori.
+    # on_vital(nik, kunci, nilai, waktu): dipanggil untuk tanda vital bertimestamp
+    # (riwayat), karena record sendiri hanya menyimpan satu nilai. Kalau hasilnya
+    # False, nilai itu lebih lama dari yang sudah ada dan tidak menimpa record.
+    # keep(nik): kalau diisi, hanya pasien yang hasilnya True yang dimuat (shard).
+    database = {}
+    uuid_to_nik = {}
+    # Observation/MedicationRequest yang muncul sebelum Patient-nya.
+    # Yang disimpan hanya hasil ekstrak (kecil), bukan resource mentah.
+    pending = []
+    # subject_key() pasien yang dilewati keep (16 byte per UUID): resource-nya
+    # langsung dibuang, tidak ikut menumpuk di pending. Hanya hidup selama parsing.
+    skipped = set()
+
+    def flush():
+        for nik, record in database.items():
+            into.put(nik, record)
+        database.clear()
+
+    def apply_to(nik, item):
+        if on_vital is not None and item[0] == "vital" and item[3]:
+            if on_vital(nik, *item[1:]) is False:
+                return
+        record = database.get(nik)
+        if record is not None:
+            apply_item(record, item)
+        else:
+            # Pasien sudah dipindah ke `into` (resource datang tidak berurutan)
+            record = into[nik]
+            apply_item(record, item)
+            into.put(nik, record)
+
+    for res in resources:
+        rtype = res.get('resourceType')
+        if rtype == 'Patient':
+            if into is not None:
+                flush()
+            nik, record = new_patient_record(res)
+            if keep is not None and not keep(nik):
+                skipped.add(subject_key(res['id']))
+                continue
+            uuid_to_nik["urn:uuid:" + res['id']] = nik
+            database[nik] = record
+        elif rtype in ('Observation', 'MedicationRequest'):
+            item = extract_item(res)
+            if item is None:
+                continue
+            subject_ref = res.get('subject', {}).get('reference')
+            nik = uuid_to_nik.get(subject_ref)
+            if nik is None:
+                if skipped and subject_ref and subject_key(subject_ref) in skipped:
+                    continue
+                pending.append((subject_ref, item))
+            else:
+                apply_to(nik, item)
+
+    # Selesaikan yang tertunda; yang pasiennya tetap tidak ada dibuang
+    for subject_ref, item in pending:
+        nik = uuid_to_nik.get(subject_ref)
+        if nik is not None:
+            apply_to(nik, item)
+
+    if into is not None:
+        flush()
+        return into, uuid_to_nik
+    return database, uuid_to_nik
+
+
+def counted(resources, progress, every=PROGRESS_EVERY):
+    # progress(jumlah_resource) tiap `every` resource (untuk laporan /ready)
+    count = 0
+    for res in resources:
+        count += 1
+        if count % every == 0:
+            progress(count)
+        yield res
+    progress(count)
+
+
+def parse_bundle_file(path, stream=True, into=None, on_vital=None, keep=None, progress=None):
+    # *.ndjson selalu dibaca per baris (mode json.load hanya untuk Bundle)
+    resources = iter_file_resources(path) if stream or path.endswith('.ndjson') else iter_loaded_resources(path)
+    if progress is not None:
+        resources = counted(resources, progress)
+    return parse_resources(resources, into, on_vital, keep)
@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# --- KNOWLEDGE GRAPH DI SERVER ---
+# Graph pasien (node/edge + posisi layout) dibangun di backend, bukan di
+# Streamlit. Layout deterministik (seed tetap) dan di-cache per hash data
+# pasien: data berubah (mis. lewat ingest) -> hash baru -> layout baru.
+# Gambar PNG/SVG dirender di process pool supaya tidak memakan CPU event loop.
+
+VITAL_LABEL = {"bb": "Berat", "tb": "Tinggi", "tensi": "Tensi"}
+LAYOUT_SEED = 42
+LAYOUT_K = 0.9
+IMAGE_FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def graph_hash(data):
+    # Hash isi record pasien (urutan key tidak berpengaruh)
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def build_graph(data):
+    # Node & edge sama persis dengan draw_graph lama di app.py
+    nodes, edges = {}, []
+
+    def node(node_id, label, color, size, kind):
+        nodes[node_id] = {"id": node_id, "label": label, "color": color, "size": size, "jenis": kind}
+
+    node("PASIEN", f"{data['profil']['nama']}\n(Pasien)", '#ADD8E6', 3000, "pasien")
+
+    for a in data['profil'].get('alergi', []):
+        node(f"ALG_{a}", f"ALERGI:\n{a}", '#FFB6C1', 2000, "alergi")
+        edges.append({"source": "PASIEN", "target": f"ALG_{a}", "label": "MEMILIKI"})
+
+    for key, label in VITAL_LABEL.items():
+        val = data.get('tanda_vital', {}).get(key, "-")
+        if val != "-":
+            val = val.replace(" mmHg", "")
+            node(f"VITAL_{label}", f"{label}\n{val}", '#D8BFD8', 2000, "vital")
+            edges.append({"source": "PASIEN", "target": f"VITAL_{label}", "label": "STATUS"})
+
+    for rekam in data.get('medis', []):
+        obat = rekam.get('obat', 'Obat')
+        diag = rekam.get('diagnosa', '?')
+        node(f"OBT_{obat}", f"OBAT\n{obat}", '#90EE90', 2500, "obat")
+        node(f"DIA_{diag}", f"DIAGNOSA\n{diag}", '#FFD700', 2500, "diagnosa")
+        edges.append({"source": "PASIEN", "target": f"OBT_{obat}", "label": "DIRESEPKAN"})
+        edges.append({"source": f"OBT_{obat}", "target": f"DIA_{diag}", "label": "UNTUK"})
+
+    # Edge ganda (obat sama diresepkan dua kali) digabung seperti di DiGraph
+    edges = list({(e["source"], e["target"]): e for e in edges}.values())
+    return {"nodes": list(nodes.values()), "edges": edges}
+
+
+def _to_networkx(graph):
+    import networkx as nx
+    G = nx.DiGraph()
+    for n in graph["nodes"]:
+        G.add_node(n["id"], **n)
+    for e in graph["edges"]:
+        G.add_edge(e["source"], e["target"], label=e["label"])
+    return G
+
+
+def compute_layout(graph):
+    # spring_layout dengan seed tetap -> posisi sama untuk data yang sama
+    import networkx as nx
+    pos = nx.spring_layout(_to_networkx(graph), k=LAYOUT_K, seed=LAYOUT_SEED)
+    for n in graph["nodes"]:
+        x, y = pos[n["id"]]
+        n["x"], n["y"] = round(float(x), 4), round(float(y), 4)
+    return graph
+
+
+def render_image(graph, fmt="png"):
+    # Dijalankan di process pool. Tampilan sama dengan dashboard lama.
+    import io
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
+    G = _to_networkx(graph)
+    pos = {n["id"]: (n["x"], n["y"]) for n in graph["nodes"]}
+    fig, ax = plt.subplots(figsize=(12, 7))
+    colors = [G.nodes[n].get('color', '#ddd') for n in G.nodes()]
+    sizes = [G.nodes[n].get('size', 1500) for n in G.nodes()]
+    labels = {n: G.nodes[n]['label'] for n in G.nodes()}
+    nx.draw(G, pos, ax=ax, node_color=colors, node_size=sizes, edge_color='gray', width=1.5, arrowsize=15)
+    nx.draw_networkx_labels(G, pos, labels, font_size=8, ax=ax)
+    edge_labels = nx.get_edge_attributes(G, 'label')
+    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=7, ax=ax)
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, bbox_inches="tight")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+class GraphService:
+    def __init__(self, max_items=1024, render_workers=2, prerender=None):
+        self.max_items = max_items
+        self.render_workers = render_workers
+        self.prerender = prerender      # "png" / "svg" / None
+        self._layouts = OrderedDict()   # hash -> graph (dengan posisi)
+        self._images = OrderedDict()    # (hash, format) -> bytes
+        self._rendering = {}            # (hash, format) -> Future
+        self._lock = threading.Lock()
+        self._pool = None
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+
+    def _remember(self, store, key, value):
+        with self._lock:
+            store[key] = value
+            store.move_to_end(key)
+            while len(store) > self.max_items:
+                store.popitem(last=False)
+
+    def _lookup(self, store, key):
+        with self._lock:
+            value = store.get(key)
+            if value is not None:
+                store.move_to_end(key)
+            return value
+
+    def get(self, data):
+        # Hasil: (hash, graph). Cache hit = tanpa hitung layout sama sekali
+        key = graph_hash(data)
+        graph = self._lookup(self._layouts, key)
+        if graph is not None:
+            self.hits += 1
+            return key, graph
+        self.misses += 1
+        graph = compute_layout(build_graph(data))
+        graph["hash"] = key
+        self._remember(self._layouts, key, graph)
+        if self.prerender:
+            self._submit(key, graph, self.prerender)
+        return key, graph
+
+    def _submit(self, key, graph, fmt):
+        with self._lock:
+            fut = self._rendering.get((key, fmt))
+            if fut is not None:
+                return fut
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.render_workers)
+            fut = self._pool.submit(render_image, graph, fmt)
+            self._rendering[(key, fmt)] = fut
+        self.renders += 1
+
+        def done(f):
+            # Simpan gambar dulu baru lepas penanda "sedang dirender"
+            if not f.cancelled() and f.exception() is None:
+                self._remember(self._images, (key, fmt), f.result())
+            with self._lock:
+                self._rendering.pop((key, fmt), None)
+
+        fut.add_done_callback(done)
+        return fut
+
+    async def image(self, key, graph, fmt="png"):
+        # Gambar dari cache, atau dirender di process pool tanpa memblokir event loop
+        image = self._lookup(self._images, (key, fmt))
+        if image is not None:
+            return image
+        return await asyncio.wrap_future(self._submit(key, graph, fmt))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "layout": len(self._layouts),
+            "gambar": len(self._images),
+            "hits": self.hits,
+            "misses": self.misses,
+            "render": self.renders,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,552 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from array import array
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+
+from fhir_parser import (apply_item, extract_item, iter_file_resources, iter_ndjson_resources, new_patient_record,
+                         subject_key)
+
+# --- INGEST INKREMENTAL ---
+# Data baru (Bundle tambahan atau FHIR NDJSON) diterapkan ke database yang
+# sedang jalan tanpa restart dan tanpa parsing ulang seluruh file:
+# - hanya pasien yang tersentuh delta yang dibaca, disalin, lalu diubah
+# - record hasil akhirnya dipasang sekaligus di overlay (state baru diganti
+#   dengan satu assignment), jadi pembaca tidak pernah melihat record setengah jadi
+# - tanda vital bertimestamp juga disimpan sebagai riwayat
+
+
+def parse_time(text):
+    # ISO 8601 -> datetime UTC (tanpa zona dianggap UTC). None kalau tidak valid
+    try:
+        t = datetime.fromisoformat(text)
+    except (TypeError, ValueError):
+        return None
+    return t if t.tzinfo else t.replace(tzinfo=timezone.utc)
+
+
+class PatientOverlay(Mapping):
+    # Lapisan tulis di atas database dasar (dict, CompactPatientDB, atau index
+    # mmap yang read-only). Record yang berubah/baru disimpan di sini.
+    # State (record, NIK baru) diganti utuh lewat satu assignment di publish(),
+    # jadi pembaca yang mengambil self._state sekali selalu melihat snapshot
+    # yang konsisten: record baru tidak pernah terlihat tanpa NIK-nya (atau sebaliknya).
+    def __init__(self, base):
+        self.base = base
+        self._state = ({}, ())  # (nik -> record, NIK yang tidak ada di base, urutan masuk)
+        # (resourceType, id) -> ResourceVersion untuk resource yang masuk lewat
+        # ingest. Ukurannya mengikuti data di overlay; resource dari data dasar
+        # tidak dicatat. Hanya dibaca/diubah Ingestor di bawah lock-nya.
+        self.versions = {}
+
+    def __getitem__(self, nik):
+        record = self._state[0].get(nik)
+        if record is not None:
+            return record
+        return self.base[nik]
+
+    def __contains__(self, nik):
+        return nik in self._state[0] or nik in self.base
+
+    def __len__(self):
+        return len(self.base) + len(self._state[1])
+
+    def __iter__(self):
+        added = self._state[1]
+        yield from self.base
+        yield from added
+
+    def names(self):
+        # (NIK, nama) tanpa membangun ulang record dasar kalau base mendukung
+        records, added = self._state
+        base = self.base.names() if hasattr(self.base, "names") else \
+            ((nik, self.base[nik].get("profil", {}).get("nama", "")) for nik in self.base)
+        for nik, nama in base:
+            record = records.get(nik)
+            yield nik, record.get("profil", {}).get("nama", "") if record is not None else nama
+        for nik in added:
+            yield nik, records[nik].get("profil", {}).get("nama", "")
+
+    def publish(self, changes):
+        # Dipanggil satu penulis (Ingestor, di bawah lock-nya)
+        records, added = self._state
+        new = [nik for nik in changes if nik not in records and nik not in self.base]
+        records = dict(records)
+        records.update(changes)
+        self._state = (records, added + tuple(new))
+        return new
+
+
+class ResourceVersion:
+    # Versi resource yang sudah diterapkan: cukup untuk mengenali kiriman ulang
+    # yang identik dan untuk membatalkan efek versi lama saat diganti
+    __slots__ = ("digest", "updated", "nik", "item")
+
+    def __init__(self, digest, updated, nik=None, item=None):
+        self.digest = digest      # blake2b isi resource (kunci terurut)
+        self.updated = updated    # meta.lastUpdated (datetime) atau None
+        self.nik = nik
+        self.item = item          # hasil extract_item yang diterapkan (Observation/MedicationRequest)
+
+
+def resource_version(res):
+    digest = hashlib.blake2b(json.dumps(res, sort_keys=True, ensure_ascii=False).encode('utf-8'),
+                             digest_size=16).digest()
+    return ResourceVersion(digest, parse_time((res.get('meta') or {}).get('lastUpdated')))
+
+
+class PatientRefs:
+    # Referensi subject -> NIK. UUID disimpan sebagai 16 byte supaya map untuk
+    # jutaan pasien tidak sebesar string "urn:uuid:..."
+    # fallback(kunci) -> NIK / None: referensi dari index terkompilasi
+    def __init__(self, uuid_to_nik=None, fallback=None):
+        self._map = {}
+        self._fallback = fallback
+        uuid_to_nik = uuid_to_nik or {}
+        for ref in list(uuid_to_nik):
+            self.add(ref, uuid_to_nik.pop(ref))
+
+    _key = staticmethod(subject_key)
+
+    def add(self, ref, nik):
+        self._map[self._key(ref)] = nik
+
+    def resolve(self, subject):
+        # subject.identifier (NIK langsung) atau subject.reference
+        ident = subject.get('identifier')
+        if isinstance(ident, dict) and ident.get('value'):
+            return ident['value']
+        ref = subject.get('reference')
+        if not ref:
+            return None
+        key = self._key(ref)
+        nik = self._map.get(key)
+        if nik is None and self._fallback is not None:
+            nik = self._fallback(key)
+        return nik
+
+    def __len__(self):
+        return len(self._map)
+
+
+class VitalHistory:
+    # Riwayat kolomnar: satu baris per observasi bertimestamp di array
+    # (waktu epoch ms, offset zona, kunci, id nilai, baris sebelumnya milik
+    # pasien yang sama). Per pasien hanya ada slot, kepala daftar, dan waktu
+    # terbaru per kunci, jadi cek "paling baru" O(1) dan memori ~20 byte per
+    # observasi. Observasi tanpa timestamp tidak bisa diurutkan -> tidak disimpan.
+    KEYS = ("bb", "tb", "tensi")
+    EMPTY = -(1 << 62)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = {}            # nik -> slot (pasien di luar index terkompilasi)
+        self._base_slot = None      # fn(nik) -> slot / -1 (index terkompilasi)
+        self._head = array('i')     # slot -> baris terakhir (-1 = belum ada)
+        self._latest = array('q')   # slot * len(KEYS) + kunci -> waktu terbaru (ms)
+        self._time = array('q')
+        self._offset = array('h')   # offset zona waktu asli (menit)
+        self._key = array('B')
+        self._value = array('I')
+        self._prev = array('i')
+        self._values = []           # nilai unik ("70 kg", "120/80 mmHg", ...)
+        self._value_ids = {}        # None = belum dibangun (riwayat dari index, lihat _ids)
+        self._patients = 0
+
+    def _slot(self, nik, create=False):
+        slot = self._slots.get(nik)
+        if slot is None and self._base_slot is not None:
+            slot = self._base_slot(nik)
+            if slot < 0:
+                slot = None
+        if slot is None and create:
+            slot = self._slots[nik] = len(self._head)
+            self._head.append(-1)
+            self._latest.extend([self.EMPTY] * len(self.KEYS))
+        return slot
+
+    def add(self, nik, kunci, nilai, waktu):
+        # Hasil True kalau nilai ini yang terbaru untuk kuncinya (boleh menimpa
+        # tanda_vital). Tanpa timestamp: urutan kedatangan yang menang.
+        # Kiriman ulang nilai terbaru yang persis sama (kunci, waktu, nilai) tidak
+        # dicatat dua kali; cek hanya saat waktunya sama dengan yang terbaru,
+        # supaya load awal tidak menelusuri riwayat tiap observasi.
+        t = parse_time(waktu)
+        if t is None or kunci not in self.KEYS:
+            return True
+        ms = int(t.timestamp() * 1000)
+        k = self.KEYS.index(kunci)
+        with self._lock:
+            slot = self._slot(nik, create=True)
+            latest = slot * len(self.KEYS) + k
+            value_ids = self._ids()
+            value_id = value_ids.get(nilai)
+            if value_id is not None and ms == self._latest[latest] and \
+                    self._find_row(slot, k, ms, value_id)[0] >= 0:
+                return True
+            if value_id is None:
+                value_id = value_ids[nilai] = len(self._values)
+                self._values.append(nilai)
+            if self._head[slot] < 0:
+                self._patients += 1
+            self._time.append(ms)
+            self._offset.append(int(t.utcoffset().total_seconds() // 60))
+            self._key.append(k)
+            self._value.append(value_id)
+            self._prev.append(self._head[slot])
+            self._head[slot] = len(self._time) - 1
+            if ms < self._latest[latest]:
+                return False
+            self._latest[latest] = ms
+            return True
+
+    def _ids(self):
+        # nilai -> id; untuk riwayat dari index baru dibangun saat ingest
+        # pertama kali butuh, bukan saat startup
+        if self._value_ids is None:
+            self._value_ids = {v: i for i, v in enumerate(self._values)}
+        return self._value_ids
+
+    def _find_row(self, slot, k, ms, value_id):
+        # Hasil: (baris, baris sesudahnya di daftar / -1 kalau baris = kepala)
+        after, row = -1, self._head[slot]
+        while row >= 0:
+            if self._key[row] == k and self._time[row] == ms and self._value[row] == value_id:
+                return row, after
+            after, row = row, self._prev[row]
+        return -1, -1
+
+    def remove(self, nik, kunci, nilai, waktu):
+        # Buang satu observasi (resource yang diganti versi barunya lewat ingest).
+        # Hasil True kalau ada yang dibuang; waktu terbaru kunci itu dihitung ulang
+        t = parse_time(waktu)
+        if t is None or kunci not in self.KEYS:
+            return False
+        ms = int(t.timestamp() * 1000)
+        k = self.KEYS.index(kunci)
+        with self._lock:
+            slot = self._slot(nik)
+            value_id = self._ids().get(nilai)
+            if slot is None or value_id is None:
+                return False
+            row, after = self._find_row(slot, k, ms, value_id)
+            if row < 0:
+                return False
+            # Baris tetap di kolom (append-only), hanya dilepas dari daftar pasien
+            if after < 0:
+                self._head[slot] = self._prev[row]
+            else:
+                self._prev[after] = self._prev[row]
+            if self._head[slot] < 0:
+                self._patients -= 1
+            newest, row = self.EMPTY, self._head[slot]
+            while row >= 0:
+                if self._key[row] == k:
+                    newest = max(newest, self._time[row])
+                row = self._prev[row]
+            self._latest[slot * len(self.KEYS) + k] = newest
+            return True
+
+    def latest(self, nik, kunci):
+        # Nilai terbaru untuk satu kunci (None kalau tidak ada riwayat)
+        rows = self.get(nik, kunci)
+        return rows[-1]["nilai"] if rows else None
+
+    def get(self, nik, kunci=None):
+        # Terurut waktu (lama -> baru)
+        with self._lock:
+            slot = self._slot(nik)
+            rows = []
+            row = self._head[slot] if slot is not None else -1
+            while row >= 0:
+                rows.append(row)
+                row = self._prev[row]
+        result = []
+        for row in sorted(rows, key=lambda r: (self._time[r], r)):
+            k = self.KEYS[self._key[row]]
+            if kunci in (None, k):
+                tz = timezone(timedelta(minutes=self._offset[row]))
+                waktu = datetime.fromtimestamp(self._time[row] / 1000, tz).isoformat()
+                result.append({"kunci": k, "nilai": self._values[self._value[row]], "waktu": waktu})
+        return result
+
+    def __len__(self):
+        return self._patients
+
+    # --- Simpan / muat (index terkompilasi) ---
+    def export(self, niks):
+        # Kolom dengan slot = posisi NIK di `niks` (urutan index terkompilasi)
+        head, latest = array('i'), array('q')
+        width = len(self.KEYS)
+        for nik in niks:
+            slot = self._slot(nik)
+            if slot is None:
+                head.append(-1)
+                latest.extend([self.EMPTY] * width)
+            else:
+                head.append(self._head[slot])
+                latest.extend(self._latest[slot * width:(slot + 1) * width])
+        return {"head": head, "latest": latest, "time": self._time, "offset": self._offset, "key": self._key,
+                "value": self._value, "prev": self._prev, "values": self._values}
+
+    @classmethod
+    def from_columns(cls, columns, base_slot):
+        # base_slot(nik) -> posisi NIK di index (-1 kalau tidak ada). Kolom
+        # boleh array biasa atau kolom mmap index (patient_index.MappedColumn):
+        # cukup mendukung [i], [i] = v, append, extend dan len
+        history = cls()
+        for name in ("head", "latest", "time", "offset", "key", "value", "prev"):
+            setattr(history, "_" + name, columns[name])
+        history._values = columns["values"]
+        history._value_ids = None
+        history._base_slot = base_slot
+        if "patients" in columns:
+            history._patients = columns["patients"]
+        else:
+            history._patients = sum(1 for row in history._head if row >= 0)
+        return history
+
+
+class Ingestor:
+    def __init__(self, database, uuid_to_nik=None, history=None, on_change=None, keep=None):
+        self.database = database          # PatientOverlay
+        # uuid_to_nik: dict {"urn:uuid:<id>": NIK} atau PatientRefs jadi
+        self.refs = uuid_to_nik if isinstance(uuid_to_nik, PatientRefs) else PatientRefs(uuid_to_nik)
+        self.history = history if history is not None else VitalHistory()
+        self.on_change = on_change        # on_change({nik: record}) setelah publish
+        self.keep = keep                  # keep(nik) -> False = pasien milik shard lain
+        self._lock = threading.Lock()
+        self.stats = {"delta": 0, "resource": 0, "pasien_baru": 0, "pasien_diubah": 0,
+                      "diperbarui": 0, "duplikat": 0, "usang": 0, "diabaikan": 0}
+
+    def apply(self, resources):
+        # (resourceType, id) yang sama = versi baru resource itu (update FHIR):
+        # efek versi lama dibatalkan dulu (resep dibuang, observasi dilepas dari
+        # riwayat) lalu versi baru diterapkan. Kiriman ulang yang isinya identik
+        # -> duplikat; meta.lastUpdated lebih lama dari versi terpasang -> usang.
+        start = time.perf_counter()
+        summary = {"resource": 0, "diperbarui": 0, "duplikat": 0, "usang": 0, "diabaikan": 0}
+        with self._lock:
+            changes = {}
+            pending = []
+            versions = {}   # versi yang diterapkan di delta ini (dipasang setelah publish)
+            waiting = {}    # kunci resource di pending -> versi yang akan digantinya
+
+            def record_for(nik):
+                record = changes.get(nik)
+                if record is None:
+                    # Salin dulu: record lama mungkin sedang dibaca request lain
+                    record = changes[nik] = copy.deepcopy(self.database[nik])
+                return record
+
+            def known(nik):
+                return nik is not None and (nik in changes or nik in self.database)
+
+            def current(key):
+                return versions.get(key) or self.database.versions.get(key)
+
+            def undo(version):
+                # Batalkan efek versi lama (kalau pasiennya masih ada)
+                if version.item is None or not known(version.nik):
+                    return
+                record = record_for(version.nik)
+                if version.item[0] == "vital":
+                    kunci = version.item[1]
+                    if self.history.remove(version.nik, *version.item[1:]):
+                        record['tanda_vital'][kunci] = self.history.latest(version.nik, kunci) or "-"
+                else:
+                    medis = record['medis']
+                    for i in range(len(medis) - 1, -1, -1):
+                        if medis[i] == version.item[1]:
+                            del medis[i]
+                            break
+
+            def apply_to(nik, item, key=None, version=None):
+                if key is not None:
+                    previous = waiting.pop(key) if key in waiting else current(key)
+                    if previous is not None:
+                        undo(previous)
+                        summary["diperbarui"] += 1
+                    version.nik, version.item = nik, item
+                    versions[key] = version
+                if item[0] == "vital" and not self.history.add(nik, *item[1:]):
+                    return  # lebih lama dari nilai yang sudah ada, cukup masuk riwayat
+                apply_item(record_for(nik), item)
+
+            for res in resources:
+                summary["resource"] += 1
+                rtype = res.get('resourceType')
+                rid = res.get('id')
+                key = version = None
+                if rid is not None:
+                    key, version = (rtype, rid), resource_version(res)
+                    previous = current(key)
+                    if previous is not None:
+                        if previous.digest == version.digest:
+                            summary["duplikat"] += 1
+                            continue
+                        if previous.updated and version.updated and version.updated < previous.updated:
+                            summary["usang"] += 1
+                            continue
+
+                if rtype == 'Patient':
+                    try:
+                        nik, fresh = new_patient_record(res)
+                    except (KeyError, IndexError, TypeError):
+                        summary["diabaikan"] += 1
+                        continue
+                    if self.keep is not None and not self.keep(nik):
+                        # Resource pasien ini ikut terabaikan (referensinya tidak dikenal)
+                        summary["diabaikan"] += 1
+                        continue
+                    if key is not None:
+                        self.refs.add(rid, nik)
+                        if current(key) is not None:
+                            summary["diperbarui"] += 1
+                        version.nik = nik
+                        versions[key] = version
+                    if known(nik):
+                        # Profil diperbarui, tanda vital & obat tetap
+                        record_for(nik)['profil'] = fresh['profil']
+                    else:
+                        changes[nik] = fresh
+                elif rtype in ('Observation', 'MedicationRequest'):
+                    item = extract_item(res)
+                    if item is None:
+                        summary["diabaikan"] += 1
+                        continue
+                    subject = res.get('subject', {})
+                    nik = self.refs.resolve(subject)
+                    if known(nik):
+                        apply_to(nik, item, key, version)
+                    else:
+                        if key is not None:
+                            # Sudah dicatat supaya kiriman ulang di delta ini dikenali;
+                            # versi lama baru dibatalkan saat pasiennya ketemu
+                            waiting.setdefault(key, current(key))
+                            versions[key] = version
+                        pending.append((subject, item, key, version))
+                else:
+                    summary["diabaikan"] += 1
+
+            # Observation sebelum Patient-nya di delta yang sama
+            for subject, item, key, version in pending:
+                if key is not None and versions.get(key) is not version:
+                    continue  # sudah diganti versi berikutnya di delta yang sama
+                nik = self.refs.resolve(subject)
+                if known(nik):
+                    apply_to(nik, item, key, version)
+                else:
+                    summary["diabaikan"] += 1
+                    if key is not None:
+                        previous = waiting.pop(key, None)
+                        if previous is None:
+                            del versions[key]
+                        else:
+                            versions[key] = previous
+
+            added = self.database.publish(changes)
+            self.database.versions.update(versions)
+
+            summary["pasien_baru"] = len(added)
+            summary["pasien_diubah"] = len(changes) - len(added)
+            self.stats["delta"] += 1
+            for key in summary:
+                self.stats[key] += summary[key]
+
+        if changes and self.on_change is not None:
+            self.on_change(changes)
+        summary["nik"] = list(changes)
+        summary["durasi_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return summary
+
+
+# --- PAYLOAD POST /ingest ---
+NDJSON_TYPES = ("application/fhir+ndjson", "application/x-ndjson", "application/ndjson")
+
+
+def payload_resources(body, content_type=""):
+    # NDJSON, Bundle, satu resource, atau array resource -> list resource
+    if content_type.split(';')[0].strip() in NDJSON_TYPES:
+        return list(iter_ndjson_resources(body.decode('utf-8').splitlines()))
+    payload = json.loads(body)
+    if isinstance(payload, dict) and payload.get('resourceType') == 'Bundle':
+        return [e['resource'] for e in payload.get('entry', []) if isinstance(e, dict) and 'resource' in e]
+    if isinstance(payload, dict):
+        return [payload]
+    if isinstance(payload, list):
+        return [r for r in payload if isinstance(r, dict)]
+    raise ValueError("Payload harus Bundle, resource, array resource, atau NDJSON")
+
+
+def write_ndjson(folder, resources, prefix="api", before_replace=None):
+    # Tulis ke .tmp lalu os.replace supaya watcher tidak membaca file setengah jadi.
+    # before_replace(path, tmp_path): dipanggil sebelum file muncul dengan nama
+    # aslinya (mis. watcher.mark_done), jadi tidak ada celah scan yang
+    # menerapkan delta yang sudah diterapkan.
+    path = os.path.join(folder, f"{prefix}-{time.time_ns()}.ndjson")
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        for res in resources:
+            f.write(json.dumps(res, ensure_ascii=False) + "\n")
+    if before_replace is not None:
+        before_replace(path, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+# --- FOLDER YANG DIPANTAU ---
+class IngestWatcher(threading.Thread):
+    # Memindai folder tiap `interval` detik. File *.ndjson / *.json yang baru
+    # atau berubah (ukuran/mtime) diterapkan lewat apply_fn. Saat start, semua
+    # file yang ada diterapkan ulang, jadi folder ini sekaligus log delta.
+    def __init__(self, folder, apply_fn, interval=5.0):
+        super().__init__(name="ingest-watcher", daemon=True)
+        self.folder = folder
+        self.apply_fn = apply_fn
+        self.interval = interval
+        self._done = {}  # nama file -> (ukuran, mtime_ns)
+        self._halt = threading.Event()
+
+    def mark_done(self, path, stat_path=None):
+        # stat_path: file sumber yang akan di-rename jadi `path` (mtime ikut)
+        st = os.stat(stat_path or path)
+        self._done[os.path.basename(path)] = (st.st_size, st.st_mtime_ns)
+
+    def scan(self):
+        applied = []
+        for name in sorted(os.listdir(self.folder)):
+            if not name.endswith(('.ndjson', '.json')):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            sig = (st.st_size, st.st_mtime_ns)
+            if self._done.get(name) == sig:
+                continue
+            # Dicatat dulu: file rusak tidak dicoba terus sampai isinya berubah
+            self._done[name] = sig
+            try:
+                # Dibaca utuh dulu: file yang rusak di tengah tidak diterapkan sebagian
+                summary = self.apply_fn(list(iter_file_resources(path)))
+            except Exception as e:
+                print(f"⚠️ Gagal ingest {name}: {e}")
+                continue
+            print(f"📥 Ingest {name}: {summary['pasien_baru']} pasien baru, "
+                  f"{summary['pasien_diubah']} diubah ({summary['durasi_ms']} ms)")
+            applied.append((name, summary))
+        return applied
+
+    def run(self):
+        while True:
+            self.scan()
+            if self._halt.wait(self.interval):
+                return
+
+    def stop(self):
+        self._halt.set()
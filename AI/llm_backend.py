@@ -0,0 +1,242 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# --- BACKEND LLM ---
+# Semua provider memakai interface yang sama dengan genai.GenerativeModel:
+# generate_content() / generate_content_async() -> objek dengan .text
+# (stream=True -> iterable potongan). Pemanggil di ai_service tidak perlu tahu
+# providernya apa.
+#   gemini = Google Gemini (satu client dipakai ulang, timeout per request, retry)
+#   stub   = model palsu lokal (latency, ekor lambat & gagal bisa diatur)
+# HedgedBackend membungkus provider mana pun: kalau jawaban belum datang
+# setelah p95 latency, request kedua dikirim dan yang lebih dulu selesai dipakai.
+
+LLM_PROVIDERS = ("gemini", "stub")
+# Minimal sampel latency sebelum p95 dipakai sebagai jeda hedge
+HEDGE_MIN_SAMPLES = 20
+
+
+class LLMBackend:
+    # Retry dengan exponential backoff + jitter, hanya untuk error sementara
+    # (_retryable). Stream tidak di-retry: potongan mungkin sudah terkirim.
+    name = "base"
+
+    def __init__(self, retries=2, backoff=0.5, backoff_max=8.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._rng = random.Random()
+        self.calls = 0
+        self.retried = 0
+        self.errors = 0
+
+    def _generate(self, prompt, **kwargs):
+        raise NotImplementedError
+
+    async def _generate_async(self, prompt, **kwargs):
+        raise NotImplementedError
+
+    def _retryable(self, error):
+        return isinstance(error, (TimeoutError, ConnectionError))
+
+    def _sleep_time(self, attempt):
+        return min(self.backoff_max, self.backoff * 2 ** attempt) * (0.5 + self._rng.random() / 2)
+
+    def supports_structured_output(self):
+        return True
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return self._generate(prompt, stream=True, **kwargs)
+        for attempt in range(self.retries + 1):
+            try:
+                return self._generate(prompt, **kwargs)
+            except Exception as e:
+                if attempt == self.retries or not self._retryable(e):
+                    self.errors += 1
+                    raise
+                self.retried += 1
+                time.sleep(self._sleep_time(attempt))
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return await self._generate_async(prompt, stream=True, **kwargs)
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._generate_async(prompt, **kwargs)
+            except Exception as e:
+                if attempt == self.retries or not self._retryable(e):
+                    self.errors += 1
+                    raise
+                self.retried += 1
+                await asyncio.sleep(self._sleep_time(attempt))
+
+    def stats(self):
+        return {"provider": self.name, "panggilan": self.calls, "retry": self.retried, "gagal": self.errors}
+
+
+class GeminiBackend(LLMBackend):
+    # genai menyimpan satu client (gRPC: satu channel HTTP/2 yang dipakai ulang &
+    # dimultipleks) per proses, jadi koneksi tidak dibuka ulang tiap request.
+    # transport="rest" kalau gRPC diblokir jaringan.
+    name = "gemini"
+
+    def __init__(self, model_name, api_key, timeout=30.0, transport=None, **kwargs):
+        super().__init__(**kwargs)
+        import google.generativeai as genai
+        self._genai = genai
+        genai.configure(api_key=api_key, transport=transport)
+        self.model = genai.GenerativeModel(model_name)
+        self.request_options = {"timeout": timeout} if timeout else {}
+
+    def supports_structured_output(self):
+        from response_parser import RESPONSE_SCHEMA
+        try:
+            self._genai.types.GenerationConfig(response_mime_type="application/json", response_schema=RESPONSE_SCHEMA)
+        except TypeError:
+            return False
+        return True
+
+    def _retryable(self, error):
+        # 429 / 500 / 503 / 504 dari API
+        from google.api_core import exceptions
+        transient = (exceptions.ResourceExhausted, exceptions.ServiceUnavailable,
+                     exceptions.InternalServerError, exceptions.DeadlineExceeded)
+        return isinstance(error, transient) or super()._retryable(error)
+
+    def _generate(self, prompt, **kwargs):
+        return self.model.generate_content(prompt, request_options=self.request_options, **kwargs)
+
+    async def _generate_async(self, prompt, **kwargs):
+        return await self.model.generate_content_async(prompt, request_options=self.request_options, **kwargs)
+
+
+class StubBackend(LLMBackend):
+    name = "stub"
+
+    def __init__(self, latency=1.0, latency_per_1k_token=0.0, messy_rate=0.0, failure_rate=0.0,
+                 slow_rate=0.0, slow_factor=5.0, seed=0, **kwargs):
+        super().__init__(**kwargs)
+        from stub_model import StubGenerativeModel
+        self.model = StubGenerativeModel(latency=latency, latency_per_1k_token=latency_per_1k_token,
+                                         messy_rate=messy_rate, seed=seed, failure_rate=failure_rate,
+                                         slow_rate=slow_rate, slow_factor=slow_factor)
+
+    def _retryable(self, error):
+        from stub_model import StubServiceError
+        return isinstance(error, StubServiceError) or super()._retryable(error)
+
+    def _generate(self, prompt, **kwargs):
+        return self.model.generate_content(prompt, **kwargs)
+
+    async def _generate_async(self, prompt, **kwargs):
+        return await self.model.generate_content_async(prompt, **kwargs)
+
+
+class HedgedBackend:
+    # Jeda hedge: `delay` detik kalau diisi, selain itu p95 latency terakhir
+    # (jendela `window` panggilan). Biaya: ~5% panggilan jadi dua request.
+    def __init__(self, inner, delay=None, quantile=0.95, window=500):
+        self.inner = inner
+        self.name = inner.name
+        self.delay = delay
+        self.quantile = quantile
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._pool = None
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def hedge_delay(self):
+        if self.delay is not None:
+            return self.delay
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[int(self.quantile * (len(ordered) - 1))]
+
+    def _observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        if stream:
+            return await self.inner.generate_content_async(prompt, stream=True, **kwargs)
+        start = time.perf_counter()
+        delay = self.hedge_delay()
+        first = asyncio.ensure_future(self.inner.generate_content_async(prompt, **kwargs))
+        tasks = [first]
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedged += 1
+                tasks.append(asyncio.ensure_future(self.inner.generate_content_async(prompt, **kwargs)))
+        try:
+            # Yang sukses lebih dulu dipakai; kalau satu gagal, tunggu yang lain
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None or not pending:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        self._observe(time.perf_counter() - start)
+                        return task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        # Versi sync memakai thread (jalur /analyze sync & bulk lama)
+        if stream:
+            return self.inner.generate_content(prompt, stream=True, **kwargs)
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+        start = time.perf_counter()
+        delay = self.hedge_delay()
+        first = self._pool.submit(self.inner.generate_content, prompt, **kwargs)
+        futures = [first]
+        if delay is not None:
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                self.hedged += 1
+                futures.append(self._pool.submit(self.inner.generate_content, prompt, **kwargs))
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None or not pending:
+                    if future is not first:
+                        self.hedge_wins += 1
+                    self._observe(time.perf_counter() - start)
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+
+    def stats(self):
+        delay = self.hedge_delay()
+        return dict(self.inner.stats(), hedge=self.hedged, hedge_menang=self.hedge_wins,
+                    jeda_hedge_ms=round(delay * 1000, 1) if delay is not None else None)
+
+
+def create_backend(provider, model_name=None, api_key=None, timeout=30.0, retries=2, backoff=0.5,
+                   transport=None, hedge=False, hedge_delay=None, stub_options=None):
+    if provider not in LLM_PROVIDERS:
+        raise ValueError(f"LLM_PROVIDER harus salah satu dari {LLM_PROVIDERS}")
+    if provider == "stub":
+        backend = StubBackend(retries=retries, backoff=backoff, **(stub_options or {}))
+    else:
+        backend = GeminiBackend(model_name, api_key, timeout=timeout, transport=transport,
+                                retries=retries, backoff=backoff)
+    return HedgedBackend(backend, delay=hedge_delay) if hedge else backend
@@ -0,0 +1,54 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class AIBusyError(Exception):
+    # Antrian panggilan LLM penuh -> API balas 503 + Retry-After
+    def __init__(self, retry_after):
+        super().__init__("Server AI sedang sibuk, coba lagi nanti.")
+        self.retry_after = retry_after
+
+
+class AITimeoutError(Exception):
+    pass
+
+
+# --- PEMBATAS PANGGILAN LLM (ASYNC) ---
+# Maksimal `max_inflight` panggilan jalan bersamaan, sisanya antre.
+# Kalau yang antre sudah `max_queue`, request baru langsung ditolak
+# (backpressure) daripada menumpuk dan membuat semua request ikut lambat.
+class LLMLimiter:
+    def __init__(self, max_inflight, max_queue, retry_after=5):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._sem = asyncio.Semaphore(max_inflight)
+        self.waiting = 0
+        self.inflight = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AIBusyError(self.retry_after)
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self._sem.release()
+
+    def stats(self):
+        return {
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "rejected": self.rejected
+        }
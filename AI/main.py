@@ -1,9 +1,58 @@
-from fastapi import FastAPI, HTTPException
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import List
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 # Ini mengimpor fungsi otak yang sudah kamu buat kemarin
-from ai_service import analyze_patient_risk 
+from ai_service import analyze_patient_risk, analyze_patient_risk_async, analyze_batch_async, get_stats, get_vital_store
+from ai_service import analyze_patient_risk_stream, data_version, search_patients
+from ai_service import INGEST_ENABLED, ingest_resources, start_ingest_watcher, get_vital_history
+from ai_service import GRAPH_SERVICE, get_patient_graph, get_population_graph
+from ai_service import METRICS_ENABLED, PROFILER_ENABLED, render_metrics
+from ai_service import is_ready, load_status, start_loading
+from graph_service import IMAGE_FORMATS
+from ingest import payload_resources
+from llm_limiter import AIBusyError, AITimeoutError
+from metrics import MetricsMiddleware, SamplingProfiler, span
 
-app = FastAPI(title="HealthBridge AI API")
+# Set 0 untuk kembali ke endpoint sync lama (panggilan LLM memblokir thread)
+ANALYZE_ASYNC = os.getenv("ANALYZE_ASYNC", "1") != "0"
+# Batas jumlah NIK per request /analyze/batch (populasi penuh -> pakai bulk_analyze.py)
+BATCH_MAX_NIKS = int(os.getenv("BATCH_MAX_NIKS", "500"))
+
+# --- SIKLUS HIDUP ---
+# Data di-load di thread latar setelah port terbuka (cek progres di /ready).
+# Folder INGEST_DIR (kalau diisi) mulai dipantau begitu data siap.
+@asynccontextmanager
+async def lifespan(app):
+    start_loading(on_ready=start_ingest_watcher)
+    yield
+    GRAPH_SERVICE.shutdown()
+
+app = FastAPI(title="HealthBridge AI API", lifespan=lifespan)
+
+# --- GERBANG KESIAPAN ---
+# Selama data masih di-load semua endpoint (kecuali yang di bawah) dijawab
+# 503 + Retry-After. Setelah siap biayanya satu pengecekan Event per request.
+ALWAYS_OPEN = {"/", "/ready", "/metrics", "/metrics/profile", "/docs", "/openapi.json"}
+
+class ReadinessGate:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or is_ready() or scope["path"] in ALWAYS_OPEN:
+            await self.app(scope, receive, send)
+            return
+        response = JSONResponse({"detail": "Data pasien sedang dimuat, coba lagi sebentar.", "load": load_status()},
+                                status_code=503, headers={"Retry-After": "1"})
+        await response(scope, receive, send)
+
+app.add_middleware(ReadinessGate)
 
 # --- SETTING IZIN AKSES (CORS) ---
 # Biar Frontend temanmu (Person C) bisa akses API ini tanpa diblokir
@@ -14,25 +63,238 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Durasi per route & request in-flight untuk /metrics
+app.add_middleware(MetricsMiddleware)
+PROFILER = SamplingProfiler()
 
 @app.get("/")
 def root():
     return {"status": "HealthBridge AI Server Ready! 🚀"}
 
-# --- ENDPOINT UTAMA (INI YANG DITEMBAK FRONTEND) ---
-@app.get("/analyze/{nik}")
-def api_analyze_patient(nik: str):
-    print(f"📡 Menerima request untuk NIK: {nik}")
-    
-    # Panggil Otak AI
-    result = analyze_patient_risk(nik)
-    
-    # Cek Error
-    if "error" in result:
-        raise HTTPException(status_code=404, detail=result["error"])
-    
+# --- KESIAPAN (READINESS) ---
+# 200 kalau data sudah siap dilayani, 503 selama load (dengan progres:
+# tahap, jumlah resource/pasien, detik berjalan) atau kalau load gagal.
+@app.get("/ready")
+def api_ready():
+    state = load_status()
+    return JSONResponse(state, status_code=200 if state["status"] == "siap" else 503)
+
+# --- STATISTIK (cache hit/miss, antrian LLM) ---
+@app.get("/stats")
+def api_stats():
+    return get_stats()
+
+# --- METRIK (FORMAT PROMETHEUS) ---
+@app.get("/metrics")
+def api_metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrik dimatikan (METRICS=0).")
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Sampling profiler: stack semua thread selama `seconds` detik, format folded
+# (langsung bisa dibuat flamegraph). Hanya kalau PROFILER=1.
+@app.get("/metrics/profile")
+async def api_profile(seconds: float = 10.0, interval_ms: float = 5.0):
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiler dimatikan (PROFILER=1 untuk mengaktifkan).")
+    try:
+        text = await run_in_threadpool(PROFILER.folded, max(0.1, min(seconds, 60.0)), max(interval_ms, 1.0) / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(text, media_type="text/plain")
+
+# --- ANALISIS BATCH ---
+class BatchRequest(BaseModel):
+    niks: List[str]
+
+@app.post("/analyze/batch")
+async def api_analyze_batch(req: BatchRequest):
+    if len(req.niks) > BATCH_MAX_NIKS:
+        raise HTTPException(status_code=413, detail=f"Maksimal {BATCH_MAX_NIKS} NIK per request.")
+    print(f"📡 Menerima request batch untuk {len(req.niks)} NIK")
+    return {"hasil": await analyze_batch_async(req.niks)}
+
+# --- INGEST INKREMENTAL ---
+# Body: Bundle FHIR, satu resource, array resource, atau NDJSON
+# (Content-Type: application/fhir+ndjson). Tanpa restart, tanpa parsing ulang.
+@app.post("/ingest")
+async def api_ingest(request: Request):
+    if not INGEST_ENABLED:
+        raise HTTPException(status_code=403, detail="Ingest dimatikan (INGEST=0).")
+    body = await request.body()
+    try:
+        resources = payload_resources(body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Payload tidak valid: {e}")
+    summary = await run_in_threadpool(ingest_resources, resources)
+    print(f"📥 Ingest: {summary['pasien_baru']} pasien baru, {summary['pasien_diubah']} diubah")
+    return summary
+
+# --- PENCARIAN PASIEN (SIDEBAR) ---
+# q = prefix NIK, nama (boleh sebagian / salah ketik sedikit), atau campuran
+@app.get("/patients/search")
+def api_patient_search(q: str = "", limit: int = 20):
+    return {"hasil": search_patients(q, limit=max(1, min(limit, 100)))}
+
+@app.get("/patients/{nik}/vitals")
+def api_patient_vitals(nik: str):
+    result = get_vital_history(nik)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Pasien NIK {nik} tidak ditemukan.")
     return result
 
+# --- GRAPH POPULASI (PASIEN - OBAT - DIAGNOSA - ALERGI) ---
+# Node: jenis=pasien (NIK), obat (kode KFA / nama / golongan), diagnosa, alergi
+@app.get("/population/graph/neighbors")
+def api_graph_neighbors(jenis: str, id: str, k: int = 2, limit: int = 50):
+    try:
+        return get_population_graph().k_hop(jenis, id, k=min(k, 4), limit=limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e).strip("'\""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/population/graph/co-prescription")
+def api_graph_co_prescription(obat: str, top: int = 20):
+    try:
+        return get_population_graph().co_prescription(obat, top=top)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e).strip("'\""))
+
+# Tanpa a & b: semua pola dari tabel aturan (interaksi golongan, alergi vs obat)
+# Contoh: /population/graph/interactions?a=Clopidogrel&b=nsaid
+@app.get("/population/graph/interactions")
+def api_graph_interactions(a: str = None, b: str = None, limit: int = 100):
+    try:
+        if a is None and b is None:
+            return {"pola": get_population_graph().interaction_patterns(limit=limit)}
+        if not a or not b:
+            raise HTTPException(status_code=400, detail="Isi a dan b (kode KFA, nama obat, atau golongan).")
+        return get_population_graph().interaction(a, b, limit=limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e).strip("'\""))
+
+# --- KNOWLEDGE GRAPH PASIEN ---
+# format=json (node, edge, posisi x/y) atau png/svg (gambar jadi).
+# ETag = hash data pasien, jadi client bisa pakai If-None-Match.
+@app.get("/graph/{nik}")
+async def api_patient_graph(nik: str, request: Request, format: str = "json"):
+    if format != "json" and format not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail="format harus json, png, atau svg")
+    found = await run_in_threadpool(get_patient_graph, nik)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Pasien NIK {nik} tidak ditemukan.")
+    key, graph = found
+    etag = f'"{key}-{format}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if format == "json":
+        return Response(json.dumps(graph, ensure_ascii=False), media_type="application/json", headers=headers)
+    with span("graph_render"):
+        image = await GRAPH_SERVICE.image(key, graph, format)
+    return Response(image, media_type=IMAGE_FORMATS[format], headers=headers)
+
+# --- QUERY POPULASI (TANDA VITAL KOLOMNAR) ---
+# Filter lewat query string: <kolom>_min / <kolom>_max (tb, bb, sistole,
+# diastole, umur, bmi, skor), gender=male|female, status=AMAN|PERINGATAN|BAHAYA
+# Contoh: /population/query?sistole_min=150&bmi_min=30
+RESERVED_PARAMS = {"limit", "k", "by", "field", "bins", "lo", "hi"}
+
+def population_filters(request):
+    return {k: v for k, v in request.query_params.items() if k not in RESERVED_PARAMS}
+
+@app.get("/population/query")
+def api_population_query(request: Request, limit: int = 100):
+    try:
+        return get_vital_store().filter(population_filters(request), limit=limit)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Filter tidak valid: {e}")
+
+@app.get("/population/top-risk")
+def api_population_top_risk(request: Request, k: int = 20, by: str = "skor"):
+    try:
+        return get_vital_store().top_k(k, by=by, conditions=population_filters(request))
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Filter tidak valid: {e}")
+
+@app.get("/population/histogram")
+def api_population_histogram(request: Request, field: str = "bmi", bins: int = 20,
+                             lo: float = None, hi: float = None):
+    # lo & hi: rentang bin tetap (dipakai router untuk menjumlahkan histogram shard)
+    value_range = (lo, hi) if lo is not None and hi is not None else None
+    try:
+        return get_vital_store().histogram(field, bins=bins, conditions=population_filters(request),
+                                           value_range=value_range)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Filter tidak valid: {e}")
+
+# --- ANALISIS STREAMING (SERVER-SENT EVENTS) ---
+# event: field -> {"field": "status", "value": "BAHAYA"} (dikirim begitu lengkap)
+# event: done  -> hasil lengkap (sama dengan /analyze/{nik})
+# event: error -> {"error": "...", "kode": 502/504} kalau gagal setelah stream dimulai
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/analyze/{nik}/stream")
+async def api_analyze_stream(nik: str):
+    print(f"📡 Menerima request streaming untuk NIK: {nik}")
+    events = analyze_patient_risk_stream(nik)
+    # Event pertama diambil dulu: pasien tidak ada (404), antrian penuh (503),
+    # LLM gagal (502) / timeout (504) sebelum ada field masih bisa dibalas
+    # dengan status HTTP biasa
+    try:
+        first = await events.__anext__()
+    except AIBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if first[0] == "error":
+        raise HTTPException(status_code=first[1].get("kode", 502), detail=first[1]["error"])
+
+    async def body():
+        yield sse(*first)
+        async for event, data in events:
+            yield sse(event, data)
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+                                      "X-Data-Version": data_version(nik) or ""})
+
+# --- ENDPOINT UTAMA (INI YANG DITEMBAK FRONTEND) ---
+if ANALYZE_ASYNC:
+    @app.get("/analyze/{nik}")
+    async def api_analyze_patient(nik: str, response: Response):
+        print(f"📡 Menerima request untuk NIK: {nik}")
+        
+        # Panggil Otak AI (async, dibatasi LLM_MAX_INFLIGHT)
+        try:
+            result = await analyze_patient_risk_async(nik)
+        except AIBusyError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        except AITimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        
+        # Cek Error (404 pasien tidak ada, 502 LLM gagal)
+        if "error" in result:
+            raise HTTPException(status_code=result.get("kode", 502), detail=result["error"])
+        
+        # Versi data pasien: client boleh cache hasil selama versinya sama
+        response.headers["X-Data-Version"] = data_version(nik)
+        return result
+else:
+    @app.get("/analyze/{nik}")
+    def api_analyze_patient(nik: str, response: Response):
+        print(f"📡 Menerima request untuk NIK: {nik}")
+        
+        # Panggil Otak AI
+        result = analyze_patient_risk(nik)
+        
+        # Cek Error (404 pasien tidak ada, 502 LLM gagal)
+        if "error" in result:
+            raise HTTPException(status_code=result.get("kode", 502), detail=result["error"])
+        
+        response.headers["X-Data-Version"] = data_version(nik)
+        return result
+
 # --- SCRIPT JALAN (Uvicorn) ---
 if __name__ == "__main__":
     import uvicorn
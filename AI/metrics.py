@@ -0,0 +1,277 @@
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import Counter as _Tally
+
+# --- METRIK (FORMAT TEKS PROMETHEUS) ---
+# Tanpa dependensi: counter, histogram, dan gauge disimpan di memori lalu
+# dirender saat /metrics di-scrape. Biaya di jalur panas hanya satu lock dan
+# beberapa operasi dict per observasi (~1 µs), jadi aman dinyalakan di produksi.
+# Angka yang sudah dihitung modul lain (cache, retry backend, parser, ...)
+# tidak diinstrumentasi ulang: dibaca lewat collector saat scrape.
+#   span("llm")  -> histogram healthbridge_stage_seconds{stage="llm"}
+
+PREFIX = "healthbridge"
+# Batas bucket latency (detik): 0.5 ms .. 60 s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels[n] for n in self.labels) if self.labels else ()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_label_text(self.labels, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    # Nilai diset langsung (set/inc/dec) atau dibaca dari fn() saat scrape
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), fn=None):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+        self.fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        if self.fn is not None:
+            items = [((), self.fn())]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_label_text(self.labels, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # label -> [hitungan per bucket (+Inf terakhir), jumlah]
+
+    def observe(self, value, **labels):
+        self.observe_key(self._key(labels), value)
+
+    def observe_key(self, key, value):
+        # Versi cepat: key = tuple nilai label sesuai urutan self.labels
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(counts), total)) for k, (counts, total) in self._series.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_label_text(self.labels + ('le',), key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.add(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=(), fn=None):
+        return self.add(Gauge(name, help_text, labels, fn))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self.add(Histogram(name, help_text, labels, buckets))
+
+    def collector(self, fn):
+        # fn() -> [(nama, tipe, help, {label_tuple: nilai}, nama_label)] saat scrape
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for fn in self.collectors:
+            try:
+                families = fn()
+            except Exception as e:
+                lines.append(f"# collector {getattr(fn, '__name__', fn)} gagal: {e}")
+                continue
+            for name, kind, help_text, values, label_names in families:
+                full = f"{PREFIX}_{name}"
+                lines += [f"# HELP {full} {help_text}", f"# TYPE {full} {kind}"]
+                lines += [f"{full}{_label_text(label_names, k)} {v}" for k, v in values.items()]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+ENABLED = True
+
+STAGE_SECONDS = REGISTRY.histogram("stage_seconds", "Durasi per tahap analisis", ("stage",))
+REQUEST_SECONDS = REGISTRY.histogram("http_request_seconds", "Durasi request HTTP", ("method", "route", "status"))
+REQUESTS_INFLIGHT = REGISTRY.gauge("http_requests_inflight", "Request HTTP yang sedang diproses")
+LLM_CALLS = REGISTRY.counter("llm_calls_total", "Panggilan LLM per hasil", ("mode", "outcome"))
+
+
+class span:
+    # with span("prompt"): ...  -> durasi masuk STAGE_SECONDS{stage="prompt"}.
+    # Kelas (bukan contextmanager generator) supaya murah; bisa dipakai di async.
+    __slots__ = ("key", "start")
+
+    def __init__(self, stage):
+        self.key = (stage,)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if ENABLED:
+            STAGE_SECONDS.observe_key(self.key, time.perf_counter() - self.start)
+        return False
+
+
+def observe_stage(stage, seconds):
+    # Untuk tahap yang tidak pas dibungkus `with` (mis. stream di generator async)
+    if ENABLED:
+        STAGE_SECONDS.observe_key((stage,), seconds)
+
+
+def set_enabled(enabled):
+    global ENABLED
+    ENABLED = enabled
+
+
+# --- MIDDLEWARE HTTP (ASGI) ---
+class MetricsMiddleware:
+    # Durasi & jumlah request per route template ("/analyze/{nik}", bukan per
+    # NIK, supaya jumlah seri tetap kecil). Stream dihitung sampai selesai.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        REQUESTS_INFLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_INFLIGHT.dec()
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"],
+                                    route=getattr(route, "path", "tidak_dikenal"), status=status[0])
+
+
+# --- SAMPLING PROFILER ---
+class SamplingProfiler:
+    # Ambil stack semua thread tiap `interval` detik selama `seconds` detik,
+    # hasilnya format "folded" (baris: frame;frame;frame jumlah) yang bisa
+    # langsung dibuat flamegraph (flamegraph.pl / speedscope). Thread event
+    # loop ikut tersampel, jadi kode async yang memblokir loop kelihatan.
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+
+    def sample(self, seconds, interval=None):
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Profiler sedang berjalan")
+        try:
+            me = threading.get_ident()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = _Tally()
+            samples = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    frames = traceback.extract_stack(frame, limit=self.max_depth)
+                    path = ";".join(f"{f.name} ({f.filename.rsplit('/', 1)[-1]}:{f.lineno})" for f in frames)
+                    stacks[f"{names.get(ident, ident)};{path}"] += 1
+                samples += 1
+                time.sleep(interval or self.interval)
+            return samples, stacks
+        finally:
+            self._lock.release()
+
+    def folded(self, seconds, interval=None):
+        samples, stacks = self.sample(seconds, interval)
+        lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+        return f"# {samples} sampel, interval {(interval or self.interval) * 1000:g} ms\n" + "\n".join(lines) + "\n"
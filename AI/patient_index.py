@@ -0,0 +1,437 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from collections.abc import Mapping
+
+# --- FORMAT INDEX TERKOMPILASI ---
+# <bundle>.idx : header + tabel NIK terurut (key, offset, panjang) -> binary search
+# <bundle>.rec : header + record pasien (JSON ringkas) berurutan
+# <bundle>.hist: riwayat tanda vital (kolom VitalHistory, slot = posisi NIK)
+# Tabel referensi Patient (id -> posisi NIK) ikut di .idx setelah tabel NIK,
+# supaya delta ingest yang merujuk pasien lewat urn:uuid tetap dikenali.
+#
+# Ketiga file di-mmap read-only, jadi beberapa worker uvicorn berbagi
+# halaman yang sama lewat page cache OS (tidak ada salinan dict per proses).
+# Tiap header membawa build id yang sama: tiga file dari build berbeda
+# (rebuild yang baru setengah di-rename) ditolak saat dibuka.
+
+MAGIC = b"HBIDX001"
+VERSION = 6
+KEY_SIZE = 32
+# magic, versi, jumlah, ukuran sumber, mtime_ns sumber, sampel sumber,
+# sidik jari sumber (sha256 penuh), jumlah referensi, build id
+HEADER = struct.Struct("<8sIIQQ32s32sI16s")
+# Posisi ukuran & mtime sumber di header (ditulis ulang oleh verify())
+SIZE_AT = struct.calcsize("<8sII")
+MTIME_AT = struct.calcsize("<8sIIQ")
+ENTRY = struct.Struct(f"<{KEY_SIZE}sQI")
+# Referensi: 16 byte (UUID mentah / blake2b id lain) -> posisi NIK
+REF = struct.Struct("<16sI")
+REC_MAGIC = b"HBREC001"
+# magic, build id
+REC_HEADER = struct.Struct("<8s16s")
+HIST_MAGIC = b"HBHIS002"
+# magic, build id, jumlah slot, jumlah baris, jumlah pasien, jumlah nilai unik
+HIST_HEADER = struct.Struct("<8s16sIQQI")
+# (nama kolom, tipe array), urutan sama dengan isi file .hist. Tiap kolom
+# dimulai di batas 8 byte (memoryview.cast langsung di atas mmap)
+HIST_COLUMNS = (("head", "i"), ("latest", "q"), ("time", "q"), ("offset", "h"),
+                ("key", "B"), ("value", "I"), ("prev", "i"))
+HIST_ALIGN = 8
+# Sidik jari = sha256 seluruh isi file, dibaca per potongan (memori tetap kecil).
+# Dihitung saat build, dan di thread latar (verify) kalau mtime sumber berubah.
+FINGERPRINT_CHUNK = 1 << 20
+# Sampel = ukuran + 1 MiB awal & akhir + 16 blok 64 KiB tersebar rata (~3 MiB
+# dibaca, berapa pun ukuran file): cek murah saat startup kalau mtime berubah
+# (file di-copy ke container, checkout ulang).
+SAMPLE_EDGE = 1 << 20
+SAMPLE_BLOCK = 1 << 16
+SAMPLE_SPREAD = 16
+
+
+def index_paths(source_path, out_dir=None):
+    base = os.path.basename(source_path)
+    folder = out_dir or os.getenv("INDEX_DIR") or os.path.dirname(os.path.abspath(source_path))
+    return os.path.join(folder, base + ".idx"), os.path.join(folder, base + ".rec")
+
+
+def history_path(idx_path):
+    return idx_path[:-len(".idx")] + ".hist"
+
+
+def ref_key(key):
+    # Kunci PatientRefs (16 byte UUID atau string id) -> 16 byte tetap
+    if isinstance(key, bytes) and len(key) == 16:
+        return key
+    return hashlib.blake2b(str(key).encode('utf-8'), digest_size=16).digest()
+
+
+def source_fingerprint(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(FINGERPRINT_CHUNK):
+            h.update(chunk)
+    return h.digest()
+
+
+def source_sample(path):
+    size = os.path.getsize(path)
+    h = hashlib.sha256(struct.pack("<Q", size))
+    with open(path, 'rb') as f:
+        if size <= 2 * SAMPLE_EDGE + SAMPLE_SPREAD * SAMPLE_BLOCK:
+            while chunk := f.read(FINGERPRINT_CHUNK):
+                h.update(chunk)
+            return h.digest()
+        spots = [(0, SAMPLE_EDGE)]
+        spots += [(size * i // (SAMPLE_SPREAD + 1), SAMPLE_BLOCK) for i in range(1, SAMPLE_SPREAD + 1)]
+        spots.append((size - SAMPLE_EDGE, SAMPLE_EDGE))
+        for at, length in spots:
+            f.seek(at)
+            h.update(f.read(length))
+    return h.digest()
+
+
+def write_aligned(f, data):
+    # Tulis lalu isi nol sampai batas HIST_ALIGN
+    f.write(data)
+    pad = -f.tell() % HIST_ALIGN
+    if pad:
+        f.write(b"\0" * pad)
+
+
+# --- BUILD ---
+def build_index(source_path, out_dir=None):
+    # Parsing sama dengan startup biasa: tanda vital terbaru (timestamp) yang
+    # menang, riwayat & referensi UUID pasien ikut disimpan
+    from fhir_parser import parse_bundle_file
+    from ingest import PatientRefs, VitalHistory
+    history = VitalHistory()
+    database, uuid_to_nik = parse_bundle_file(source_path, on_vital=history.add)
+
+    idx_path, rec_path = index_paths(source_path, out_dir)
+    stat = os.stat(source_path)
+    sample = source_sample(source_path)
+    fingerprint = source_fingerprint(source_path)
+    build_id = os.urandom(16)
+
+    entries = []
+    niks = []
+    offset = REC_HEADER.size
+    # Tulis ke file sementara dulu lalu os.replace, supaya worker yang sedang
+    # membuka index tidak pernah melihat file setengah jadi. Rename tiga file
+    # tidak atomic bersama-sama -> build id di tiap header dicek saat dibuka.
+    with open(rec_path + ".tmp", 'wb') as rec:
+        rec.write(REC_HEADER.pack(REC_MAGIC, build_id))
+        for nik in sorted(database):
+            key = nik.encode('utf-8')
+            if len(key) > KEY_SIZE:
+                print(f"⚠️ NIK terlalu panjang, dilewati: {nik}")
+                continue
+            blob = json.dumps(database[nik], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            rec.write(blob)
+            entries.append(ENTRY.pack(key, offset, len(blob)))
+            niks.append(nik)
+            offset += len(blob)
+
+    position = {nik: i for i, nik in enumerate(niks)}
+    refs = sorted((ref_key(PatientRefs._key(ref)), position[nik])
+                  for ref, nik in uuid_to_nik.items() if nik in position)
+    with open(idx_path + ".tmp", 'wb') as idx:
+        idx.write(HEADER.pack(MAGIC, VERSION, len(entries), stat.st_size, stat.st_mtime_ns, sample, fingerprint,
+                              len(refs), build_id))
+        idx.write(b"".join(entries))
+        idx.write(b"".join(REF.pack(key, pos) for key, pos in refs))
+
+    columns = history.export(niks)
+    # Nilai unik: offset (Q) + blob UTF-8, didecode per nilai saat dibaca
+    values = [str(v).encode('utf-8') for v in columns["values"]]
+    value_offsets = array('Q', [0])
+    for v in values:
+        value_offsets.append(value_offsets[-1] + len(v))
+    patients = sum(1 for row in columns["head"] if row >= 0)
+    hist_path = history_path(idx_path)
+    with open(hist_path + ".tmp", 'wb') as hist:
+        write_aligned(hist, HIST_HEADER.pack(HIST_MAGIC, build_id, len(niks), len(columns["time"]), patients,
+                                             len(values)))
+        for name, _ in HIST_COLUMNS:
+            write_aligned(hist, columns[name].tobytes())
+        write_aligned(hist, value_offsets.tobytes())
+        hist.write(b"".join(values))
+
+    os.replace(rec_path + ".tmp", rec_path)
+    os.replace(hist_path + ".tmp", hist_path)
+    os.replace(idx_path + ".tmp", idx_path)
+    return idx_path, rec_path, len(entries)
+
+
+# --- KOLOM .hist DI ATAS MMAP ---
+class MappedColumn:
+    # Kolom VitalHistory dari file .hist tanpa disalin: baris file dibaca lewat
+    # memoryview (read-only), yang diubah ingest (head/latest/prev) dicatat di
+    # dict, baris baru masuk array biasa di memori.
+    __slots__ = ("_base", "_size", "_changed", "_tail")
+
+    def __init__(self, base, code):
+        self._base = base
+        self._size = len(base)
+        self._changed = {}
+        self._tail = array(code)
+
+    def __len__(self):
+        return self._size + len(self._tail)
+
+    def __getitem__(self, i):
+        if i >= self._size:
+            return self._tail[i - self._size]
+        value = self._changed.get(i)
+        return self._base[i] if value is None else value
+
+    def __setitem__(self, i, value):
+        if i >= self._size:
+            self._tail[i - self._size] = value
+        else:
+            self._changed[i] = value
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, value):
+        self._tail.append(value)
+
+    def extend(self, values):
+        self._tail.extend(values)
+
+
+class MappedValues:
+    # Nilai unik riwayat ("70 kg", ...): blob UTF-8 + offset, didecode per nilai
+    __slots__ = ("_blob", "_offsets", "_tail")
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+        self._tail = []
+
+    def __len__(self):
+        return len(self._offsets) - 1 + len(self._tail)
+
+    def __getitem__(self, i):
+        base = len(self._offsets) - 1
+        if i >= base:
+            return self._tail[i - base]
+        return str(self._blob[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, value):
+        self._tail.append(value)
+
+
+# --- LOADER ---
+def map_file(path):
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class CompiledPatientIndex(Mapping):
+    # Dipakai persis seperti dict DATABASE_CACHE: .get(nik), [nik], len(), in
+
+    def __init__(self, idx_path, rec_path, hist_path=None):
+        # Ketiga file dibuka (di-mmap) sekaligus: rebuild yang me-rename file
+        # sesudahnya tidak mengubah apa yang dibaca objek ini
+        hist_path = hist_path or history_path(idx_path)
+        self._idx = map_file(idx_path)
+        magic, version = struct.unpack_from("<8sI", self._idx, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Format index tidak dikenal: {idx_path}")
+        (_, _, count, size, mtime_ns, sample, fingerprint,
+         ref_count, build_id) = HEADER.unpack_from(self._idx, 0)
+        self.idx_path = idx_path
+        self.count = count
+        self.ref_count = ref_count
+        self._refs_at = HEADER.size + count * ENTRY.size
+        self.source_size = size
+        self.source_mtime_ns = mtime_ns
+        self.source_sample = sample
+        self.source_fingerprint = fingerprint
+        self.build_id = build_id
+        # False = sumber baru dicek lewat sampel, sha256 penuh belum (verify)
+        self.verified = False
+
+        self._rec = map_file(rec_path)
+        if REC_HEADER.unpack_from(self._rec, 0) != (REC_MAGIC, build_id):
+            raise ValueError(f"File record bukan dari build yang sama dengan index: {rec_path}")
+        self._hist = map_file(hist_path)
+        magic, hist_build, slots = struct.unpack_from("<8s16sI", self._hist, 0)
+        if magic != HIST_MAGIC or hist_build != build_id or slots != count:
+            raise ValueError(f"File riwayat bukan dari build yang sama dengan index: {hist_path}")
+
+    def _key_at(self, i):
+        return self._idx[HEADER.size + i * ENTRY.size:HEADER.size + i * ENTRY.size + KEY_SIZE].rstrip(b"\0")
+
+    def _find(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._key_at(lo) == key:
+            return lo
+        return -1
+
+    def __getitem__(self, nik):
+        if not isinstance(nik, str):
+            raise KeyError(nik)
+        i = self._find(nik.encode('utf-8'))
+        if i < 0:
+            raise KeyError(nik)
+        _, offset, length = ENTRY.unpack_from(self._idx, HEADER.size + i * ENTRY.size)
+        return json.loads(self._rec[offset:offset + length])
+
+    def __contains__(self, nik):
+        return isinstance(nik, str) and self._find(nik.encode('utf-8')) >= 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self._key_at(i).decode('utf-8')
+
+    # --- Referensi Patient & riwayat tanda vital ---
+    def nik_for_ref(self, key):
+        # key = kunci PatientRefs; binary search di tabel referensi
+        key = ref_key(key)
+        lo, hi = 0, self.ref_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            at = self._refs_at + mid * REF.size
+            if self._idx[at:at + 16] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.ref_count:
+            found, position = REF.unpack_from(self._idx, self._refs_at + lo * REF.size)
+            if found == key:
+                return self._key_at(position).decode('utf-8')
+        return None
+
+    def refs(self):
+        from ingest import PatientRefs
+        return PatientRefs(fallback=self.nik_for_ref)
+
+    def position(self, nik):
+        return self._find(nik.encode('utf-8')) if isinstance(nik, str) else -1
+
+    def history(self):
+        # VitalHistory langsung di atas kolom .hist yang di-mmap: tidak ada
+        # salinan / decode saat startup, ingest menambah baris di memori
+        from ingest import VitalHistory
+        _, _, slots, rows, patients, value_count = HIST_HEADER.unpack_from(self._hist, 0)
+        view = memoryview(self._hist)
+        columns, offset = {"patients": patients}, HIST_HEADER.size
+        width = len(VitalHistory.KEYS)
+
+        def take(code, n):
+            nonlocal offset
+            start = offset + -offset % HIST_ALIGN
+            offset = start + n * struct.calcsize(code)
+            return view[start:offset].cast(code)
+
+        for name, code in HIST_COLUMNS:
+            n = slots * width if name == "latest" else slots if name == "head" else rows
+            columns[name] = MappedColumn(take(code, n), code)
+        offsets = take("Q", value_count + 1)
+        columns["values"] = MappedValues(view[offset:], offsets)
+        return VitalHistory.from_columns(columns, self.position)
+
+    def is_fresh(self, source_path):
+        # Cek murah untuk startup. mtime sama -> cocok tanpa membaca file.
+        # mtime berubah (mis. file di-copy ke container) -> ukuran + sampel isi;
+        # edit di tengah file dengan ukuran sama bisa lolos sampel, jadi
+        # verify() (sha256 penuh) menyusul di thread latar.
+        stat = os.stat(source_path)
+        if stat.st_size != self.source_size:
+            return False
+        if stat.st_mtime_ns == self.source_mtime_ns:
+            self.verified = True
+            return True
+        return source_sample(source_path) == self.source_sample
+
+    def verify(self, source_path):
+        # sha256 penuh. Cocok -> mtime baru dicatat di header (start berikutnya
+        # di mesin ini tidak perlu hash lagi). Tidak cocok -> ukuran di header
+        # dinolkan supaya index tidak dipakai lagi sampai di-build ulang.
+        stat = os.stat(source_path)
+        ok = stat.st_size == self.source_size and source_fingerprint(source_path) == self.source_fingerprint
+        if ok:
+            self.verified = True
+            self._patch_header(MTIME_AT, stat.st_mtime_ns)
+        else:
+            self._patch_header(SIZE_AT, 0)
+        return ok
+
+    def _patch_header(self, at, value):
+        # Hanya kalau file di disk masih build yang sama (bukan hasil rebuild)
+        try:
+            with open(self.idx_path, 'r+b') as f:
+                if HEADER.unpack(f.read(HEADER.size))[-1] != self.build_id:
+                    return
+                f.seek(at)
+                f.write(struct.pack("<Q", value))
+        except (OSError, struct.error):
+            pass  # folder index read-only: cukup tidak dicatat
+
+
+def open_compiled_index(source_path, out_dir=None):
+    # None kalau index belum ada / sudah basi (sumber berubah)
+    idx_path, rec_path = index_paths(source_path, out_dir)
+    if not all(os.path.exists(p) for p in (idx_path, rec_path, history_path(idx_path))):
+        return None
+    try:
+        index = CompiledPatientIndex(idx_path, rec_path)
+    except (ValueError, struct.error, OSError) as e:
+        print(f"⚠️ Index terkompilasi rusak ({e}), diabaikan.")
+        return None
+    if not index.is_fresh(source_path):
+        print(f"⚠️ Index terkompilasi basi (file sumber berubah): {idx_path}")
+        return None
+    return index
+
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Build / cek index pasien terkompilasi")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="Compile bundle FHIR jadi index biner")
+    p_build.add_argument("source")
+    p_build.add_argument("--out-dir")
+    p_info = sub.add_parser("info", help="Tampilkan info index")
+    p_info.add_argument("source")
+    p_info.add_argument("--out-dir")
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        start = time.perf_counter()
+        idx_path, rec_path, count = build_index(args.source, args.out_dir)
+        print(f"✅ Index selesai: {count} pasien dalam {time.perf_counter() - start:.2f} detik")
+        print(f"   {idx_path}\n   {rec_path}\n   {history_path(idx_path)}")
+    else:
+        index = open_compiled_index(args.source, args.out_dir)
+        if index is None:
+            print("❌ Index belum ada / basi. Jalankan: python patient_index.py build <file>")
+        else:
+            print(f"✅ Index valid: {len(index)} pasien")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+from collections.abc import Mapping
+
+# --- RECORD PASIEN RINGKAS ---
+# Di 1 juta pasien, dict bersarang + string berulang ("Paracetamol 500mg",
+# "Hipertensi Grade 2", ...) mendominasi RSS backend. Di sini:
+# - tiap pasien = satu objek __slots__ dengan tanda vital berupa angka
+# - obat (kfa, nama, diagnosa), alergi dan satuan disimpan sekali di
+#   Vocabulary, record hanya memegang nomor id-nya
+# - bentuk JSON lama dibuat ulang hanya saat record diambil, mis. untuk prompt
+
+GENDER_KODE = {"-": 0, "male": 1, "female": 2}
+GENDER_NAMA = {v: k for k, v in GENDER_KODE.items()}
+
+
+class Vocabulary:
+    # Dictionary encoding: nilai -> id (int), id -> nilai
+    def __init__(self):
+        self._ids = {}
+        self.values = []
+
+    def id_of(self, value):
+        i = self._ids.get(value)
+        if i is None:
+            i = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+    def __len__(self):
+        return len(self.values)
+
+
+class PatientRecord:
+    __slots__ = ("nama", "nik", "gender", "tanggal_lahir", "alergi",
+                 "tb", "bb", "sistole", "diastole", "medis")
+
+    # tb/bb = (angka, id satuan) atau None; sistole/diastole = angka atau None;
+    # alergi = id di vocab alergi; medis = tuple id di vocab obat
+
+
+class CompactPatientDB(Mapping):
+    # Mapping NIK -> dict (bentuk JSON lama), jadi DATABASE_CACHE.get(nik)
+    # tetap berfungsi. Record yang bentuknya tidak standar disimpan apa adanya.
+
+    def __init__(self):
+        self._records = {}
+        self.strings = {}          # interning nama & tanggal lahir
+        self.units = Vocabulary()
+        self.allergies = Vocabulary()
+        self.meds = Vocabulary()
+
+    @classmethod
+    def from_database(cls, database):
+        db = cls()
+        # pop: record dict langsung dilepas setelah dikonversi, supaya
+        # puncak memori tidak dua kali lipat (urutan pasien tetap sama)
+        for nik in list(database):
+            db.put(nik, database.pop(nik))
+        return db
+
+    def _intern(self, text):
+        return self.strings.setdefault(text, text)
+
+    def _encode_quantity(self, text):
+        if text == "-":
+            return None
+        value, unit = text.split(" ", 1)
+        number = int(value) if value.lstrip("-").isdigit() else float(value)
+        q = (number, self.units.id_of(unit))
+        if self._decode_quantity(q) != text:
+            raise ValueError("angka tanda vital tidak standar")
+        return q
+
+    def _encode(self, data):
+        profil = data["profil"]
+        vital = data["tanda_vital"]
+        if set(data) != {"profil", "tanda_vital", "medis"} or \
+                set(profil) != {"nama", "nik", "gender", "tanggal_lahir", "alergi"}:
+            raise ValueError("bentuk record tidak standar")
+
+        rec = PatientRecord()
+        rec.nama = self._intern(profil["nama"])
+        rec.nik = profil["nik"]
+        rec.gender = GENDER_KODE[profil["gender"]]
+        rec.tanggal_lahir = self._intern(profil["tanggal_lahir"])
+        rec.alergi = self.allergies.id_of(tuple(profil["alergi"]))
+        rec.tb = self._encode_quantity(vital["tb"])
+        rec.bb = self._encode_quantity(vital["bb"])
+        if vital["tensi"] == "-":
+            rec.sistole = rec.diastole = None
+        else:
+            value, unit = vital["tensi"].split(" ", 1)
+            if unit != "mmHg":
+                raise ValueError("satuan tensi tidak standar")
+            sys, dia = value.split("/")
+            rec.sistole, rec.diastole = int(sys), int(dia)
+            if f"{rec.sistole}/{rec.diastole}" != value:
+                raise ValueError("angka tensi tidak standar")
+        medis = []
+        for m in data["medis"]:
+            if set(m) != {"obat", "kfa", "diagnosa"}:
+                raise ValueError("item medis tidak standar")
+            medis.append(self.meds.id_of((m["obat"], m["kfa"], m["diagnosa"])))
+        rec.medis = tuple(medis)
+        return rec
+
+    def _decode_quantity(self, q):
+        if q is None:
+            return "-"
+        return f"{q[0]} {self.units.values[q[1]]}"
+
+    def _decode(self, rec):
+        return {
+            "profil": {
+                "nama": rec.nama,
+                "nik": rec.nik,
+                "gender": GENDER_NAMA[rec.gender],
+                "tanggal_lahir": rec.tanggal_lahir,
+                "alergi": list(self.allergies.values[rec.alergi])
+            },
+            "tanda_vital": {
+                "tb": self._decode_quantity(rec.tb),
+                "bb": self._decode_quantity(rec.bb),
+                "tensi": "-" if rec.sistole is None else f"{rec.sistole}/{rec.diastole} mmHg"
+            },
+            "medis": [
+                {"obat": obat, "kfa": kfa, "diagnosa": diagnosa}
+                for obat, kfa, diagnosa in (self.meds.values[i] for i in rec.medis)
+            ]
+        }
+
+    def put(self, nik, data):
+        try:
+            self._records[nik] = self._encode(data)
+        except (KeyError, ValueError, TypeError, AttributeError):
+            self._records[nik] = data
+
+    def names(self):
+        # (NIK, nama) tanpa decode record (index pencarian)
+        for nik, rec in self._records.items():
+            yield nik, rec.nama if isinstance(rec, PatientRecord) else rec.get("profil", {}).get("nama", "")
+
+    def record(self, nik):
+        # Objek mentah (PatientRecord atau dict) tanpa konversi
+        return self._records.get(nik)
+
+    def __getitem__(self, nik):
+        rec = self._records[nik]
+        return self._decode(rec) if isinstance(rec, PatientRecord) else rec
+
+    def __contains__(self, nik):
+        return nik in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records)
@@ -0,0 +1,318 @@
+import threading
+from array import array
+
+import numpy as np
+
+from rule_engine import ALERGI_GOLONGAN, KFA_VOCAB, RULES
+
+# --- KNOWLEDGE GRAPH POPULASI ---
+# Graph bipartit: pasien <-> entitas (obat per kode KFA, diagnosa, alergi).
+# Node memakai ID integer, edge disimpan sebagai CSR (indptr + indices
+# NumPy) dua arah: pasien -> entitas dan entitas -> pasien. Query seperti
+# "pasien lain yang memakai Clopidogrel + NSAID" cukup gather array + mask,
+# tanpa dict networkx per node.
+#
+# Perubahan dari ingest ditampung di overlay kecil (edge baru per pasien);
+# kalau overlay sudah terlalu besar, graph dibangun ulang saat query berikutnya.
+
+JENIS_ENTITAS = ["obat", "diagnosa", "alergi"]
+JENIS_KODE = {j: i for i, j in enumerate(JENIS_ENTITAS)}
+# Overlay > 5% pasien (minimal 1000) -> lebih murah bangun ulang
+REBUILD_RATIO = 0.05
+REBUILD_MIN = 1000
+
+
+def _csr(src, dst, n_src):
+    # (src, dst) sudah unik -> indptr, indices (indices urut per src)
+    order = np.lexsort((dst, src))
+    counts = np.bincount(src, minlength=n_src)
+    indptr = np.zeros(n_src + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, dst[order].astype(np.int32)
+
+
+def _gather(indptr, indices, nodes):
+    # Gabungan tetangga beberapa node sekaligus (tanpa loop Python)
+    nodes = nodes[nodes < len(indptr) - 1]
+    starts = indptr[nodes]
+    lens = indptr[nodes + 1] - starts
+    total = int(lens.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int32)
+    base = np.repeat(starts - (np.cumsum(lens) - lens), lens)
+    return indices[base + np.arange(total)]
+
+
+class PopulationGraph:
+    def __init__(self, niks, entities, pat_idx, ent_idx):
+        # niks: array S32 (ID pasien = posisi); entities: [(jenis, key, label)]
+        self.niks = niks
+        self.entities = entities
+        self.entity_index = {(j, k): i for i, (j, k, _) in enumerate(entities)}
+        self.entity_kind = np.array([JENIS_KODE[j] for j, _, _ in entities], dtype=np.int8)
+        self.base_patients = len(niks)
+        self.base_entities = len(entities)
+
+        pat_idx = np.asarray(pat_idx, dtype=np.int64)
+        ent_idx = np.asarray(ent_idx, dtype=np.int64)
+        # Edge ganda (obat sama diresepkan dua kali) cukup satu
+        key = np.unique(pat_idx * max(len(entities), 1) + ent_idx)
+        pat_idx, ent_idx = key // max(len(entities), 1), key % max(len(entities), 1)
+        self.pat_indptr, self.pat_indices = _csr(pat_idx, ent_idx, len(niks))
+        self.ent_indptr, self.ent_indices = _csr(ent_idx, pat_idx, len(entities))
+        self.edges = len(key)
+
+        order = np.argsort(niks, kind="stable")
+        self._sorted, self._order = niks[order], order
+
+        # Overlay dari ingest
+        self._stale = np.zeros(len(niks), dtype=bool)   # edge dasar pasien ini sudah tidak berlaku
+        self._extra_fwd = {}                            # pid -> array eid
+        self._extra_rev = {}                            # eid -> set(pid)
+        self._extra_ids = np.zeros(0, dtype=np.int64)
+        self._added_niks = []                           # pasien baru (pid >= base_patients)
+        self._added_pid = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self.base_patients + len(self._added_niks)
+
+    # --- BUILD ---
+    @classmethod
+    def build(cls, database):
+        niks = []
+        entities, index = [], {}
+        pat_idx, ent_idx = array('i'), array('i')
+
+        for pid, nik in enumerate(database):
+            niks.append(nik)
+            for eid in cls._record_entities(database[nik], entities, index):
+                pat_idx.append(pid)
+                ent_idx.append(eid)
+
+        return cls(np.array(niks, dtype="S32"), entities,
+                   np.frombuffer(pat_idx, dtype=np.int32), np.frombuffer(ent_idx, dtype=np.int32))
+
+    @staticmethod
+    def _record_entities(record, entities, index):
+        # ID entitas untuk satu record; entitas baru ditambahkan ke daftar
+        def eid(jenis, key, label):
+            i = index.get((jenis, key))
+            if i is None:
+                i = index[(jenis, key)] = len(entities)
+                entities.append((jenis, key, label))
+            return i
+
+        out = []
+        for item in record.get("medis", []):
+            out.append(eid("obat", item.get("kfa", "-"), item.get("obat", "-")))
+            diagnosa = item.get("diagnosa", "-")
+            if diagnosa and diagnosa != "-":
+                out.append(eid("diagnosa", diagnosa, diagnosa))
+        for alergi in record.get("profil", {}).get("alergi", []):
+            out.append(eid("alergi", alergi.strip().lower(), alergi.strip()))
+        return out
+
+    # --- UPDATE DARI INGEST ---
+    def update(self, records):
+        # records: NIK -> record terbaru. Hasil False kalau overlay sudah
+        # terlalu besar (pemanggil sebaiknya build ulang).
+        with self._lock:
+            for nik, record in records.items():
+                pid = self.patient_id(nik)
+                if pid is None:
+                    pid = len(self)
+                    self._added_pid[nik] = pid
+                    self._added_niks.append(nik)
+                elif pid < self.base_patients:
+                    self._stale[pid] = True
+                for e in self._extra_fwd.pop(pid, ()):
+                    self._extra_rev[int(e)].discard(pid)
+                eids = np.unique(np.array(
+                    self._record_entities(record, self.entities, self.entity_index), dtype=np.int32))
+                self._extra_fwd[pid] = eids
+                for e in eids:
+                    self._extra_rev.setdefault(int(e), set()).add(pid)
+            if len(self.entity_kind) < len(self.entities):
+                self.entity_kind = np.array([JENIS_KODE[j] for j, _, _ in self.entities], dtype=np.int8)
+            self._extra_ids = np.array(sorted(self._extra_fwd), dtype=np.int64)
+            return len(self._extra_fwd) <= max(REBUILD_MIN, REBUILD_RATIO * self.base_patients)
+
+    # --- LOOKUP ---
+    def patient_id(self, nik):
+        pid = self._added_pid.get(nik)
+        if pid is not None:
+            return pid
+        key = np.array([nik], dtype="S32")
+        at = int(np.searchsorted(self._sorted, key)[0])
+        if at < self.base_patients and self._sorted[at] == key[0]:
+            return int(self._order[at])
+        return None
+
+    def nik_of(self, pids):
+        return [self.niks[p].decode() if p < self.base_patients else self._added_niks[p - self.base_patients]
+                for p in pids]
+
+    def entity_ids(self, jenis, key):
+        # key: kode/teks persis, label, atau (obat) nama / golongan di KFA_VOCAB
+        if jenis not in JENIS_KODE:
+            raise ValueError(f"Jenis node tidak dikenal: {jenis}")
+        text = str(key).strip()
+        eid = self.entity_index.get((jenis, text.lower() if jenis == "alergi" else text))
+        if eid is not None:
+            return [eid]
+        lowered = text.lower()
+        found = []
+        for i, (j, k, label) in enumerate(self.entities):
+            if j != jenis:
+                continue
+            vocab = KFA_VOCAB.get(k, {}) if jenis == "obat" else {}
+            if lowered in (label.lower(), vocab.get("nama", "").lower(), vocab.get("golongan")):
+                found.append(i)
+        if not found:
+            raise KeyError(f"{jenis} '{key}' tidak ada di graph")
+        return found
+
+    def entity_info(self, eid):
+        jenis, key, label = self.entities[eid]
+        return {"jenis": jenis, "id": key, "label": label}
+
+    # --- TETANGGA ---
+    def _patient_neighbors(self, pids):
+        # pasien -> entitas (edge dasar yang masih berlaku + overlay)
+        pids = np.asarray(pids, dtype=np.int64)
+        base = pids[pids < self.base_patients]
+        base = base[~self._stale[base]]
+        parts = [_gather(self.pat_indptr, self.pat_indices, base)]
+        if len(self._extra_ids):
+            for p in np.intersect1d(pids, self._extra_ids):
+                parts.append(self._extra_fwd[int(p)])
+        return np.concatenate(parts)
+
+    def _entity_neighbors(self, eids):
+        # entitas -> pasien
+        eids = np.asarray(eids, dtype=np.int64)
+        pids = _gather(self.ent_indptr, self.ent_indices, eids)
+        pids = pids[~self._stale[pids]]
+        extra = set()
+        for e in eids:
+            extra |= self._extra_rev.get(int(e), set())
+        if extra:
+            pids = np.concatenate([pids, np.fromiter(extra, dtype=np.int32, count=len(extra))])
+        return pids
+
+    def patients_with(self, eids):
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self._entity_neighbors(eids)] = True
+        return mask
+
+    # --- QUERY ---
+    def k_hop(self, jenis, key, k=2, limit=50):
+        # BFS per lapis (semua node di satu lapis diproses sekaligus)
+        with self._lock:
+            seen_p = np.zeros(len(self), dtype=bool)
+            seen_e = np.zeros(len(self.entities), dtype=bool)
+            if jenis == "pasien":
+                pid = self.patient_id(key)
+                if pid is None:
+                    raise KeyError(f"Pasien NIK {key} tidak ada di graph")
+                frontier_p, frontier_e = np.array([pid]), np.zeros(0, dtype=np.int64)
+                seen_p[pid] = True
+            else:
+                frontier_p, frontier_e = np.zeros(0, dtype=np.int64), np.array(self.entity_ids(jenis, key))
+                seen_e[frontier_e] = True
+
+            hops = []
+            for hop in range(1, k + 1):
+                next_e = self._patient_neighbors(frontier_p)
+                next_p = self._entity_neighbors(frontier_e)
+                next_e = np.unique(next_e[~seen_e[next_e]])
+                next_p = np.unique(next_p[~seen_p[next_p]])
+                seen_e[next_e] = True
+                seen_p[next_p] = True
+                if len(next_e) == 0 and len(next_p) == 0:
+                    break
+                per_jenis = {"pasien": int(len(next_p))}
+                kinds = np.bincount(self.entity_kind[next_e], minlength=len(JENIS_ENTITAS))
+                per_jenis.update({j: int(kinds[i]) for i, j in enumerate(JENIS_ENTITAS) if kinds[i]})
+                hops.append({
+                    "hop": hop,
+                    "jumlah": int(len(next_p) + len(next_e)),
+                    "per_jenis": per_jenis,
+                    "contoh": [self.entity_info(int(e)) for e in next_e[:limit]]
+                              + [{"jenis": "pasien", "id": n} for n in self.nik_of(next_p[:max(0, limit - len(next_e))])]
+                })
+                frontier_p, frontier_e = next_p, next_e
+            return {"asal": {"jenis": jenis, "id": key}, "hop": hops}
+
+    def co_prescription(self, obat, top=20):
+        # Obat lain yang diresepkan bersama `obat` (jumlah pasien)
+        with self._lock:
+            eids = self.entity_ids("obat", obat)
+            pids = np.unique(self._entity_neighbors(eids))
+            other = self._patient_neighbors(pids)
+            counts = np.bincount(other, minlength=len(self.entities))
+            counts[eids] = 0
+            counts[self.entity_kind[:len(counts)] != JENIS_KODE["obat"]] = 0
+            idx = np.flatnonzero(counts)
+            idx = idx[np.argsort(-counts[idx], kind="stable")][:top]
+            return {
+                "obat": [self.entity_info(e) for e in eids],
+                "pasien": int(len(pids)),
+                "bersama": [
+                    dict(self.entity_info(int(e)), pasien=int(counts[e]),
+                         persen=round(100 * int(counts[e]) / len(pids), 1))
+                    for e in idx
+                ]
+            }
+
+    def interaction(self, a, b, limit=100):
+        # Pasien yang memakai (salah satu) obat A sekaligus (salah satu) obat B.
+        # a/b: kode KFA, nama obat, atau golongan; boleh list.
+        with self._lock:
+            ids_a = [e for spec in _as_list(a) for e in self.entity_ids("obat", spec)]
+            ids_b = [e for spec in _as_list(b) for e in self.entity_ids("obat", spec)]
+            mask = self.patients_with(ids_a) & self.patients_with(ids_b)
+            pids = np.flatnonzero(mask)
+            return {"jumlah": int(len(pids)), "pasien": self.nik_of(pids[:limit])}
+
+    def interaction_patterns(self, rules=RULES, limit=20):
+        # Pola dari tabel aturan: interaksi antar golongan & alergi vs golongan obat
+        with self._lock:
+            out = []
+            for rule in rules:
+                if rule["jenis"] == "interaksi":
+                    try:
+                        mask = (self.patients_with(self.entity_ids("obat", rule["golongan_a"]))
+                                & self.patients_with(self.entity_ids("obat", rule["golongan_b"])))
+                    except KeyError:
+                        mask = np.zeros(len(self), dtype=bool)
+                elif rule["jenis"] == "alergi_obat":
+                    mask = np.zeros(len(self), dtype=bool)
+                    for alergi, golongan in ALERGI_GOLONGAN.items():
+                        try:
+                            mask |= (self.patients_with(self.entity_ids("alergi", alergi))
+                                     & self.patients_with(self.entity_ids("obat", golongan)))
+                        except KeyError:
+                            continue
+                else:
+                    continue
+                pids = np.flatnonzero(mask)
+                out.append({"aturan": rule["id"], "status": rule["status"], "jumlah": int(len(pids)),
+                            "pasien": self.nik_of(pids[:limit])})
+            return out
+
+    def stats(self):
+        kinds = np.bincount(self.entity_kind, minlength=len(JENIS_ENTITAS))
+        return {
+            "pasien": len(self),
+            **{j: int(kinds[i]) for i, j in enumerate(JENIS_ENTITAS)},
+            "edge": int(self.edges),
+            "overlay": len(self._extra_fwd)
+        }
+
+
+def _as_list(value):
+    if isinstance(value, (list, tuple)):
+        return value
+    return [v for v in str(value).split(",") if v.strip()]
@@ -0,0 +1,203 @@
+import json
+import re
+import threading
+from collections import Counter
+
+# --- PEMBUAT KONTEKS PROMPT ---
+# Data pasien diserialisasi ringkas (tanpa indentasi & key berulang), dihitung
+# perkiraan tokennya, dan riwayat obat dipangkas kalau melewati anggaran:
+# resep terbaru tetap lengkap, resep lama diringkas jadi "nama xjumlah".
+# Format:
+#   compact = baris teks per bagian (paling hemat, default)
+#   json    = JSON tanpa spasi
+#   legacy  = json.dumps(indent=2) seperti sebelumnya
+
+PROMPT_FORMATS = ("compact", "json", "legacy")
+# Perbandingan dengan format legacy (serialisasi indent=2 ulang) hanya dihitung
+# untuk 1 dari N request supaya metrik tidak menambah biaya tiap request.
+# Perbandingan lengkap semua pasien: benchmark/bench_prompt.py
+LEGACY_SAMPLE_EVERY = 64
+# Porsi anggaran yang disisakan untuk ringkasan resep lama saat dipangkas
+SUMMARY_SHARE = 0.2
+
+# Perkiraan token ala BPE: kata ~4 huruf per token, tanda baca 1 token,
+# deretan spasi (indentasi) ikut dihitung. Cukup untuk anggaran & metrik.
+TOKEN_RE = re.compile(r"\w+|\s{2,}|[^\w\s]")
+
+
+def estimate_tokens(text):
+    n = 0
+    for m in TOKEN_RE.finditer(text):
+        w = m.group()
+        n += (len(w) + 3) // 4 if len(w) > 1 else 1
+    return n
+
+
+def _group_meds(medis):
+    # Resep identik (obat, KFA, diagnosa sama) digabung jadi satu baris + jumlah.
+    # Urutan mengikuti kemunculan terakhir (paling baru di akhir).
+    counts = Counter()
+    last = {}
+    for i, m in enumerate(medis):
+        key = (m.get("obat", "-"), m.get("kfa", "-"), m.get("diagnosa", "-"))
+        counts[key] += 1
+        last[key] = i
+    return [(key, counts[key]) for key in sorted(last, key=last.get)]
+
+
+def _summary_names(old):
+    # Resep lama yang tidak muat: cukup nama obat + jumlah, terbanyak dulu
+    per_obat = Counter()
+    for (obat, kfa, _), n in old:
+        per_obat[f"{obat} [{kfa}]"] += n
+    return [f"{name} x{n}" for name, n in per_obat.most_common()]
+
+
+def _med_text(item, fmt):
+    (obat, kfa, diagnosa), n = item
+    if fmt == "json":
+        med = {"obat": obat, "kfa": kfa, "diagnosa": diagnosa}
+        if n > 1:
+            med["jumlah"] = n
+        return json.dumps(med, separators=(",", ":"), ensure_ascii=False)
+    return f"- {obat} [{kfa}] -> {diagnosa}" + (f" (x{n})" if n > 1 else "")
+
+
+def serialize(data, fmt="compact", meds=None, summary=None):
+    # meds: daftar ((obat, kfa, diagnosa), jumlah) yang ditampilkan lengkap
+    if fmt == "legacy":
+        return json.dumps(data, indent=2)
+    if fmt == "json":
+        if meds is not None:
+            data = dict(data, medis=[json.loads(_med_text(item, "json")) for item in meds])
+            if summary:
+                data["riwayat_lama"] = summary
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+    profil = data.get("profil", {})
+    vital = data.get("tanda_vital", {})
+    lines = [
+        f"NIK: {profil.get('nik', '-')}",
+        f"Nama: {profil.get('nama', '-')} | Gender: {profil.get('gender', '-')} | Lahir: {profil.get('tanggal_lahir', '-')}",
+        f"Alergi: {', '.join(profil.get('alergi', [])) or '-'}",
+        f"Vital: TB {vital.get('tb', '-')} | BB {vital.get('bb', '-')} | Tensi {vital.get('tensi', '-')}",
+    ]
+    if meds is None:
+        meds = _group_meds(data.get("medis", []))
+    if meds or summary:
+        lines.append("Obat (nama [KFA] -> diagnosa):")
+        lines.extend(_med_text(item, fmt) for item in meds)
+    else:
+        lines.append("Obat: -")
+    if summary:
+        lines.append(f"Riwayat obat lama: {summary}")
+    # Field tambahan di luar bentuk standar tetap ikut, tidak dibuang diam-diam
+    extra = {k: v for k, v in data.items() if k not in ("profil", "tanda_vital", "medis")}
+    extra_profil = {k: v for k, v in profil.items() if k not in ("nama", "nik", "gender", "tanggal_lahir", "alergi")}
+    if extra_profil:
+        extra["profil"] = extra_profil
+    if extra:
+        lines.append(f"Lainnya: {json.dumps(extra, separators=(',', ':'), ensure_ascii=False)}")
+    return "\n".join(lines)
+
+
+class PromptBuilder:
+    def __init__(self, fmt="compact", max_tokens=3000):
+        if fmt not in PROMPT_FORMATS:
+            raise ValueError(f"PROMPT_FORMAT harus salah satu dari {PROMPT_FORMATS}")
+        self.fmt = fmt
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens = 0
+        self.sampled = 0             # request yang ikut dibandingkan dengan legacy
+        self.tokens_sampled = 0
+        self.tokens_legacy = 0
+        self.tokens_max = 0
+        self.truncated = 0
+        self.last = None
+
+    def context(self, data):
+        # Hasil: (teks konteks, info token)
+        text = serialize(data, self.fmt)
+        # Teks > 8 karakter/token pasti melewati anggaran, tidak perlu dihitung
+        tokens = estimate_tokens(text) if len(text) <= 8 * self.max_tokens else self.max_tokens + 1
+        dipangkas = 0
+        if tokens > self.max_tokens and self.fmt != "legacy":
+            text, dipangkas = self._fit(data)
+            tokens = estimate_tokens(text)
+        elif tokens > self.max_tokens:
+            tokens = estimate_tokens(text)
+        info = {"token": tokens, "dipangkas": dipangkas}
+        return text, info
+
+    def _fit(self, data):
+        # Resep terbaru masuk lengkap selama muat, sisanya diringkas.
+        # Token dihitung per baris (bertambah), bukan serialisasi ulang tiap langkah.
+        grouped = _group_meds(data.get("medis", []))
+        header = estimate_tokens(serialize(data, self.fmt, [], None))
+        room = self.max_tokens * (1 - SUMMARY_SHARE) - header
+        used, n_kept = 0, 0
+        for item in reversed(grouped):
+            t = estimate_tokens(_med_text(item, self.fmt)) + 1
+            if used + t > room:
+                break
+            used += t
+            n_kept += 1
+        kept = grouped[len(grouped) - n_kept:]
+        old = grouped[:len(grouped) - n_kept]
+        names = _summary_names(old)
+        # Ringkasan terlalu panjang -> daftar nama dipotong dari yang jarang
+        room_summary = self.max_tokens - header - used - 8
+        summary, total = [], 0
+        for name in names:
+            t = estimate_tokens(name) + 1
+            if total + t > room_summary:
+                break
+            summary.append(name)
+            total += t
+        text = self._with_summary(data, kept, summary, len(names))
+        # Perkiraan per baris bisa meleset sedikit (pemisah, key JSON)
+        while summary and estimate_tokens(text) > self.max_tokens:
+            del summary[-max(1, len(summary) // 10):]
+            text = self._with_summary(data, kept, summary, len(names))
+        return text, sum(n for _, n in old)
+
+    def _with_summary(self, data, kept, summary, total):
+        names = list(summary)
+        if len(names) < total:
+            names.append(f"+{total - len(names)} obat lain")
+        return serialize(data, self.fmt, kept, ", ".join(names))
+
+    def record(self, data, info, prompt_tokens=None):
+        # Metrik per request yang benar-benar dikirim ke LLM. prompt_tokens =
+        # hitungan seluruh prompt (template + konteks)
+        with self._lock:
+            self.requests += 1
+            sample = (self.requests - 1) % LEGACY_SAMPLE_EVERY == 0
+        legacy = estimate_tokens(serialize(data, "legacy")) if sample else None
+        with self._lock:
+            self.tokens += info["token"]
+            if sample:
+                self.sampled += 1
+                self.tokens_sampled += info["token"]
+                self.tokens_legacy += legacy
+            self.tokens_max = max(self.tokens_max, info["token"])
+            self.truncated += bool(info["dipangkas"])
+            self.last = dict(info, token_prompt=prompt_tokens)
+
+    def stats(self):
+        n = self.requests
+        return {
+            "format": self.fmt,
+            "anggaran_token": self.max_tokens,
+            "request": n,
+            "token_konteks_rata2": round(self.tokens / n, 1) if n else 0.0,
+            "token_konteks_maks": self.tokens_max,
+            # Perkiraan dari sampel (lihat LEGACY_SAMPLE_EVERY)
+            "sampel_legacy": self.sampled,
+            "token_legacy_rata2": round(self.tokens_legacy / self.sampled, 1) if self.sampled else 0.0,
+            "hemat_persen": round(100 * (1 - self.tokens_sampled / self.tokens_legacy), 1) if self.tokens_legacy else 0.0,
+            "dipangkas": self.truncated,
+            "terakhir": self.last
+        }
@@ -0,0 +1,288 @@
+import json
+import re
+import threading
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+# --- PARSING RESPONS LLM ---
+# Jawaban LLM divalidasi ke skema hasil analisis. Urutan percobaan:
+#   1. json.loads langsung (jawaban structured output / JSON bersih)
+#   2. buang pagar ``` & koma berlebih lalu ambil objek JSON pertama (abaikan
+#      teks di sekitarnya)
+# JSON yang terpotong TIDAK dilengkapi: "skor_risiko": 9 bisa jadi 90 yang
+# terpotong, jadi objek harus tertutup dan semua field wajib ada. Kalau gagal
+# -> ResponseParseError (pemanggil retry). complete_json() hanya dipakai
+# StreamExtractor untuk menampilkan field yang sudah lengkap selama streaming.
+
+RISK_STATUSES = ("AMAN", "BAHAYA", "PERINGATAN")
+
+FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+START_RE = re.compile(r"[{\[]")
+# Maksimal posisi awal '{' / '[' yang dicoba (teks pengantar panjang)
+MAX_STARTS = 20
+WHITESPACE_COMMA = " \t\r\n,"
+
+
+class ResponseParseError(ValueError):
+    pass
+
+
+class AnalysisResult(BaseModel):
+    # Field lain dari model (mis. "nik" di batch) tetap dibawa
+    model_config = ConfigDict(extra="allow")
+
+    status: Literal["AMAN", "BAHAYA", "PERINGATAN"]
+    skor_risiko: int = Field(ge=0, le=100)
+    ringkasan_pasien: str
+    analisis_obat: str
+    rekomendasi: str
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def _status(cls, v):
+        return v.strip().upper() if isinstance(v, str) else v
+
+    @field_validator("skor_risiko", mode="before")
+    @classmethod
+    def _skor(cls, v):
+        # "75", 75.0, "75%" -> 75
+        if isinstance(v, str):
+            v = v.strip().rstrip("%")
+        try:
+            return round(float(v))
+        except (TypeError, ValueError):
+            return v
+
+    @field_validator("ringkasan_pasien", "analisis_obat", "rekomendasi", mode="before")
+    @classmethod
+    def _text(cls, v):
+        # Sebagian model menjawab daftar poin, bukan paragraf
+        if isinstance(v, list):
+            return "\n".join(f"- {item}" for item in v)
+        return "-" if v is None else v
+
+
+# Skema untuk structured output Gemini (response_schema)
+_RESULT_PROPERTIES = {
+    "status": {"type": "STRING", "enum": list(RISK_STATUSES)},
+    "skor_risiko": {"type": "INTEGER"},
+    "ringkasan_pasien": {"type": "STRING"},
+    "analisis_obat": {"type": "STRING"},
+    "rekomendasi": {"type": "STRING"},
+}
+RESPONSE_SCHEMA = {"type": "OBJECT", "properties": _RESULT_PROPERTIES, "required": list(_RESULT_PROPERTIES)}
+BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": dict(_RESULT_PROPERTIES, nik={"type": "STRING"}),
+        "required": ["nik", *_RESULT_PROPERTIES],
+    },
+}
+
+
+def complete_json(text):
+    # Tutup string & kurung yang belum ditutup. Satu kali lewat; kalau hasilnya
+    # belum valid (key tanpa nilai, koma menggantung), potong di koma terakhir.
+    # Hasil: nilai JSON, atau ResponseParseError.
+    return _complete(text)[0]
+
+
+def _complete(text):
+    # Hasil: (nilai, dipotong). dipotong=True -> teks dipotong di koma, jadi
+    # semua key yang tersisa sudah lengkap nilainya
+    stack, cuts = [], []
+    in_str = esc = False
+    for i, ch in enumerate(text):
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch == "{":
+            stack.append("}")
+        elif ch == "[":
+            stack.append("]")
+        elif ch in "}]" and stack:
+            stack.pop()
+        elif ch == ",":
+            cuts.append((i, tuple(stack)))
+
+    head = text[:-1] if esc else text
+    candidates = [head + ('"' if in_str else "") + "".join(reversed(stack))]
+    for i, closers in reversed(cuts[-3:]):
+        candidates.append(text[:i] + "".join(reversed(closers)))
+    for i, candidate in enumerate(candidates):
+        try:
+            return json.loads(TRAILING_COMMA_RE.sub(r"\1", candidate)), i > 0
+        except ValueError:
+            continue
+    raise ResponseParseError("JSON tidak lengkap dan tidak bisa diperbaiki")
+
+
+def extract_json(text):
+    # Hasil: (nilai, diperbaiki)
+    if text is None:
+        raise ResponseParseError("Respons kosong")
+    stripped = text.strip()
+    try:
+        return json.loads(stripped), False
+    except ValueError:
+        pass
+
+    body = TRAILING_COMMA_RE.sub(r"\1", FENCE_RE.sub("", stripped))
+    decoder = json.JSONDecoder()
+    # Kurung pertama = JSON terluar. Kalau gagal di tengah (mis. kurung di teks
+    # pengantar), lanjut dari kurung berikutnya setelah posisi error.
+    pos, tries = 0, 0
+    while tries < MAX_STARTS:
+        m = START_RE.search(body, pos)
+        if m is None:
+            break
+        tries += 1
+        try:
+            return decoder.raw_decode(body, m.start())[0], True
+        except json.JSONDecodeError as e:
+            pos = max(e.pos, m.start() + 1)
+    raise ResponseParseError("Tidak ada JSON valid (lengkap) di respons")
+
+
+def closed_items(text):
+    # Elemen array yang sudah tertutup dari jawaban batch yang terpotong;
+    # elemen terakhir yang terpotong dibuang (pasiennya dianalisis ulang)
+    body = FENCE_RE.sub("", text or "")
+    pos = body.find("[") + 1
+    if pos == 0:
+        return []
+    decoder, items = json.JSONDecoder(), []
+    while True:
+        while pos < len(body) and body[pos] in WHITESPACE_COMMA:
+            pos += 1
+        try:
+            item, pos = decoder.raw_decode(body, pos)
+        except ValueError:
+            return items
+        items.append(item)
+
+
+def validate_result(value):
+    try:
+        return AnalysisResult.model_validate(value).model_dump()
+    except ValidationError as e:
+        fields = ", ".join(str(err["loc"][0]) for err in e.errors() if err["loc"])
+        raise ResponseParseError(f"Respons tidak sesuai skema ({fields or 'format'})") from None
+
+
+class StreamExtractor:
+    # Membaca jawaban yang datang sepotong-sepotong (streaming). feed() mengembalikan
+    # field yang sudah pasti lengkap: key terakhir baru dikirim setelah ada koma
+    # sesudahnya, karena nilainya mungkin masih bertambah di potongan berikutnya.
+    def __init__(self):
+        self.text = ""
+        self.emitted = {}   # field -> nilai yang sudah dikirim
+
+    def feed(self, chunk):
+        self.text += chunk or ""
+        body = FENCE_RE.sub("", self.text)
+        m = START_RE.search(body)
+        if m is None:
+            return []
+        try:
+            value, cut = _complete(body[m.start():])
+        except ResponseParseError:
+            return []
+        if not isinstance(value, dict):
+            return []
+        ready = []
+        keys = list(value)
+        for key in keys if cut else keys[:-1]:
+            if key not in self.emitted:
+                self.emitted[key] = value[key]
+                ready.append((key, value[key]))
+        return ready
+
+    def rest(self, result):
+        # Field dari hasil akhir (sudah divalidasi) yang belum dikirim atau
+        # nilainya berubah setelah validasi (mis. "aman" -> "AMAN")
+        ready = [(k, v) for k, v in result.items() if k not in self.emitted or self.emitted[k] != v]
+        self.emitted.update(result)
+        return ready
+
+
+class ResponseParser:
+    # Menyimpan counter: berapa jawaban langsung valid, butuh perbaikan,
+    # gagal, dan berapa kali panggilan LLM diulang karena jawaban rusak.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.direct = 0
+        self.repaired = 0
+        self.failed = 0
+        self.retries = 0
+        self.gave_up = 0
+        self.batch_dropped = 0
+
+    def _count(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def parse(self, text):
+        try:
+            value, repaired = extract_json(text)
+            if isinstance(value, list) and len(value) == 1:
+                value = value[0]
+            result = validate_result(value)
+        except ResponseParseError:
+            self._count("failed")
+            raise
+        self._count("repaired" if repaired else "direct")
+        return result
+
+    def parse_batch(self, text):
+        # Hasil: dict nik -> hasil. Item yang tidak valid dibuang (dianalisis ulang tunggal)
+        try:
+            value, repaired = extract_json(text)
+        except ResponseParseError:
+            value, repaired = closed_items(text), True
+            if not value:
+                self._count("failed")
+                raise
+        if isinstance(value, dict):
+            value = value.get("hasil", [value])
+        results, dropped = {}, 0
+        for item in value if isinstance(value, list) else []:
+            if not isinstance(item, dict) or "nik" not in item:
+                dropped += 1
+                continue
+            try:
+                results[str(item["nik"])] = validate_result(item)
+            except ResponseParseError:
+                dropped += 1
+        self._count("repaired" if repaired else "direct")
+        if dropped:
+            self._count("batch_dropped", dropped)
+        return results
+
+    def retried(self):
+        self._count("retries")
+
+    def give_up(self):
+        self._count("gave_up")
+
+    def stats(self):
+        total = self.direct + self.repaired + self.failed
+        return {
+            "langsung_valid": self.direct,
+            "diperbaiki": self.repaired,
+            "gagal_parse": self.failed,
+            "retry": self.retries,
+            "gagal_akhir": self.gave_up,
+            "batch_item_dibuang": self.batch_dropped,
+            "tingkat_gagal": round(self.failed / total, 3) if total else 0.0
+        }
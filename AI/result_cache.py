@@ -0,0 +1,143 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# --- CACHE HASIL ANALISIS ---
+# Key = hash(konteks pasien + template prompt + nama model). Data pasien
+# berubah -> key berubah otomatis, jadi hasil lama tidak pernah terpakai.
+# Tier 1: LRU di memori (batas jumlah + TTL)
+# Tier 2 (opsional): SQLite di disk, tetap ada setelah restart
+# Entri boleh diberi NIK, supaya saat data pasien itu di-ingest ulang hasil
+# lamanya bisa langsung dibuang (invalidate_nik) daripada menunggu TTL.
+
+
+def make_key(context, template, model_name):
+    h = hashlib.sha256()
+    for part in (model_name, template, context):
+        h.update(part.encode('utf-8'))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_items=1024, ttl=3600, db_path=None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items = OrderedDict()  # key -> (kadaluarsa, hasil, nik)
+        self._by_nik = {}            # nik -> set(key) di memori
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, expires_at REAL, nik TEXT)"
+            )
+            try:
+                # File cache dari versi lama belum punya kolom nik
+                self._db.execute("ALTER TABLE results ADD COLUMN nik TEXT")
+            except sqlite3.OperationalError:
+                pass
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_nik ON results (nik)")
+            self._db.execute("DELETE FROM results WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    @property
+    def enabled(self):
+        return self.max_items > 0 or self._db is not None
+
+    @property
+    def disk(self):
+        # True kalau get/set bisa menyentuh SQLite (I/O disk, bukan cuma dict)
+        return self._db is not None
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                if item[0] > now:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return item[1]
+                self._drop(key)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at, nik FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    value = json.loads(row[0])
+                    self._put_memory(key, row[1], value, row[2])
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value, nik=None):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._put_memory(key, expires_at, value, nik)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, expires_at, nik) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), expires_at, nik),
+                )
+                self._db.commit()
+
+    def invalidate_nik(self, nik):
+        # Buang semua hasil milik satu pasien (memori + disk). Hasil: jumlah entri
+        with self._lock:
+            keys = list(self._by_nik.get(nik, ()))
+            for key in keys:
+                self._drop(key)
+            removed = len(keys)
+            if self._db is not None:
+                cur = self._db.execute("DELETE FROM results WHERE nik = ?", (nik,))
+                self._db.commit()
+                removed = max(removed, cur.rowcount)
+            self.invalidations += removed
+            return removed
+
+    def _put_memory(self, key, expires_at, value, nik=None):
+        if self.max_items <= 0:
+            return
+        if key in self._items:
+            self._drop(key)
+        self._items[key] = (expires_at, value, nik)
+        if nik is not None:
+            self._by_nik.setdefault(nik, set()).add(key)
+        while len(self._items) > self.max_items:
+            self._drop(next(iter(self._items)))
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, _, nik = self._items.pop(key)
+        keys = self._by_nik.get(nik)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_nik[nik]
+
+    def stats(self):
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "items": len(self._items),
+            "max_items": self.max_items,
+            "ttl_detik": self.ttl,
+            "disk": self.disk,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round((self.hits + self.disk_hits) / total, 3) if total else 0.0
+        }
@@ -0,0 +1,352 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List
+
+import anyio
+import requests
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+
+from sharding import shard_of
+
+# --- ROUTER SHARD ---
+# Di depan beberapa proses main.py yang masing-masing hanya memuat sebagian
+# pasien (SHARD_INDEX / SHARD_COUNT). Request per NIK diteruskan ke shard
+# pemiliknya lewat session keep-alive; endpoint yang menyangkut banyak pasien
+# (batch, pencarian, ingest, query populasi, metrik) disebar ke semua shard
+# lalu hasilnya digabung. Graph populasi tidak bisa digabung -> ditolak (501).
+#   SHARD_URLS=http://127.0.0.1:8001,http://127.0.0.1:8002 python router.py
+# Urutan URL = SHARD_INDEX masing-masing shard.
+
+load_dotenv()
+SHARD_URLS = [u.strip().rstrip("/") for u in os.getenv("SHARD_URLS", "").split(",") if u.strip()]
+# Koneksi keep-alive per shard & thread yang boleh menunggu shard bersamaan
+ROUTER_POOL_SIZE = int(os.getenv("ROUTER_POOL_SIZE", "64"))
+ROUTER_TIMEOUT = (3.05, float(os.getenv("ROUTER_READ_TIMEOUT", "120")))
+ROUTER_PORT = int(os.getenv("ROUTER_PORT", "8000"))
+# Header dari shard yang diteruskan apa adanya ke client
+FORWARD_HEADERS = ("content-type", "etag", "cache-control", "retry-after", "x-data-version", "x-accel-buffering")
+
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=max(1, len(SHARD_URLS)), pool_maxsize=ROUTER_POOL_SIZE)
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
+# Fan-out ke semua shard secara paralel
+_fanout = ThreadPoolExecutor(max_workers=ROUTER_POOL_SIZE, thread_name_prefix="router")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if not SHARD_URLS:
+        raise RuntimeError("SHARD_URLS kosong: isi dengan URL shard, dipisah koma (urutan = SHARD_INDEX)")
+    # Endpoint sync jalan di thread pool anyio (default 40): samakan dengan pool koneksi
+    anyio.to_thread.current_default_thread_limiter().total_tokens = ROUTER_POOL_SIZE
+    print(f"🧭 Router siap untuk {len(SHARD_URLS)} shard: {', '.join(SHARD_URLS)}")
+    yield
+    _fanout.shutdown(wait=False)
+
+
+app = FastAPI(title="HealthBridge AI Router", lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+def owner(nik):
+    return SHARD_URLS[shard_of(nik, len(SHARD_URLS))]
+
+
+def forward(base, method, path, **kwargs):
+    kwargs.setdefault("timeout", ROUTER_TIMEOUT)
+    try:
+        return session.request(method, base + path, **kwargs)
+    except requests.RequestException as e:
+        raise HTTPException(status_code=502, detail=f"Shard {base} tidak bisa dihubungi: {e}")
+
+
+def relay(upstream):
+    headers = {k: v for k, v in upstream.headers.items() if k.lower() in FORWARD_HEADERS}
+    return Response(upstream.content, status_code=upstream.status_code, headers=headers)
+
+
+def fanout(method, path, bodies=None, tolerant=False, **kwargs):
+    # bodies: {url_shard: kwargs tambahan} -> hanya shard itu yang dipanggil
+    # tolerant=True: shard yang tidak bisa dihubungi muncul di hasil sebagai
+    # HTTPException (502), bukan menggagalkan seluruh request
+    targets = bodies or {base: {} for base in SHARD_URLS}
+    futures = {base: _fanout.submit(forward, base, method, path, **kwargs, **extra)
+               for base, extra in targets.items()}
+    results = {}
+    for base, future in futures.items():
+        try:
+            results[base] = future.result()
+        except HTTPException as e:
+            if not tolerant:
+                raise
+            results[base] = e
+    return results
+
+
+def shard_error(response):
+    # Error dari shard (mis. 400 filter tidak valid) diteruskan dengan status yang sama
+    try:
+        detail = response.json().get("detail")
+    except ValueError:
+        detail = response.text
+    return HTTPException(status_code=response.status_code, detail=detail)
+
+
+def fanout_json(path, params):
+    # GET ke semua shard, hasil JSON urut SHARD_URLS
+    results = []
+    for response in fanout("GET", path, params=params).values():
+        if not response.ok:
+            raise shard_error(response)
+        results.append(response.json())
+    return results
+
+
+@app.get("/")
+def root():
+    return {"status": "HealthBridge AI Router Ready! 🧭", "shard": len(SHARD_URLS)}
+
+
+@app.get("/ready")
+def api_ready():
+    # Siap kalau semua shard siap; progres load tiap shard ikut dilaporkan
+    # Shard yang tidak bisa dihubungi = belum siap (503), bukan 502
+    results, ready = {}, True
+    for base, response in fanout("GET", "/ready", timeout=(3.05, 5), tolerant=True).items():
+        if isinstance(response, HTTPException):
+            results[base] = {"status": "tidak terhubung", "error": response.detail}
+            ready = False
+            continue
+        try:
+            results[base] = response.json()
+        except ValueError:
+            results[base] = {"status": "error", "error": response.status_code}
+        ready &= response.status_code == 200
+    return JSONResponse({"status": "siap" if ready else "memuat", "shard": results}, status_code=200 if ready else 503)
+
+
+@app.get("/stats")
+def api_stats():
+    results = {}
+    for base, response in fanout("GET", "/stats", timeout=(3.05, 10), tolerant=True).items():
+        if isinstance(response, HTTPException):
+            results[base] = {"error": response.detail}
+        else:
+            results[base] = response.json() if response.ok else {"error": response.status_code}
+    return {"shard": results}
+
+
+# --- METRIK: SAMPEL SEMUA SHARD DENGAN LABEL shard="<SHARD_INDEX>" ---
+def merge_metrics(texts):
+    # texts: {indeks_shard: teks Prometheus}. Sampel satu metrik dari semua shard
+    # dikumpulkan di bawah HELP/TYPE-nya (format Prometheus: satu grup per metrik)
+    families = {}
+    for shard, text in texts.items():
+        name = None
+        for line in text.splitlines():
+            if line.startswith(("# HELP ", "# TYPE ")):
+                name = line.split(" ", 3)[2]
+                meta = families.setdefault(name, ([], []))[0]
+                if line not in meta:
+                    meta.append(line)
+            elif line and not line.startswith("#"):
+                cut = min(i for i in (line.find("{"), line.find(" ")) if i >= 0)
+                metric, rest = line[:cut], line[cut:]
+                if rest.startswith("{}"):
+                    rest = rest[2:]
+                if rest.startswith("{"):
+                    sample = f'{metric}{{shard="{shard}",{rest[1:]}'
+                else:
+                    sample = f'{metric}{{shard="{shard}"}}{rest}'
+                # _bucket/_sum/_count histogram ikut grup metrik induknya
+                family = name if name and (metric == name or metric.startswith(name + "_")) else metric
+                families.setdefault(family, ([], []))[1].append(sample)
+    lines = []
+    for meta, samples in families.values():
+        lines.extend(meta)
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+@app.get("/metrics")
+def api_metrics():
+    texts, up = {}, []
+    for i, (base, response) in enumerate(fanout("GET", "/metrics", timeout=(3.05, 10), tolerant=True).items()):
+        ok = not isinstance(response, HTTPException)
+        if ok and not response.ok:
+            return relay(response)  # mis. 404 METRICS=0
+        if ok:
+            texts[i] = response.text
+        up.append(f'healthbridge_shard_up{{shard="{i}"}} {int(ok)}')
+    text = merge_metrics(texts)
+    text += "# HELP healthbridge_shard_up 1 kalau shard bisa dihubungi router\n"
+    text += "# TYPE healthbridge_shard_up gauge\n" + "\n".join(up) + "\n"
+    return Response(text, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/profile")
+def api_profile(seconds: float = 10.0, interval_ms: float = 5.0):
+    # Profil semua shard bersamaan; tiap stack diberi frame akar shard_<i>,
+    # jadi tetap satu flamegraph
+    params = {"seconds": seconds, "interval_ms": interval_ms}
+    responses = fanout("GET", "/metrics/profile", params=params, timeout=(3.05, min(seconds, 60.0) + 30))
+    lines = []
+    for i, response in enumerate(responses.values()):
+        if not response.ok:
+            return relay(response)
+        lines.extend(f"shard_{i};{line}" for line in response.text.splitlines() if line)
+    return Response("\n".join(lines) + "\n", media_type="text/plain")
+
+
+# --- PER NIK: DITERUSKAN KE SHARD PEMILIK ---
+@app.get("/analyze/{nik}")
+def api_analyze(nik: str):
+    return relay(forward(owner(nik), "GET", f"/analyze/{nik}"))
+
+
+@app.get("/analyze/{nik}/stream")
+def api_analyze_stream(nik: str):
+    upstream = forward(owner(nik), "GET", f"/analyze/{nik}/stream", stream=True)
+    if upstream.status_code != 200:
+        try:
+            return relay(upstream)
+        finally:
+            upstream.close()
+
+    def body():
+        # Potongan SSE diteruskan begitu datang (iterator sync -> thread pool)
+        with upstream:
+            yield from upstream.iter_content(chunk_size=None)
+
+    headers = {k: v for k, v in upstream.headers.items() if k.lower() in FORWARD_HEADERS}
+    return StreamingResponse(body(), status_code=200, headers=headers)
+
+
+@app.get("/graph/{nik}")
+def api_graph(nik: str, request: Request, format: str = "json"):
+    headers = {}
+    if request.headers.get("if-none-match"):
+        headers["If-None-Match"] = request.headers["if-none-match"]
+    return relay(forward(owner(nik), "GET", f"/graph/{nik}", params={"format": format}, headers=headers))
+
+
+@app.get("/patients/{nik}/vitals")
+def api_patient_vitals(nik: str):
+    return relay(forward(owner(nik), "GET", f"/patients/{nik}/vitals"))
+
+
+# --- BANYAK PASIEN: DISEBAR KE SEMUA SHARD ---
+class BatchRequest(BaseModel):
+    niks: List[str]
+
+
+@app.post("/analyze/batch")
+def api_analyze_batch(req: BatchRequest):
+    groups = {}
+    for nik in req.niks:
+        groups.setdefault(owner(nik), []).append(nik)
+    results = {}
+    for base, response in fanout("POST", "/analyze/batch", {b: {"json": {"niks": n}} for b, n in groups.items()}).items():
+        if not response.ok:
+            return relay(response)
+        results.update(response.json()["hasil"])
+    return {"hasil": results}
+
+
+@app.get("/patients/search")
+def api_patient_search(q: str = "", limit: int = 20):
+    # Hasil tiap shard sudah urut skor; digabung bergiliran lalu dipotong
+    limit = max(1, min(limit, 100))
+    per_shard = [r.json()["hasil"] for r in fanout("GET", "/patients/search", params={"q": q, "limit": limit}).values()
+                 if r.ok]
+    merged = []
+    for rank in range(limit):
+        for hasil in per_shard:
+            if rank < len(hasil):
+                merged.append(hasil[rank])
+    return {"hasil": merged[:limit]}
+
+
+# --- QUERY POPULASI: HASIL SHARD DIGABUNG ---
+# Filter diteruskan apa adanya; jumlah dijumlahkan, daftar pasien digabung
+@app.get("/population/query")
+def api_population_query(request: Request, limit: int = 100):
+    parts = fanout_json("/population/query", dict(request.query_params))
+    pasien = [row for part in parts for row in part["pasien"]]
+    return {"jumlah": sum(part["jumlah"] for part in parts), "pasien": pasien[:limit]}
+
+
+@app.get("/population/top-risk")
+def api_population_top_risk(request: Request, k: int = 20, by: str = "skor"):
+    # Tiap shard mengirim k teratasnya, jadi k teratas gabungan pasti ada di situ
+    parts = fanout_json("/population/top-risk", dict(request.query_params))
+    rows = [row for part in parts for row in part["pasien"]]
+    rows.sort(key=lambda row: -row[by] if row.get(by) is not None else math.inf)
+    return {"jumlah": sum(part["jumlah"] for part in parts), "pasien": rows[:max(k, 0)]}
+
+
+@app.get("/population/histogram")
+def api_population_histogram(request: Request, field: str = "bmi", bins: int = 20):
+    # Dua tahap: rentang nilai semua shard (bins=1), lalu histogram dengan
+    # rentang yang sama di tiap shard supaya count bisa dijumlahkan per bin
+    params = dict(request.query_params)
+    if "lo" not in params or "hi" not in params:
+        edges = [part["edges"] for part in fanout_json("/population/histogram", dict(params, bins=1))]
+        edges = [e for e in edges if e]
+        if not edges:
+            return {"field": field, "jumlah": 0, "counts": [], "edges": []}
+        # edges shard dibulatkan 2 desimal: rentang dilebarkan setengah langkah
+        params.update(lo=min(e[0] for e in edges) - 0.005, hi=max(e[-1] for e in edges) + 0.005)
+    parts = fanout_json("/population/histogram", params)
+    return {
+        "field": field,
+        "jumlah": sum(part["jumlah"] for part in parts),
+        "counts": [sum(counts) for counts in zip(*(part["counts"] for part in parts))],
+        "edges": parts[0]["edges"],
+    }
+
+
+@app.get("/population/graph/{path:path}")
+def api_population_graph(path: str):
+    # Graph populasi menghubungkan pasien lintas shard (obat/diagnosa bersama):
+    # hasil per shard tidak bisa digabung dengan benar
+    raise HTTPException(status_code=501, detail="Graph populasi tidak tersedia lewat router (data terbagi per shard). "
+                                                "Panggil shard langsung untuk hasil per shard.")
+
+
+@app.post("/ingest")
+async def api_ingest(request: Request):
+    # Semua shard menerima delta yang sama, masing-masing hanya menyimpan
+    # pasien miliknya (sisanya masuk hitungan "diabaikan")
+    body = await request.body()
+    headers = {"Content-Type": request.headers.get("content-type", "application/json")}
+    responses = await anyio.to_thread.run_sync(lambda: fanout("POST", "/ingest", data=body, headers=headers))
+    for response in responses.values():
+        if not response.ok:
+            return relay(response)
+    summaries = [r.json() for r in responses.values()]
+    counters = ("pasien_baru", "pasien_diubah", "diperbarui", "duplikat", "usang")
+    return {
+        **{key: sum(s.get(key, 0) for s in summaries) for key in counters},
+        "nik": [nik for s in summaries for nik in s["nik"]],
+        "shard": {base: s for base, s in zip(responses, summaries)},
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=ROUTER_PORT)
@@ -0,0 +1,233 @@
+from datetime import date
+
+import numpy as np
+
+# --- RULE ENGINE DETERMINISTIK ---
+# Kasus yang jelas (interaksi obat, alergi, kehamilan, duplikasi, tensi,
+# obesitas) diputuskan dari tabel aturan di bawah tanpa memanggil LLM.
+# Evaluasi dilakukan per kolom dengan NumPy, jadi bisa untuk satu pasien
+# (request /analyze) maupun seluruh populasi sekaligus.
+
+# Kosakata obat berdasarkan kode KFA
+KFA_VOCAB = {
+    "93001001": {"nama": "Paracetamol", "golongan": "analgesik"},
+    "93001002": {"nama": "Clopidogrel", "golongan": "antiplatelet"},
+    "93001003": {"nama": "Asam Mefenamat", "golongan": "nsaid"},
+    "93001004": {"nama": "Amoxicillin", "golongan": "penisilin"},
+    "93001005": {"nama": "Isotretinoin", "golongan": "teratogenik"},
+    "93001006": {"nama": "Amlodipine", "golongan": "antihipertensi"},
+    "93001007": {"nama": "Candesartan", "golongan": "antihipertensi"},
+    "93001008": {"nama": "Metformin", "golongan": "antidiabetes"},
+}
+
+# Alergi -> golongan obat yang dikontraindikasikan
+ALERGI_GOLONGAN = {
+    "penicillin": "penisilin",
+}
+
+# Tabel aturan. "jenis" menentukan cara evaluasi, sisanya parameter.
+RULES = [
+    {
+        "id": "ALERGI_OBAT", "jenis": "alergi_obat",
+        "status": "BAHAYA", "skor": 95,
+        "pesan": "Pasien alergi terhadap golongan obat yang diresepkan.",
+        "saran": "Hentikan obat tersebut dan ganti dengan antibiotik golongan lain (mis. makrolida)."
+    },
+    {
+        "id": "INTERAKSI_ANTIPLATELET_NSAID", "jenis": "interaksi",
+        "golongan_a": "antiplatelet", "golongan_b": "nsaid",
+        "status": "BAHAYA", "skor": 90,
+        "pesan": "Antiplatelet + NSAID meningkatkan risiko perdarahan saluran cerna.",
+        "saran": "Hindari NSAID; gunakan Paracetamol untuk nyeri."
+    },
+    {
+        "id": "TERATOGENIK_USIA_SUBUR", "jenis": "obat_demografi",
+        "golongan": "teratogenik", "gender": "female", "umur_min": 15, "umur_max": 49,
+        "status": "BAHAYA", "skor": 90,
+        "pesan": "Obat teratogenik pada wanita usia subur.",
+        "saran": "Pastikan tes kehamilan negatif dan kontrasepsi efektif sebelum melanjutkan."
+    },
+    {
+        "id": "DUPLIKASI_KFA", "jenis": "duplikasi",
+        "status": "PERINGATAN", "skor": 60,
+        "pesan": "Ada duplikasi obat dengan kode KFA yang sama.",
+        "saran": "Gunakan salah satu saja untuk menghindari overdosis."
+    },
+    {
+        "id": "HIPERTENSI_BERAT", "jenis": "tensi",
+        "sistole_min": 150, "diastole_min": 95,
+        "status": "PERINGATAN", "skor": 70,
+        "pesan": "Tekanan darah tinggi (≥150/95 mmHg).",
+        "saran": "Evaluasi ulang terapi antihipertensi dan pantau tekanan darah."
+    },
+    {
+        "id": "OBESITAS", "jenis": "bmi",
+        "bmi_min": 30,
+        "status": "PERINGATAN", "skor": 55,
+        "pesan": "Obesitas (BMI ≥ 30).",
+        "saran": "Edukasi diet dan aktivitas fisik, skrining diabetes."
+    },
+]
+
+STATUS_KODE = {"AMAN": 0, "PERINGATAN": 1, "BAHAYA": 2}
+KODE_STATUS = {v: k for k, v in STATUS_KODE.items()}
+SKOR_AMAN = 10
+GENDER_KODE = {"male": 1, "female": 2}
+
+
+def parse_number(text):
+    try:
+        return float(str(text).split()[0])
+    except (ValueError, IndexError):
+        return np.nan
+
+
+def parse_tensi(text):
+    try:
+        sys, dia = str(text).split()[0].split("/")
+        return float(sys), float(dia)
+    except ValueError:
+        return np.nan, np.nan
+
+
+def age_from_birthdate(text, today=None):
+    today = today or date.today()
+    try:
+        born = date.fromisoformat(str(text)[:10])
+    except ValueError:
+        return np.nan
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+
+class RuleEngine:
+    def __init__(self, rules=RULES, kfa_vocab=KFA_VOCAB):
+        self.rules = rules
+        self.kfa_vocab = kfa_vocab
+        self.golongan = sorted({v["golongan"] for v in kfa_vocab.values()})
+        self.golongan_index = {g: i for i, g in enumerate(self.golongan)}
+
+    # --- Record -> kolom NumPy ---
+    def featurize(self, records):
+        n = len(records)
+        g = len(self.golongan)
+        f = {
+            "umur": np.full(n, np.nan),
+            "gender": np.zeros(n, dtype=np.int8),       # 0 = tidak diketahui, lihat GENDER_KODE
+            "female": np.zeros(n, dtype=bool),
+            "tb": np.full(n, np.nan),
+            "bb": np.full(n, np.nan),
+            "sistole": np.full(n, np.nan),
+            "diastole": np.full(n, np.nan),
+            "golongan": np.zeros((n, g), dtype=bool),    # pasien memakai obat golongan X
+            "alergi": np.zeros((n, g), dtype=bool),      # pasien alergi golongan X
+            "duplikasi": np.zeros(n, dtype=bool),
+            "obat_dikenal": np.ones(n, dtype=bool),      # semua obat ada di KFA_VOCAB
+            "alergi_dikenal": np.ones(n, dtype=bool),
+        }
+        today = date.today()
+        for i, rec in enumerate(records):
+            profil = rec.get("profil", {})
+            vital = rec.get("tanda_vital", {})
+            f["umur"][i] = age_from_birthdate(profil.get("tanggal_lahir"), today)
+            f["gender"][i] = GENDER_KODE.get(profil.get("gender"), 0)
+            f["female"][i] = profil.get("gender") == "female"
+            f["tb"][i] = parse_number(vital.get("tb"))
+            f["bb"][i] = parse_number(vital.get("bb"))
+            f["sistole"][i], f["diastole"][i] = parse_tensi(vital.get("tensi"))
+
+            seen = set()
+            for item in rec.get("medis", []):
+                kfa = item.get("kfa")
+                info = self.kfa_vocab.get(kfa)
+                if info is None:
+                    f["obat_dikenal"][i] = False
+                    continue
+                if kfa in seen:
+                    f["duplikasi"][i] = True
+                seen.add(kfa)
+                f["golongan"][i, self.golongan_index[info["golongan"]]] = True
+
+            for alergi in profil.get("alergi", []):
+                gol = ALERGI_GOLONGAN.get(alergi.strip().lower())
+                if gol in self.golongan_index:
+                    f["alergi"][i, self.golongan_index[gol]] = True
+                else:
+                    f["alergi_dikenal"][i] = False
+        return f
+
+    # --- Evaluasi aturan (vektor) ---
+    def _rule_mask(self, rule, f):
+        jenis = rule["jenis"]
+        if jenis == "alergi_obat":
+            return (f["golongan"] & f["alergi"]).any(axis=1)
+        if jenis == "interaksi":
+            a = f["golongan"][:, self.golongan_index[rule["golongan_a"]]]
+            b = f["golongan"][:, self.golongan_index[rule["golongan_b"]]]
+            return a & b
+        if jenis == "obat_demografi":
+            pakai = f["golongan"][:, self.golongan_index[rule["golongan"]]]
+            gender = f["female"] if rule.get("gender") == "female" else ~f["female"]
+            umur = f["umur"]
+            with np.errstate(invalid="ignore"):
+                return pakai & gender & (umur >= rule["umur_min"]) & (umur <= rule["umur_max"])
+        if jenis == "duplikasi":
+            return f["duplikasi"].copy()
+        if jenis == "tensi":
+            with np.errstate(invalid="ignore"):
+                return (f["sistole"] >= rule["sistole_min"]) | (f["diastole"] >= rule["diastole_min"])
+        if jenis == "bmi":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                bmi = f["bb"] / (f["tb"] / 100) ** 2
+                return bmi >= rule["bmi_min"]
+        raise ValueError(f"Jenis aturan tidak dikenal: {jenis}")
+
+    def evaluate(self, records, features=None):
+        # Hasil: (kode status, skor, matriks aturan yang kena, mask "jelas")
+        f = features if features is not None else self.featurize(records)
+        n = len(records)
+        fired = np.zeros((n, len(self.rules)), dtype=bool)
+        status = np.zeros(n, dtype=np.int8)
+        skor = np.full(n, SKOR_AMAN, dtype=np.int16)
+        for j, rule in enumerate(self.rules):
+            mask = self._rule_mask(rule, f)
+            fired[:, j] = mask
+            status = np.where(mask, np.maximum(status, STATUS_KODE[rule["status"]]), status)
+            skor = np.where(mask, np.maximum(skor, rule["skor"]), skor)
+
+        lengkap = ~(np.isnan(f["tb"]) | np.isnan(f["bb"]) | np.isnan(f["sistole"]) | np.isnan(f["umur"]))
+        aman_jelas = (~fired.any(axis=1)) & lengkap & f["obat_dikenal"] & f["alergi_dikenal"]
+        # Jelas = BAHAYA (cukup satu aturan berat) atau AMAN tanpa keraguan.
+        # PERINGATAN tetap ke LLM karena butuh penilaian klinis.
+        jelas = (status == STATUS_KODE["BAHAYA"]) | aman_jelas
+        return status, skor, fired, jelas
+
+    # --- Hasil terstruktur (format sama dengan output LLM) ---
+    def build_result(self, record, status_kode, skor, fired_row):
+        profil = record.get("profil", {})
+        vital = record.get("tanda_vital", {})
+        kena = [rule for rule, hit in zip(self.rules, fired_row) if hit]
+        obat = ", ".join(item.get("obat", "-") for item in record.get("medis", [])) or "-"
+        return {
+            "status": KODE_STATUS[int(status_kode)],
+            "skor_risiko": int(skor),
+            "ringkasan_pasien": (
+                f"{profil.get('nama', '-')} ({profil.get('gender', '-')}, lahir {profil.get('tanggal_lahir', '-')}). "
+                f"TB {vital.get('tb', '-')}, BB {vital.get('bb', '-')}, tensi {vital.get('tensi', '-')}. Obat: {obat}."
+            ),
+            "analisis_obat": " ".join(r["pesan"] for r in kena) or "Tidak ditemukan interaksi, alergi, maupun duplikasi obat.",
+            "rekomendasi": " ".join(r["saran"] for r in kena) or "Lanjutkan terapi dan kontrol rutin.",
+            "sumber": "rule_engine",
+            "aturan": [r["id"] for r in kena]
+        }
+
+    def verdict(self, record):
+        # Hasil terstruktur kalau kasusnya jelas, None kalau perlu LLM
+        status, skor, fired, jelas = self.evaluate([record])
+        if not jelas[0]:
+            return None
+        return self.build_result(record, status[0], skor[0], fired[0])
+
+    def assess(self, record):
+        # Selalu kembalikan status/skor/aturan (dipakai mode "narrative")
+        status, skor, fired, jelas = self.evaluate([record])
+        return self.build_result(record, status[0], skor[0], fired[0]), bool(jelas[0])
@@ -0,0 +1,196 @@
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+# --- INDEX PENCARIAN PASIEN ---
+# Untuk kotak pencarian di sidebar (100 ribu+ pasien):
+# - NIK: list NIK terurut + bisect -> rentang prefix dalam O(log n)
+#   (setara trie, tanpa satu objek per karakter)
+# - nama: token -> posting list id pasien; prefix token lewat kosakata token
+#   terurut (bisect), salah ketik lewat trigram kosakata (fuzzy)
+# Hasil diberi skor: token sama persis > prefix > mirip (posting list digabung
+# dengan NumPy, jadi prefix umum seperti "a" tetap cepat).
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Batas token kosakata per prefix / fuzzy
+MAX_EXPANSIONS = 200
+FUZZY_MIN_SIMILARITY = 0.3
+SCORE_EXACT, SCORE_PREFIX, SCORE_FUZZY = 3.0, 2.0, 1.0
+
+
+def tokenize(text):
+    # "Siti Nur'aini" -> ["siti", "nur", "aini"] (huruf beraksen dinormalisasi)
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().lower()
+    return TOKEN_RE.findall(text)
+
+
+def trigrams(token):
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PatientSearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.niks = []            # id -> NIK
+        self.names = []           # id -> nama
+        self._ids = {}            # NIK -> id
+        self._sorted_niks = []    # NIK terurut (prefix)
+        self._sorted_ids = []     # id pasien sejajar _sorted_niks
+        self._postings = {}       # token -> array id pasien
+        self._vocab = []          # token terurut (prefix token)
+        self._vocab_dirty = False
+        self._trigrams = {}       # trigram -> set token (fuzzy)
+
+    @classmethod
+    def build(cls, database):
+        # database: Mapping NIK -> record. Record ringkas dibaca namanya saja
+        index = cls()
+        names = database.names() if hasattr(database, "names") else \
+            ((nik, database[nik].get("profil", {}).get("nama", "")) for nik in database)
+        for nik, nama in names:
+            index._add(nik, nama)
+        order = sorted(range(len(index.niks)), key=index.niks.__getitem__)
+        index._sorted_niks = [index.niks[i] for i in order]
+        index._sorted_ids = order
+        index._refresh_vocab()
+        return index
+
+    def __len__(self):
+        return len(self.niks)
+
+    # --- PEMBARUAN ---
+    def _add(self, nik, nama, keep_sorted=False):
+        i = len(self.niks)
+        self.niks.append(nik)
+        self.names.append(nama)
+        self._ids[nik] = i
+        if keep_sorted:
+            at = bisect_left(self._sorted_niks, nik)
+            self._sorted_niks.insert(at, nik)
+            self._sorted_ids.insert(at, i)
+        self._index_tokens(i, nama)
+
+    def _index_tokens(self, i, nama):
+        for token in set(tokenize(nama)):
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = array("I")
+                self._vocab_dirty = True
+                for tri in trigrams(token):
+                    self._trigrams.setdefault(tri, set()).add(token)
+            posting.append(i)
+
+    def _rename(self, i, nama):
+        for token in set(tokenize(self.names[i])):
+            posting = self._postings.get(token)
+            if posting is not None and i in posting:
+                posting.remove(i)
+        self.names[i] = nama
+        self._index_tokens(i, nama)
+
+    def update(self, records):
+        # records: NIK -> record (pasien baru / berubah dari ingest)
+        with self._lock:
+            for nik, data in records.items():
+                nama = data.get("profil", {}).get("nama", "")
+                i = self._ids.get(nik)
+                if i is None:
+                    self._add(nik, nama, keep_sorted=True)
+                elif self.names[i] != nama:
+                    self._rename(i, nama)
+
+    def _refresh_vocab(self):
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+
+    # --- PENCARIAN ---
+    def _nik_range(self, prefix):
+        # Rentang [lo, hi) di _sorted_niks yang NIK-nya diawali prefix
+        return bisect_left(self._sorted_niks, prefix), bisect_left(self._sorted_niks, prefix + "\uffff")
+
+    def _nik_prefix(self, prefix, limit=None):
+        lo, hi = self._nik_range(prefix)
+        return self._sorted_ids[lo:hi if limit is None else min(hi, lo + limit)]
+
+    def _expand(self, token):
+        # Hasil: [(token_kosakata, skor)]
+        matches = []
+        if token in self._postings:
+            matches.append((token, SCORE_EXACT))
+        lo = bisect_left(self._vocab, token)
+        for vocab in self._vocab[lo:lo + MAX_EXPANSIONS]:
+            if not vocab.startswith(token):
+                break
+            if vocab != token:
+                matches.append((vocab, SCORE_PREFIX))
+        if matches or len(token) < 3:
+            return matches
+        # Tidak ada yang cocok -> cari token yang mirip (salah ketik)
+        grams = trigrams(token)
+        overlap = {}
+        for tri in grams:
+            for vocab in self._trigrams.get(tri, ()):
+                overlap[vocab] = overlap.get(vocab, 0) + 1
+        scored = []
+        for vocab, n in overlap.items():
+            similarity = n / (len(grams) + len(trigrams(vocab)) - n)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                scored.append((similarity, vocab))
+        scored.sort(reverse=True)
+        return [(vocab, SCORE_FUZZY * sim) for sim, vocab in scored[:MAX_EXPANSIONS]]
+
+    def _token_scores(self, token):
+        # (id pasien terurut, skor terbaik) untuk satu token query, vektor NumPy
+        matches = self._expand(token)
+        if not matches:
+            return np.zeros(0, dtype=np.uint32), np.zeros(0)
+        ids = np.concatenate([np.frombuffer(self._postings[v], dtype=np.uint32) for v, _ in matches])
+        scores = np.concatenate([np.full(len(self._postings[v]), s) for v, s in matches])
+        order = np.lexsort((-scores, ids))
+        ids, scores = ids[order], scores[order]
+        first = np.ones(len(ids), dtype=bool)
+        first[1:] = ids[1:] != ids[:-1]
+        return ids[first], scores[first]
+
+    def search(self, query, limit=20):
+        # Hasil: [{"nik", "nama"}]. Angka saja = prefix NIK; kata = nama
+        # (semua kata harus cocok), boleh dicampur: "budi 3374".
+        # Skor sama -> urutan data (pasien yang lebih dulu ter-load)
+        with self._lock:
+            self._refresh_vocab()
+            query = (query or "").strip()
+            if not query:
+                ids = list(range(min(limit, len(self.niks))))
+            elif query.isdigit():
+                ids = self._nik_prefix(query, limit)
+            else:
+                words = tokenize(query)
+                if not words:
+                    # Hanya tanda baca ("!!!", "-"): tidak ada yang bisa dicocokkan
+                    return []
+                digits = [w for w in words if w.isdigit()]
+                names = [w for w in words if not w.isdigit()]
+                if names:
+                    ids, scores = self._token_scores(names[0])
+                    for word in names[1:]:
+                        other_ids, other_scores = self._token_scores(word)
+                        common, a, b = np.intersect1d(ids, other_ids, assume_unique=True, return_indices=True)
+                        ids, scores = common, scores[a] + other_scores[b]
+                else:
+                    ids = np.sort(np.array(self._nik_prefix(digits[0]), dtype=np.uint32))
+                    scores = np.zeros(len(ids))
+                for d in digits:
+                    in_range = np.sort(np.array(self._nik_prefix(d), dtype=np.uint32))
+                    ids, a, _ = np.intersect1d(ids, in_range, assume_unique=True, return_indices=True)
+                    scores = scores[a]
+                ids = ids[np.lexsort((ids, -scores))[:limit]].tolist()
+            return [{"nik": self.niks[i], "nama": self.names[i]} for i in ids]
+
+    def stats(self):
+        return {"pasien": len(self.niks), "token": len(self._postings), "trigram": len(self._trigrams)}
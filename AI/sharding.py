@@ -0,0 +1,33 @@
+import zlib
+
+# --- SHARDING PER NIK ---
+# Tiap shard (proses / node) hanya memuat pasien yang NIK-nya jatuh ke
+# bagiannya: crc32(NIK) % SHARD_COUNT == SHARD_INDEX. crc32 stabil antar proses
+# dan mesin (hash() Python diacak per proses), jadi router dan semua shard
+# selalu sepakat pasien mana milik siapa.
+
+
+def shard_of(nik, count):
+    return zlib.crc32(str(nik).encode("utf-8")) % count if count > 1 else 0
+
+
+class ShardSpec:
+    def __init__(self, index=0, count=1):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Shard tidak valid: index {index}, count {count} (syarat 0 <= index < count)")
+        self.index = index
+        self.count = count
+
+    @property
+    def enabled(self):
+        return self.count > 1
+
+    def owns(self, nik):
+        return shard_of(nik, self.count) == self.index
+
+    def keep(self):
+        # Predikat untuk parser / ingest; None = tidak difilter (satu shard)
+        return self.owns if self.enabled else None
+
+    def __str__(self):
+        return f"{self.index + 1}/{self.count}"
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+# --- SINGLE-FLIGHT (PENGGABUNGAN REQUEST) ---
+# Request bersamaan dengan key yang sama hanya memicu SATU panggilan;
+# yang lain menunggu dan ikut mendapat hasilnya. Error juga diteruskan ke
+# semua yang menunggu, dan key langsung dilepas (error tidak di-cache).
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Versi sync (thread)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.deduplicated = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        return {"leaders": self.leaders, "deduplicated": self.deduplicated, "inflight": len(self._calls)}
+
+
+class AsyncSingleFlight:
+    # Versi async. Panggilan dijalankan sebagai task terpisah, jadi kalau
+    # client pertama putus (cancel), yang lain tetap mendapat hasilnya.
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.deduplicated = 0
+
+    async def do(self, key, coro_fn):
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(coro_fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.deduplicated += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Tandai exception sudah "diambil" walau semua penunggu sudah batal
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        return {"leaders": self.leaders, "deduplicated": self.deduplicated, "inflight": len(self._calls)}
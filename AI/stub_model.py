@@ -0,0 +1,132 @@
+import asyncio
+import json
+import random
+import re
+import time
+
+# --- MODEL STUB (TANPA GEMINI) ---
+# Pengganti genai.GenerativeModel untuk load test / benchmark offline.
+# Interface-nya sama: generate_content() dan generate_content_async()
+# mengembalikan objek dengan atribut .text (stream=True -> potongan bertahap)
+# Prompt batch ("JSON Array") dijawab dengan satu objek per NIK di prompt.
+# Dengan generation_config response_mime_type=application/json jawabannya JSON
+# bersih (meniru structured output), tanpa itu dibungkus pagar ```json.
+# messy_rate: porsi jawaban yang "berantakan" seperti model asli (teks
+# pengantar, koma berlebih, atau bukan JSON sama sekali) untuk menguji parser.
+# failure_rate: porsi panggilan yang gagal (StubServiceError, seperti 503 Gemini).
+# slow_rate/slow_factor: porsi panggilan yang slow_factor x lebih lambat (ekor
+# latency, untuk menguji hedged request). Semua acak dengan seed tetap.
+
+# NIK di konteks JSON ("nik": "...") atau format ringkas ("NIK: ...")
+NIK_PATTERN = re.compile(r'"nik":\s*"([^"]+)"|^NIK:\s*(\S+)', re.MULTILINE)
+
+# stream=True: potongan pertama datang setelah STREAM_FIRST_SHARE x latency,
+# sisanya dibagi rata per STREAM_CHUNK_CHARS karakter (meniru token keluar bertahap)
+STREAM_FIRST_SHARE = 0.1
+STREAM_CHUNK_CHARS = 24
+
+STUB_RESULT = {
+    "status": "AMAN",
+    "skor_risiko": 10,
+    "ringkasan_pasien": "Respons stub (bukan hasil AI).",
+    "analisis_obat": "-",
+    "rekomendasi": "-"
+}
+
+
+class StubServiceError(Exception):
+    pass
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubStream:
+    # Bisa di-iterate sync (generate_content) maupun async (generate_content_async)
+    def __init__(self, text, first_delay, chunk_delay):
+        self.chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+        self.first_delay = first_delay
+        self.chunk_delay = chunk_delay
+        self.text = text
+
+    def __iter__(self):
+        for i, chunk in enumerate(self.chunks):
+            time.sleep(self.first_delay if i == 0 else self.chunk_delay)
+            yield StubResponse(chunk)
+
+    async def __aiter__(self):
+        for i, chunk in enumerate(self.chunks):
+            await asyncio.sleep(self.first_delay if i == 0 else self.chunk_delay)
+            yield StubResponse(chunk)
+
+
+class StubGenerativeModel:
+    # latency_per_1k_token: tambahan latency per 1000 token input (perkiraan
+    # 4 karakter/token), meniru LLM yang makin lambat untuk prompt panjang
+    def __init__(self, latency=1.0, latency_per_1k_token=0.0, messy_rate=0.0, seed=0,
+                 failure_rate=0.0, slow_rate=0.0, slow_factor=5.0):
+        self.latency = latency
+        self.latency_per_1k_token = latency_per_1k_token
+        self.messy_rate = messy_rate
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def _delay(self, prompt):
+        delay = self.latency + self.latency_per_1k_token * len(prompt) / 4000
+        if self.slow_rate and self._rng.random() < self.slow_rate:
+            delay *= self.slow_factor
+        return delay
+
+    def _fail(self):
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            self.failures += 1
+            raise StubServiceError("503 Service Unavailable (stub)")
+
+    def _respond(self, prompt, generation_config=None):
+        self.calls += 1
+        if "JSON Array" in prompt:
+            result = [dict(STUB_RESULT, nik=a or b) for a, b in NIK_PATTERN.findall(prompt)]
+        else:
+            result = STUB_RESULT
+        text = json.dumps(result)
+        if (generation_config or {}).get("response_mime_type") == "application/json":
+            return StubResponse(text)
+        if self.messy_rate and self._rng.random() < self.messy_rate:
+            return StubResponse(self._messy(text))
+        return StubResponse("```json\n" + text + "\n```")
+
+    def _messy(self, text):
+        kind = self._rng.randrange(3)
+        if kind == 0:
+            return f"Berikut hasil analisisnya:\n```json\n{text}\n```\nSemoga membantu."
+        if kind == 1:
+            return text[:-1] + ",\n" + text[-1]
+        return "Maaf, saya tidak dapat memberikan analisis untuk data ini."
+
+    def _stream(self, prompt, generation_config):
+        delay = self._delay(prompt)
+        text = self._respond(prompt, generation_config).text
+        n = max(1, -(-len(text) // STREAM_CHUNK_CHARS) - 1)
+        return StubStream(text, delay * STREAM_FIRST_SHARE, delay * (1 - STREAM_FIRST_SHARE) / n)
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        if stream:
+            self._fail()
+            return self._stream(prompt, generation_config)
+        time.sleep(self._delay(prompt))
+        self._fail()
+        return self._respond(prompt, generation_config)
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False, **kwargs):
+        if stream:
+            self._fail()
+            return self._stream(prompt, generation_config)
+        await asyncio.sleep(self._delay(prompt))
+        self._fail()
+        return self._respond(prompt, generation_config)
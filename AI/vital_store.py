@@ -0,0 +1,174 @@
+import numpy as np
+
+from rule_engine import GENDER_KODE, KODE_STATUS, STATUS_KODE
+
+# --- PENYIMPANAN TANDA VITAL KOLOMNAR ---
+# Satu array NumPy per kolom (tb, bb, tensi, umur, gender, skor risiko),
+# diindeks nomor urut pasien. Query populasi seperti "sistole > 150 dan
+# BMI > 30" cukup operasi vektor, tanpa loop Python atas dict pasien.
+
+NUMERIC_FIELDS = ["tb", "bb", "sistole", "diastole", "umur", "bmi", "skor"]
+GENDER_NAMA = {v: k for k, v in GENDER_KODE.items()}
+BUILD_CHUNK = 50000
+
+
+class VitalStore:
+    def __init__(self, niks, columns):
+        self.niks = niks          # array bytes, posisi = nomor urut pasien
+        self.columns = columns    # nama kolom -> array NumPy
+        # Index NIK terurut untuk cari posisi baris (dibuat saat upsert pertama)
+        self._sorted = None
+        self._order = None
+
+    def __len__(self):
+        return len(self.niks)
+
+    @staticmethod
+    def _columns(records, rule_engine):
+        f = rule_engine.featurize(records)
+        status, skor, _, _ = rule_engine.evaluate(records, features=f)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            bmi = f["bb"] / (f["tb"] / 100) ** 2
+        return {
+            "tb": f["tb"].astype(np.float32),
+            "bb": f["bb"].astype(np.float32),
+            "sistole": f["sistole"].astype(np.float32),
+            "diastole": f["diastole"].astype(np.float32),
+            "umur": f["umur"].astype(np.float32),
+            "bmi": bmi.astype(np.float32),
+            "gender": f["gender"],
+            "skor": skor.astype(np.float32),
+            "status": status,
+        }
+
+    @classmethod
+    def build(cls, database, rule_engine, chunk=BUILD_CHUNK):
+        # Dibangun per potongan supaya record dari index mmap tidak dimuat sekaligus
+        niks, parts = [], []
+        batch_niks, batch = [], []
+
+        def flush():
+            parts.append(cls._columns(batch, rule_engine))
+            niks.extend(batch_niks)
+            batch_niks.clear()
+            batch.clear()
+
+        for nik in database:
+            batch_niks.append(nik)
+            batch.append(database[nik])
+            if len(batch) >= chunk:
+                flush()
+        if batch:
+            flush()
+
+        if parts:
+            columns = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+        else:
+            columns = {name: np.zeros(0, dtype=np.float32) for name in NUMERIC_FIELDS}
+            columns["gender"] = np.zeros(0, dtype=np.int8)
+            columns["status"] = np.zeros(0, dtype=np.int8)
+        return cls(np.array(niks, dtype="S32"), columns)
+
+    # --- UPDATE INKREMENTAL ---
+    def _positions(self, keys):
+        # Posisi baris tiap NIK (-1 kalau belum ada), O(log n) per NIK
+        if len(self) == 0:
+            return np.full(len(keys), -1)
+        if self._sorted is None:
+            self._order = np.argsort(self.niks, kind="stable")
+            self._sorted = self.niks[self._order]
+        at = np.minimum(np.searchsorted(self._sorted, keys), len(self) - 1)
+        return np.where(self._sorted[at] == keys, self._order[at], -1)
+
+    def upsert(self, records, rule_engine):
+        # records: NIK -> record terbaru. Baris yang sudah ada diubah di tempat.
+        # Kalau ada NIK baru, hasilnya store BARU (kolom diperpanjang) supaya
+        # query yang sedang jalan tidak melihat kolom dengan panjang berbeda.
+        if not records:
+            return self
+        keys = np.array(list(records), dtype="S32")
+        cols = self._columns(list(records.values()), rule_engine)
+        pos = self._positions(keys)
+        lama = pos >= 0
+        for name, col in self.columns.items():
+            col[pos[lama]] = cols[name][lama]
+        if lama.all():
+            return self
+
+        baru = keys[~lama]
+        store = VitalStore(
+            np.concatenate([self.niks, baru]),
+            {name: np.concatenate([col, cols[name][~lama]]) for name, col in self.columns.items()},
+        )
+        # Index terurut cukup disisipi, tanpa argsort ulang seluruh populasi
+        if self._sorted is not None:
+            order = np.argsort(baru, kind="stable")
+            at = np.searchsorted(self._sorted, baru[order])
+            store._sorted = np.insert(self._sorted, at, baru[order])
+            store._order = np.insert(self._order, at, len(self) + order)
+        return store
+
+    # --- QUERY ---
+    def mask(self, conditions):
+        # conditions: {"sistole_min": 150, "bmi_min": 30, "gender": "female", "status": "BAHAYA"}
+        mask = np.ones(len(self), dtype=bool)
+        for key, value in conditions.items():
+            if key == "gender":
+                mask &= self.columns["gender"] == GENDER_KODE.get(value, 0)
+            elif key == "status":
+                mask &= self.columns["status"] == STATUS_KODE[value]
+            else:
+                field, _, bound = key.rpartition("_")
+                if field not in NUMERIC_FIELDS or bound not in ("min", "max"):
+                    raise ValueError(f"Filter tidak dikenal: {key}")
+                col = self.columns[field]
+                # NaN (data kosong) otomatis tidak lolos perbandingan
+                with np.errstate(invalid="ignore"):
+                    mask &= (col >= float(value)) if bound == "min" else (col <= float(value))
+        return mask
+
+    def rows(self, idx):
+        out = []
+        for i in idx:
+            row = {"nik": self.niks[i].decode()}
+            for field in NUMERIC_FIELDS:
+                v = float(self.columns[field][i])
+                row[field] = None if np.isnan(v) else round(v, 1)
+            row["gender"] = GENDER_NAMA.get(int(self.columns["gender"][i]), "-")
+            row["status"] = KODE_STATUS[int(self.columns["status"][i])]
+            out.append(row)
+        return out
+
+    def filter(self, conditions, limit=100):
+        idx = np.flatnonzero(self.mask(conditions))
+        return {"jumlah": int(len(idx)), "pasien": self.rows(idx[:limit])}
+
+    def top_k(self, k=20, by="skor", conditions=None):
+        if by not in NUMERIC_FIELDS:
+            raise ValueError(f"Kolom tidak dikenal: {by}")
+        idx = np.flatnonzero(self.mask(conditions or {}))
+        values = np.nan_to_num(self.columns[by][idx], nan=-np.inf)
+        k = min(k, len(idx))
+        if k <= 0:
+            return {"jumlah": int(len(idx)), "pasien": []}
+        # argpartition O(n), baru k teratas yang diurutkan
+        top = np.argpartition(-values, k - 1)[:k]
+        top = top[np.argsort(-values[top], kind="stable")]
+        return {"jumlah": int(len(idx)), "pasien": self.rows(idx[top])}
+
+    def histogram(self, field, bins=20, conditions=None, value_range=None):
+        # value_range=(lo, hi): batas bin tetap, supaya histogram beberapa shard
+        # bisa dijumlahkan per bin (router)
+        if field not in NUMERIC_FIELDS:
+            raise ValueError(f"Kolom tidak dikenal: {field}")
+        values = self.columns[field][self.mask(conditions or {})]
+        values = values[~np.isnan(values)]
+        if len(values) == 0 and value_range is None:
+            return {"field": field, "jumlah": 0, "counts": [], "edges": []}
+        counts, edges = np.histogram(values, bins=bins, range=value_range)
+        return {
+            "field": field,
+            "jumlah": int(len(values)),
+            "counts": counts.tolist(),
+            "edges": [round(float(e), 2) for e in edges]
+        }
@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "AI"))
+
+# Throughput bulk risk scoring vs panggilan serial satu per satu,
+# memakai model STUB dengan latency tetap (tanpa Gemini).
+#
+#   python benchmark/bench_bulk.py --patients 5000 --latency 0.5
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk_analyze vs serial")
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--serial-sample", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--parallel", type=int, default=8)
+    args = parser.parse_args()
+
+    from bench_ingest import write_bundle
+    data_dir = os.path.join(ROOT, "benchmark", "data")
+    os.makedirs(data_dir, exist_ok=True)
+    bundle = os.path.join(data_dir, f"fhir_bench_{args.patients}.json")
+    if not os.path.exists(bundle):
+        write_bundle(bundle, args.patients)
+
+    os.environ.update({
+        "FILENAME": bundle,
+        "LLM_STUB": "1",
+        "LLM_STUB_LATENCY": str(args.latency),
+        "RESULT_CACHE_SIZE": "0",
+    })
+    import ai_service
+    import bulk_analyze
+    ai_service.ensure_loaded()
+
+    niks = list(ai_service.DATABASE_CACHE)
+
+    start = time.perf_counter()
+    for nik in niks[:args.serial_sample]:
+        ai_service.analyze_patient_risk(nik)
+    serial_rate = args.serial_sample / (time.perf_counter() - start) * 60
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _, bulk_rate = asyncio.run(bulk_analyze.run_bulk(
+            os.path.join(tmp, "hasil.jsonl"), niks, args.batch_size, args.parallel, 1000
+        ))
+
+    print(f"\nSerial : {serial_rate:>10.0f} pasien/menit")
+    print(f"Bulk   : {bulk_rate:>10.0f} pasien/menit (batch {args.batch_size}, paralel {args.parallel})")
+    print(f"⚡ {bulk_rate / serial_rate:.0f}x lebih cepat")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "AI"))
+
+# Latency per klik dashboard (analisis + gambar graph), diukur dari sisi client:
+#   lama = requests.get tanpa session/timeout, analisis lalu graph berurutan
+#   baru = ApiClient (session keep-alive, graph paralel, cache per NIK + versi)
+# Server uvicorn sungguhan + model STUB. Klik mengulang pasien yang sama
+# seperti dokter yang bolak-balik antar pasien.
+#
+#   python benchmark/bench_frontend_client.py --clicks 40 --distinct 10 --latency 1
+
+
+def click_old(base, nik):
+    response = requests.get(f"{base}/analyze/{nik}")
+    result = response.json()
+    graph = requests.get(f"{base}/graph/{nik}", params={"format": "png"}, timeout=30)
+    return result, graph.content
+
+
+def click_new(client, nik):
+    graph_future = client.graph_async(nik)
+    result = client.cached_analysis(nik)
+    if result is None:
+        for event, data in client.stream_analysis(nik):
+            if event == "done":
+                result = data
+    version, image = graph_future.result()
+    return result, image
+
+
+def timed_clicks(fn, niks):
+    times = []
+    for nik in niks:
+        start = time.perf_counter()
+        fn(nik)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark client dashboard")
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--clicks", type=int, default=40)
+    parser.add_argument("--distinct", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    from bench_ingest import write_bundle
+    from bench_stream import start_server
+    data_dir = os.path.join(ROOT, "benchmark", "data")
+    os.makedirs(data_dir, exist_ok=True)
+    bundle = os.path.join(data_dir, f"fhir_bench_{args.patients}.json")
+    if not os.path.exists(bundle):
+        write_bundle(bundle, args.patients)
+
+    os.environ.update({
+        "FILENAME": bundle,
+        "LLM_STUB": "1",
+        "LLM_STUB_LATENCY": str(args.latency),
+        "RULE_ENGINE": "off",
+    })
+    start_server(args.port)
+    import ai_service
+    ai_service.ensure_loaded()  # load jalan di belakang (lifespan)
+    from api_client import ApiClient
+
+    base = f"http://127.0.0.1:{args.port}"
+    rng = random.Random(42)
+    all_niks = list(ai_service.DATABASE_CACHE)
+    # Pasien berbeda untuk tiap mode supaya cache server tidak menguntungkan salah satunya
+    old_pool, new_pool = all_niks[:args.distinct], all_niks[args.distinct:2 * args.distinct]
+    order = [rng.randrange(args.distinct) for _ in range(args.clicks)]
+
+    old = timed_clicks(lambda nik: click_old(base, nik), [old_pool[i] for i in order])
+    client = ApiClient(base, cache_ttl=60)
+    new = timed_clicks(lambda nik: click_new(client, nik), [new_pool[i] for i in order])
+
+    # Klik pertama per pasien (belum ada cache di mana pun) vs klik ulang
+    first = [order.index(i) == n for n, i in enumerate(order)]
+    for name, times in (("lama", old), ("baru", new)):
+        cold = [t for t, f in zip(times, first) if f]
+        warm = [t for t, f in zip(times, first) if not f]
+        print(f"{name}: rata2 {statistics.mean(times) * 1000:8.1f} ms | pasien baru {statistics.mean(cold) * 1000:8.1f} ms"
+              f" | klik ulang {statistics.mean(warm) * 1000:6.2f} ms")
+    print(f"Cache client: {client.stats()}")
+    print(f"⚡ Rata-rata per klik {statistics.mean(old) / statistics.mean(new):.1f}x lebih cepat")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "AI"))
+
+# Ingest inkremental vs restart: waktu menerapkan delta kecil (Observation +
+# MedicationRequest + pasien baru) dibanding parsing ulang seluruh bundle.
+#
+#   python benchmark/bench_incremental.py --patients 20000 --delta 100
+
+
+def make_delta(rng, niks, size):
+    resources = []
+    for i in range(size):
+        if i % 10 == 0:
+            pid = str(uuid.UUID(int=rng.getrandbits(128)))
+            resources.append({
+                "resourceType": "Patient", "id": pid,
+                "identifier": [{"value": f"9{rng.randrange(10 ** 15):015d}"}],
+                "name": [{"text": "Pasien Delta"}], "gender": "female", "birthDate": "1990-05-01",
+            })
+            resources.append({
+                "resourceType": "Observation", "id": str(uuid.uuid4()),
+                "subject": {"reference": f"urn:uuid:{pid}"},
+                "code": {"coding": [{"code": "29463-7"}]},
+                "valueQuantity": {"value": rng.randint(45, 110), "unit": "kg"},
+            })
+        elif i % 2 == 0:
+            resources.append({
+                "resourceType": "Observation", "id": str(uuid.uuid4()),
+                "subject": {"identifier": {"value": rng.choice(niks)}},
+                "code": {"coding": [{"code": "85354-9"}]},
+                "effectiveDateTime": f"2026-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T08:00:00+07:00",
+                "component": [{"valueQuantity": {"value": rng.randint(100, 190)}},
+                              {"valueQuantity": {"value": rng.randint(60, 120)}}],
+            })
+        else:
+            resources.append({
+                "resourceType": "MedicationRequest", "id": str(uuid.uuid4()),
+                "subject": {"identifier": {"value": rng.choice(niks)}},
+                "medicationCodeableConcept": {"coding": [{"code": "93001006", "display": "Amlodipine 10mg"}]},
+                "reasonCode": [{"text": "Hipertensi"}],
+            })
+    return resources
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingest inkremental")
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--delta", type=int, default=100, help="resource per delta")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    from bench_ingest import write_bundle
+    data_dir = os.path.join(ROOT, "benchmark", "data")
+    os.makedirs(data_dir, exist_ok=True)
+    bundle = os.path.join(data_dir, f"fhir_bench_{args.patients}.json")
+    if not os.path.exists(bundle):
+        write_bundle(bundle, args.patients)
+
+    os.environ.update({"FILENAME": bundle, "LLM_STUB": "1", "COMPILED_INDEX": "0"})
+    import ai_service
+    ai_service.ensure_loaded()
+
+    start = time.perf_counter()
+    ai_service.load_and_parse_data(bundle)
+    reparse = time.perf_counter() - start
+
+    # Vital store ikut diperbarui per delta (kondisi setelah query populasi)
+    ai_service.get_vital_store()
+    rng = random.Random(42)
+    niks = list(ai_service.DATABASE_CACHE)
+    latencies = []
+    for _ in range(args.rounds):
+        delta = make_delta(rng, niks, args.delta)
+        t = time.perf_counter()
+        ai_service.ingest_resources(delta)
+        latencies.append(time.perf_counter() - t)
+
+    p50 = statistics.median(latencies)
+    print(f"Parsing ulang penuh ({args.patients} pasien): {reparse * 1000:10.1f} ms")
+    print(f"Ingest delta {args.delta} resource (p50)   : {p50 * 1000:10.2f} ms"
+          f" | max {max(latencies) * 1000:.2f} ms")
+    print(f"Total pasien setelah ingest: {len(ai_service.DATABASE_CACHE)}"
+          f" | vital store: {len(ai_service.VITAL_STORE)}")
+    print(f"⚡ Delta vs restart: {reparse / p50:.0f}x lebih cepat")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "AI"))
+
+# Benchmark load data: mode json.load (lama) vs streaming satu kali lewat.
+# Tiap pengukuran jalan di proses terpisah supaya peak RSS tidak tercampur.
+#
+#   python benchmark/bench_ingest.py --sizes 1000,100000,1000000
+
+
+def write_bundle(path, total, seed=42, observations=1):
+    # Dataset dari generate_dataset.py, ditulis bertahap (memori tetap kecil
+    # untuk 1 juta pasien) dan sama persis untuk seed yang sama
+    import generate_dataset
+
+    fmt = "ndjson" if path.endswith(".ndjson") else "bundle"
+    generate_dataset.write_dataset(path, total, seed=seed, fmt=fmt, workers=os.cpu_count() or 1,
+                                   observations=observations)
+
+
+def run_child(path, mode):
+    from fhir_parser import parse_bundle_file
+
+    start = time.perf_counter()
+    database, _ = parse_bundle_file(path, stream=(mode == "stream"))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"detik": round(elapsed, 3), "peak_rss_mb": round(peak_rss_mb(), 1), "pasien": len(database)}))
+
+
+def peak_rss_mb():
+    # VmHWM di-reset saat exec; ru_maxrss ikut mewarisi RSS proses induk
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(path, mode):
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", path, "--mode", mode],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark load_and_parse_data")
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--workdir", default=os.path.join(ROOT, "benchmark", "data"))
+    parser.add_argument("--child")
+    parser.add_argument("--mode", default="stream")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.mode)
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    print(f"{'pasien':>10} {'mode':>8} {'ukuran MB':>10} {'detik':>8} {'peak MB':>9}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        path = os.path.join(args.workdir, f"fhir_bench_{size}.json")
+        if not os.path.exists(path):
+            print(f"🔄 Generate {size} pasien -> {path}")
+            write_bundle(path, size)
+        file_mb = os.path.getsize(path) / (1024 * 1024)
+        for mode in ("json", "stream"):
+            r = measure(path, mode)
+            print(f"{r['pasien']:>10} {mode:>8} {file_mb:>10.1f} {r['detik']:>8.2f} {r['peak_rss_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "AI"))
+
+# Backend LLM offline: model STUB dengan ekor lambat & error sementara.
+# Dibandingkan tanpa apa-apa, dengan retry, dan dengan retry + hedged request
+# (p50 / p95 / p99 latency, error yang sampai ke pemanggil, request tambahan).
+#
+#   python benchmark/bench_llm_backend.py --requests 400 --latency 0.2 --slow-rate 0.05
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+async def run(backend, requests, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        async with sem:
+            start = time.perf_counter()
+            try:
+                await backend.generate_content_async(f"NIK: {i}")
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend LLM (retry & hedging)")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-factor", type=float, default=10.0)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    from llm_backend import create_backend
+    stub = {"latency": args.latency, "slow_rate": args.slow_rate, "slow_factor": args.slow_factor,
+            "failure_rate": args.failure_rate, "seed": 7}
+    setups = {
+        "polos": dict(retries=0),
+        "retry": dict(retries=2, backoff=0.05),
+        "retry + hedge p95": dict(retries=2, backoff=0.05, hedge=True),
+    }
+    for name, options in setups.items():
+        backend = create_backend("stub", stub_options=stub, **options)
+        # Pemanasan agar p95 untuk hedge sudah terisi
+        asyncio.run(run(backend, 50, args.concurrency))
+        before = backend.stats()
+        latencies, errors = asyncio.run(run(backend, args.requests, args.concurrency))
+        after = backend.stats()
+        # Request tambahan ke provider = retry + hedge
+        extra = sum(after.get(k, 0) - before.get(k, 0) for k in ("retry", "hedge"))
+        print(f"{name:<18} p50 {statistics.median(latencies) * 1000:7.1f} ms"
+              f" | p95 {percentile(latencies, 0.95) * 1000:7.1f} ms"
+              f" | p99 {percentile(latencies, 0.99) * 1000:7.1f} ms"
+              f" | error {errors:3d} | request tambahan {extra:3d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "AI"))
+
+# Memori per pasien: dict bersarang (lama) vs CompactPatientDB (__slots__ +
+# vocabulary), termasuk riwayat tanda vital (VitalHistory) yang ikut dibangun
+# saat startup. Diukur dengan tracemalloc dan RSS, tiap mode di proses terpisah.
+#
+#   python benchmark/bench_memory.py --patients 100000 --observations 3
+
+
+def run_child(path, mode):
+    from bench_ingest import peak_rss_mb
+    from fhir_parser import parse_bundle_file
+    from ingest import VitalHistory
+    from patient_record import CompactPatientDB
+
+    tracemalloc.start()
+    into = CompactPatientDB() if mode == "compact" else None
+    history = VitalHistory()
+    database, uuid_to_nik = parse_bundle_file(path, into=into, on_vital=history.add)
+    del uuid_to_nik
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    # Alokasi kolom riwayat tercatat di ingest.py
+    history_bytes = sum(stat.size for stat in tracemalloc.take_snapshot().statistics("filename")
+                        if stat.traceback[0].filename.endswith("ingest.py"))
+    tracemalloc.stop()
+
+    with open("/proc/self/status") as f:
+        rss = next(int(line.split()[1]) / 1024 for line in f if line.startswith("VmRSS:"))
+    print(json.dumps({
+        "pasien": len(database),
+        "bytes_per_pasien": round(current / len(database)),
+        "riwayat_per_pasien": round(history_bytes / len(database)),
+        "rss_mb": round(rss, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memori record pasien")
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--child")
+    parser.add_argument("--mode", default="dict")
+    parser.add_argument("--observations", type=int, default=1, help="pengukuran per tanda vital per pasien")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.mode)
+        return
+
+    from bench_ingest import write_bundle
+    data_dir = os.path.join(ROOT, "benchmark", "data")
+    os.makedirs(data_dir, exist_ok=True)
+    suffix = f"_o{args.observations}" if args.observations > 1 else ""
+    bundle = os.path.join(data_dir, f"fhir_bench_{args.patients}{suffix}.json")
+    if not os.path.exists(bundle):
+        write_bundle(bundle, args.patients, observations=args.observations)
+
+    for mode in ("dict", "compact"):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", bundle, "--mode", mode],
+            check=True, capture_output=True, text=True,
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{mode:>8}: {r['bytes_per_pasien']:>6} byte/pasien (riwayat {r['riwayat_per_pasien']:>4})"
+              f" | RSS {r['rss_mb']:>8.1f} MB"
+              f" | peak {r['peak_rss_mb']:>8.1f} MB ({r['pasien']} pasien)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "AI"))
+
+# Latency query graph populasi (k-hop, co-prescription, pola interaksi) di
+# skala besar. Edge dibuat langsung sebagai array (tanpa bundle FHIR) supaya
+# 1 juta pasien / 3 juta resep bisa dicoba di laptop.
+#
+#   python benchmark/bench_population_graph.py --patients 1000000 --prescriptions 3000000
+
+
+def synthetic_graph(patients, prescriptions, extra_drugs, diagnoses, seed=42):
+    from population_graph import PopulationGraph
+    from rule_engine import KFA_VOCAB
+
+    rng = np.random.default_rng(seed)
+    entities = [("obat", kfa, info["nama"]) for kfa, info in KFA_VOCAB.items()]
+    entities += [("obat", f"99{i:06d}", f"Obat Sintetis {i}") for i in range(extra_drugs)]
+    n_drugs = len(entities)
+    entities += [("diagnosa", f"Diagnosa {i}", f"Diagnosa {i}") for i in range(diagnoses)]
+    entities += [("alergi", "penicillin", "Penicillin"), ("alergi", "sulfa", "Sulfa")]
+
+    # Popularitas obat/diagnosa mengikuti Zipf (beberapa obat sangat umum)
+    drug_p = 1 / np.arange(1, n_drugs + 1) ** 1.1
+    diag_p = 1 / np.arange(1, diagnoses + 1) ** 1.1
+    pat = rng.integers(0, patients, prescriptions)
+    drug = rng.choice(n_drugs, prescriptions, p=drug_p / drug_p.sum())
+    diag = n_drugs + rng.choice(diagnoses, prescriptions, p=diag_p / diag_p.sum())
+    allergic = rng.choice(patients, patients // 10, replace=False)
+    alergi = np.full(len(allergic), n_drugs + diagnoses)
+
+    pat_idx = np.concatenate([pat, pat, allergic])
+    ent_idx = np.concatenate([drug, diag, alergi])
+    niks = np.array([f"33{i:014d}" for i in range(patients)], dtype="S32")
+    return PopulationGraph(niks, entities, pat_idx, ent_idx)
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return statistics.median(times) * 1000, max(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark graph populasi (CSR)")
+    parser.add_argument("--patients", type=int, default=1000000)
+    parser.add_argument("--prescriptions", type=int, default=3000000)
+    parser.add_argument("--extra-drugs", type=int, default=2000)
+    parser.add_argument("--diagnoses", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph = synthetic_graph(args.patients, args.prescriptions, args.extra_drugs, args.diagnoses)
+    print(f"Build CSR: {(time.perf_counter() - start):.1f} s | {graph.stats()}")
+
+    nik = graph.niks[12345 % args.patients].decode()
+    queries = {
+        "k-hop pasien (k=2)": lambda: graph.k_hop("pasien", nik, k=2),
+        "k-hop obat langka (k=2)": lambda: graph.k_hop("obat", "99001500", k=2),
+        "k-hop Clopidogrel (k=1)": lambda: graph.k_hop("obat", "93001002", k=1),
+        "co-prescription Clopidogrel": lambda: graph.co_prescription("93001002"),
+        "interaksi Clopidogrel + NSAID": lambda: graph.interaction("Clopidogrel", "nsaid"),
+        "semua pola aturan": lambda: graph.interaction_patterns(),
+    }
+    for name, fn in queries.items():
+        p50, worst = timed(fn, args.repeat)
+        print(f"{name:<32} p50 {p50:8.1f} ms | max {worst:8.1f} ms")
+
+    # Update dari ingest (overlay) lalu query lagi
+    records = {graph.niks[i].decode(): {"profil": {"alergi": []},
+                                        "medis": [{"kfa": "93001002", "obat": "Clopidogrel", "diagnosa": "-"},
+                                                  {"kfa": "93001003", "obat": "Asam Mefenamat", "diagnosa": "-"}]}
+               for i in range(0, args.patients, max(1, args.patients // 500))}
+    p50, _ = timed(lambda: graph.update(records), 1)
+    print(f"{'update overlay ' + str(len(records)) + ' pasien':<32} p50 {p50:8.1f} ms")
+    p50, worst = timed(queries["interaksi Clopidogrel + NSAID"], args.repeat)
+    print(f"{'interaksi (dengan overlay)':<32} p50 {p50:8.1f} ms | max {worst:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "AI"))
+
+# Ukuran konteks prompt per format (legacy json indent=2 vs compact vs json)
+# dan dampaknya ke latency LLM STUB yang ikut lambat sebanding jumlah token.
+#
+#   python benchmark/bench_prompt.py --patients 1000 --sample 200 --token-latency 0.5
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ukuran prompt")
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--sample", type=int, default=200)
+    parser.add_argument("--max-tokens", type=int, default=3000)
+    parser.add_argument("--token-latency", type=float, default=0.5, help="detik per 1000 token (STUB)")
+    args = parser.parse_args()
+
+    from bench_ingest import write_bundle
+    data_dir = os.path.join(ROOT, "benchmark", "data")
+    os.makedirs(data_dir, exist_ok=True)
+    bundle = os.path.join(data_dir, f"fhir_bench_{args.patients}.json")
+    if not os.path.exists(bundle):
+        write_bundle(bundle, args.patients)
+
+    os.environ.update({"FILENAME": bundle, "LLM_STUB": "1"})
+    import ai_service
+    ai_service.ensure_loaded()
+    from prompt_builder import PROMPT_FORMATS, PromptBuilder, estimate_tokens
+    from stub_model import StubGenerativeModel
+
+    records = list(ai_service.DATABASE_CACHE.values())
+    model = StubGenerativeModel(latency=0.0, latency_per_1k_token=args.token_latency)
+    results = {}
+    for fmt in PROMPT_FORMATS:
+        builder = PromptBuilder(fmt, args.max_tokens)
+        start = time.perf_counter()
+        prompts = [ai_service.PROMPT_TEMPLATE.format(context=builder.context(d)[0]) for d in records]
+        build_ms = (time.perf_counter() - start) * 1000 / len(records)
+        tokens = [estimate_tokens(p) for p in prompts]
+        # Latency STUB dihitung dari panjang prompt (tanpa benar-benar tidur)
+        delays = [model._delay(p) for p in prompts[:args.sample]]
+        results[fmt] = statistics.mean(tokens)
+        print(f"{fmt:<8} token prompt rata2 {statistics.mean(tokens):8.1f} | maks {max(tokens):6d}"
+              f" | bangun {build_ms:.3f} ms/pasien | latency STUB rata2 {statistics.mean(delays) * 1000:7.1f} ms")
+
+    print(f"⚡ compact vs legacy: {100 * (1 - results['compact'] / results['legacy']):.1f}% token lebih sedikit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "AI"))
+
+# Dampak rule engine: jumlah panggilan LLM & latency p50 /analyze
+# dengan RULE_ENGINE=off vs skip (model STUB, cache dimatikan).
+#
+#   python benchmark/bench_rules.py --patients 1000 --sample 300 --latency 0.2
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rule engine pre-filter")
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--sample", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    from bench_ingest import write_bundle
+    data_dir = os.path.join(ROOT, "benchmark", "data")
+    os.makedirs(data_dir, exist_ok=True)
+    bundle = os.path.join(data_dir, f"fhir_bench_{args.patients}.json")
+    if not os.path.exists(bundle):
+        write_bundle(bundle, args.patients)
+
+    os.environ.update({
+        "FILENAME": bundle,
+        "LLM_STUB": "1",
+        "LLM_STUB_LATENCY": str(args.latency),
+        "RESULT_CACHE_SIZE": "0",
+    })
+    import ai_service
+    ai_service.ensure_loaded()
+
+    records = list(ai_service.DATABASE_CACHE.values())
+    start = time.perf_counter()
+    ai_service.RULE_ENGINE.evaluate(records)
+    print(f"Evaluasi aturan seluruh populasi ({len(records)} pasien): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    niks = list(ai_service.DATABASE_CACHE)[:args.sample]
+    for mode in ("off", "skip"):
+        ai_service.RULE_ENGINE_MODE = mode
+        calls_before = ai_service.model.calls
+        latencies = []
+        for nik in niks:
+            t = time.perf_counter()
+            ai_service.analyze_patient_risk(nik)
+            latencies.append(time.perf_counter() - t)
+        calls = ai_service.model.calls - calls_before
+        print(f"{mode:>5}: panggilan LLM {calls:>5}/{len(niks)} | p50 {statistics.median(latencies) * 1000:8.2f} ms"
+              f" | mean {statistics.mean(latencies) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "AI"))
+
+# Index pencarian pasien vs cara lama (scan semua nama per ketikan).
+# Data sintetis di memori: NIK 16 digit acak + nama dari daftar nama umum.
+#
+#   python benchmark/bench_search.py --patients 300000 --queries 200
+
+FIRST = ["Budi", "Siti", "Agus", "Dewi", "Andi", "Rina", "Joko", "Sri", "Ahmad", "Nur", "Putri",
+         "Eko", "Wahyu", "Indah", "Rudi", "Ayu", "Hendra", "Fitri", "Bambang", "Lestari"]
+LAST = ["Santoso", "Wijaya", "Saputra", "Hidayat", "Kusuma", "Pratama", "Setiawan", "Nugroho",
+        "Rahmawati", "Susanto", "Permana", "Halim", "Gunawan", "Wibowo", "Lubis", "Siregar"]
+
+
+def synthetic(n, rng):
+    seen = set()
+    while len(seen) < n:
+        seen.add("".join(rng.choice("0123456789") for _ in range(16)))
+    return [(nik, f"{rng.choice(FIRST)} {rng.choice(LAST)}") for nik in seen]
+
+
+def scan(patients, query, limit):
+    # Cara lama: setiap pilihan di selectbox dicocokkan satu per satu
+    query = query.lower()
+    return [nik for nik, nama in patients if query in nik or query in nama.lower()][:limit]
+
+
+def timed(fn, queries):
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pencarian pasien")
+    parser.add_argument("--patients", type=int, default=300000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    from search_index import PatientSearchIndex
+
+    class Names(dict):
+        def names(self):
+            return self.items()
+
+    rng = random.Random(42)
+    patients = synthetic(args.patients, rng)
+    start = time.perf_counter()
+    index = PatientSearchIndex.build(Names(patients))
+    print(f"Build index {len(index)} pasien: {time.perf_counter() - start:.2f} s ({index.stats()})")
+
+    kinds = {
+        "prefix NIK": lambda: rng.choice(patients)[0][:rng.randint(3, 8)],
+        "nama lengkap": lambda: rng.choice(patients)[1],
+        "prefix nama": lambda: rng.choice(FIRST)[:rng.randint(1, 3)],
+        "salah ketik": lambda: rng.choice(LAST)[:-1] + "x",
+    }
+    for kind, make in kinds.items():
+        queries = [make() for _ in range(args.queries)]
+        new = timed(lambda q: index.search(q, args.limit), queries)
+        old = timed(lambda q: scan(patients, q, args.limit), queries[:10])
+        print(f"{kind:<13} index p50 {statistics.median(new) * 1000:7.2f} ms | max {max(new) * 1000:7.2f} ms"
+              f" | scan p50 {statistics.median(old) * 1000:8.1f} ms")
+
+    updates = {nik: {"profil": {"nama": "Pasien Baru"}} for nik, _ in synthetic(100, rng)}
+    start = time.perf_counter()
+    index.update(updates)
+    print(f"Update 100 pasien (ingest): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
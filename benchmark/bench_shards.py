@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import sys
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "AI"))
+
+# Mode shard lokal: N proses main.py (SHARD_INDEX/SHARD_COUNT) + router.py di
+# depannya, semua proses uvicorn sungguhan. Per N diukur RSS tiap shard dan
+# throughput /analyze lewat router. Model STUB dengan LLM_MAX_INFLIGHT kecil per
+# shard, jadi kapasitas tiap shard terbatas seperti kuota API per node.
+# --check: gagal (exit 1) kalau memori data per shard / throughput tidak
+# berskala mendekati linear.
+#
+#   python benchmark/bench_shards.py --patients 100000 --shards 1,2,4 --check
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def shard_env(args, bundle, index, count):
+    return {
+        "FILENAME": bundle,
+        "SHARD_INDEX": str(index),
+        "SHARD_COUNT": str(count),
+        "LLM_STUB": "1",
+        "LLM_STUB_LATENCY": str(args.latency),
+        "LLM_MAX_INFLIGHT": str(args.max_inflight),
+        "RESULT_CACHE_SIZE": "0",
+        "RULE_ENGINE": "off",
+        "COMPILED_INDEX": "0",
+        "INGEST": "0",
+    }
+
+
+def stop(procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        proc.wait()
+
+
+def run_setup(args, bundle, niks, count):
+    from load_test_analyze import run_load, start_server
+
+    procs = []
+    try:
+        ports = [args.base_port + 1 + i for i in range(count)]
+        for i, port in enumerate(ports):
+            procs.append(start_server(port, shard_env(args, bundle, i, count)))
+        urls = ",".join(f"http://127.0.0.1:{p}" for p in ports)
+        procs.append(start_server(args.base_port, {"SHARD_URLS": urls, "ROUTER_POOL_SIZE": str(args.concurrency)},
+                                  app="router:app"))
+        run_load(args.base_port, niks, min(50, args.requests), args.concurrency)  # pemanasan
+        load = run_load(args.base_port, niks, args.requests, args.concurrency)
+        rss = [rss_mb(p.pid) for p in procs[:count]]
+        patients = []
+        for port in ports:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as resp:
+                patients.append(json.loads(resp.read())["ingest"]["pasien"])
+        failed = sum(v for k, v in load["status"].items() if k != 200)
+        return {"shard": count, "throughput_rps": load["throughput_rps"], "p50_ms": load["analyze_p50_ms"],
+                "p99_ms": load["analyze_p99_ms"], "rss_max_mb": round(max(rss), 1),
+                "pasien_max": max(patients), "gagal": failed}
+    finally:
+        stop(procs)
+
+
+def baseline_rss(args):
+    # RSS satu proses tanpa data pasien (interpreter + import), untuk memisahkan
+    # memori data dari biaya tetap per proses
+    from load_test_analyze import start_server
+    env = shard_env(args, os.path.join(ROOT, "benchmark", "data", "tidak-ada.json"), 0, 1)
+    proc = start_server(args.base_port + 99, env)
+    try:
+        return rss_mb(proc.pid)
+    finally:
+        stop([proc])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mode shard + router")
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--shards", default="1,2,4")
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.2, help="latency model STUB (detik)")
+    parser.add_argument("--max-inflight", type=int, default=8, help="panggilan LLM bersamaan per shard")
+    parser.add_argument("--base-port", type=int, default=8800)
+    parser.add_argument("--check", action="store_true", help="exit 1 kalau tidak berskala mendekati linear")
+    args = parser.parse_args()
+
+    from bench_ingest import write_bundle
+    from load_test_analyze import sample_niks
+    data_dir = os.path.join(ROOT, "benchmark", "data")
+    os.makedirs(data_dir, exist_ok=True)
+    bundle = os.path.join(data_dir, f"fhir_bench_{args.patients}.json")
+    if not os.path.exists(bundle):
+        write_bundle(bundle, args.patients)
+    niks = sample_niks(bundle, 400)
+
+    base = baseline_rss(args)
+    print(f"RSS proses tanpa data: {base:.1f} MB")
+    print(f"{'shard':>5} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8} {'RSS/shard':>10} {'data/shard':>11} {'pasien/shard':>13} {'gagal':>6}")
+    results = []
+    for count in [int(n) for n in args.shards.split(",")]:
+        r = run_setup(args, bundle, niks, count)
+        r["data_mb"] = round(r["rss_max_mb"] - base, 1)
+        results.append(r)
+        print(f"{count:>5} {r['throughput_rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['rss_max_mb']:>9.1f}M"
+              f" {r['data_mb']:>10.1f}M {r['pasien_max']:>13} {r['gagal']:>6}")
+
+    first = results[0]
+    ok = True
+    for r in results[1:]:
+        scale = r["shard"] / first["shard"]
+        throughput_eff = r["throughput_rps"] / (first["throughput_rps"] * scale)
+        memory_ratio = r["data_mb"] / (first["data_mb"] / scale) if first["data_mb"] > 0 else 0.0
+        print(f"⚡ {r['shard']} shard: throughput {throughput_eff:.0%} dari linear, "
+              f"memori data per shard {memory_ratio:.2f}x dari ideal (1/{scale:g})")
+        ok &= throughput_eff >= 0.7 and memory_ratio <= 1.5 and r["gagal"] == 0
+    if args.check and not ok:
+        print("❌ Tidak berskala mendekati linear")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
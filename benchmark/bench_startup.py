@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AI_DIR = os.path.join(ROOT, "AI")
+sys.path.insert(0, AI_DIR)
+
+# Waktu startup kedua entry point:
+#   1. import (python -X importtime): total main / ai_service / api_client, dan
+#      modul berat yang TIDAK boleh ikut ter-import saat startup
+#   2. cold start server uvicorn sungguhan: ms sampai port menjawab (/) dan
+#      sampai data siap (/ready = 200), progres /ready selama load, serta
+#      status /analyze selama load (harus 503, tidak boleh dilayani setengah jadi)
+# --check: exit 1 kalau ada modul berat ter-import, port terlambat terbuka,
+# atau ada request data yang dijawab selain 503 sebelum siap.
+#
+#   python benchmark/bench_startup.py --patients 20000 --check
+
+# Modul yang baru boleh di-import saat dipakai (graph, plotting, SDK LLM, numpy)
+HEAVY_MODULES = ("networkx", "matplotlib", "google.generativeai", "numpy", "pandas")
+# Yang diukur: modul -> perintah import
+ENTRY_POINTS = {
+    "main": "import main",
+    "ai_service": "import ai_service",
+    "api_client": "import api_client",
+}
+
+
+def import_times(statement):
+    # Hasil: {modul: kumulatif_ms} dari stderr -X importtime
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=AI_DIR,
+                            capture_output=True, text=True, env=dict(os.environ, FILENAME="tidak-ada.json"))
+    if result.returncode != 0:
+        raise RuntimeError(f"'{statement}' gagal:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def check_imports(repeat):
+    ok = True
+    print(f"{'entry point':<12} {'import ms':>10}  modul berat ter-import")
+    for name, statement in ENTRY_POINTS.items():
+        # Ambil yang tercepat (cache disk OS & .pyc sudah hangat)
+        runs = [import_times(statement) for _ in range(repeat)]
+        best = min(r.get(name, 0.0) for r in runs)
+        heavy = sorted(m for m in runs[0] if m in HEAVY_MODULES)
+        ok &= not heavy
+        print(f"{name:<12} {best:>10.1f}  {', '.join(heavy) or '-'}")
+    return ok
+
+
+def get(url, timeout=1):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except Exception:
+        return 0, b""
+
+
+def cold_start(args, bundle, nik):
+    env = dict(os.environ, FILENAME=bundle, LLM_STUB="1", LLM_STUB_LATENCY="0", COMPILED_INDEX="0", INGEST="0")
+    base = f"http://127.0.0.1:{args.port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+                             "--log-level", "warning"], cwd=AI_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    port_ms = ready_ms = None
+    early = {}        # status /analyze sebelum /ready = 200
+    progress = []
+    try:
+        while time.perf_counter() - start < args.timeout:
+            if port_ms is None:
+                if get(f"{base}/")[0] == 200:
+                    port_ms = (time.perf_counter() - start) * 1000
+                else:
+                    time.sleep(0.005)
+                continue
+            # Urutan penting: /analyze dulu, baru /ready. Kalau /ready sudah
+            # 200, /analyze sebelumnya boleh saja sudah dilayani.
+            code, _ = get(f"{base}/analyze/{nik}", timeout=30)
+            ready, body = get(f"{base}/ready")
+            if ready == 200:
+                ready_ms = (time.perf_counter() - start) * 1000
+                break
+            early[code] = early.get(code, 0) + 1
+            state = json.loads(body or b"{}")
+            progress.append(f"{state.get('tahap')}:{state.get('resource', 0)}")
+            time.sleep(0.05)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {"port_ms": port_ms, "ready_ms": ready_ms, "early": early, "progress": progress}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark waktu startup (import & cold start server)")
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3, help="pengulangan pengukuran import (diambil tercepat)")
+    parser.add_argument("--port", type=int, default=8870)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--max-port-ms", type=float, default=3000, help="batas ms sampai port menjawab (--check)")
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    from bench_ingest import write_bundle
+    from load_test_analyze import sample_niks
+    data_dir = os.path.join(ROOT, "benchmark", "data")
+    os.makedirs(data_dir, exist_ok=True)
+    bundle = os.path.join(data_dir, f"fhir_bench_{args.patients}.json")
+    if not os.path.exists(bundle):
+        write_bundle(bundle, args.patients)
+
+    ok = check_imports(args.repeat)
+
+    r = cold_start(args, bundle, sample_niks(bundle, 1)[0])
+    if r["port_ms"] is None or r["ready_ms"] is None:
+        print("❌ Server tidak kunjung siap")
+        sys.exit(1)
+    served_early = sum(n for code, n in r["early"].items() if code != 503)
+    steps = list(dict.fromkeys(r["progress"]))
+    print(f"\n⚡ Cold start {args.patients} pasien: port menjawab {r['port_ms']:.0f} ms, "
+          f"data siap {r['ready_ms']:.0f} ms")
+    print(f"   /analyze selama load: {r['early'] or '-'} | progres /ready: {' -> '.join(steps[:3])}"
+          f"{' -> ... -> ' + steps[-1] if len(steps) > 3 else ''}")
+    if served_early:
+        print(f"❌ {served_early} request data dijawab sebelum siap")
+    ok &= not served_early and r["port_ms"] <= args.max_port_ms
+    if args.check and not ok:
+        print("❌ Startup tidak memenuhi syarat")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "AI"))
+
+# Streaming end-to-end: server uvicorn sungguhan + model STUB yang mengirim
+# jawaban bertahap. Diukur waktu sampai field pertama (status) tiba di client
+# vs waktu sampai jawaban lengkap (= yang dirasakan dengan /analyze biasa).
+#
+#   python benchmark/bench_stream.py --patients 1000 --requests 20 --latency 2
+
+
+def start_server(port):
+    import uvicorn
+    import main
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def stream_once(url):
+    start = time.perf_counter()
+    first, fields = None, []
+    with requests.get(url, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:") and event == "field":
+                if first is None:
+                    first = time.perf_counter() - start
+                fields.append(json.loads(line[5:])["field"])
+    return first, time.perf_counter() - start, fields
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analisis streaming (SSE)")
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    from bench_ingest import write_bundle
+    data_dir = os.path.join(ROOT, "benchmark", "data")
+    os.makedirs(data_dir, exist_ok=True)
+    bundle = os.path.join(data_dir, f"fhir_bench_{args.patients}.json")
+    if not os.path.exists(bundle):
+        write_bundle(bundle, args.patients)
+
+    os.environ.update({
+        "FILENAME": bundle,
+        "LLM_STUB": "1",
+        "LLM_STUB_LATENCY": str(args.latency),
+        "RESULT_CACHE_SIZE": "0",
+        "RULE_ENGINE": "off",
+    })
+    start_server(args.port)
+    import ai_service
+    ai_service.ensure_loaded()  # load jalan di belakang (lifespan)
+
+    niks = list(ai_service.DATABASE_CACHE)[:args.requests]
+    firsts, totals = [], []
+    for nik in niks:
+        first, total, fields = stream_once(f"http://127.0.0.1:{args.port}/analyze/{nik}/stream")
+        firsts.append(first)
+        totals.append(total)
+    print(f"Urutan field: {fields}")
+    print(f"Field pertama (p50): {statistics.median(firsts) * 1000:8.1f} ms")
+    print(f"Jawaban lengkap (p50): {statistics.median(totals) * 1000:8.1f} ms")
+    print(f"⚡ Konten pertama tampil {statistics.median(totals) / statistics.median(firsts):.1f}x lebih cepat")
+
+
+if __name__ == "__main__":
+    main()
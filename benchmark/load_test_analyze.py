@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AI_DIR = os.path.join(ROOT, "AI")
+sys.path.insert(0, AI_DIR)
+
+# Load test /analyze/{nik} memakai model STUB (latency tetap, tanpa Gemini).
+# Membandingkan endpoint sync lama (ANALYZE_ASYNC=0) dengan jalur async,
+# sambil mengukur latency health check "/" yang dipanggil bersamaan.
+#
+#   python benchmark/load_test_analyze.py --requests 400 --concurrency 200
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def fetch(url, timeout=120):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            resp.read()
+            code = resp.status
+    except urllib.error.HTTPError as e:
+        code = e.code
+    except Exception:
+        code = 0
+    return code, time.perf_counter() - start
+
+
+def start_server(port, env_extra, app="main:app"):
+    env = dict(os.environ)
+    env.update(env_extra)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=AI_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    # Port terbuka sebelum data selesai di-load: tunggu /ready, bukan /
+    for _ in range(300):
+        code, _ = fetch(f"http://127.0.0.1:{port}/ready", timeout=1)
+        if code == 200:
+            return proc
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("Server tidak kunjung siap")
+
+
+def sample_niks(path, n):
+    from fhir_parser import parse_bundle_file
+    database, _ = parse_bundle_file(path)
+    return list(database)[:n]
+
+
+def run_load(port, niks, total, concurrency):
+    base = f"http://127.0.0.1:{port}"
+    codes = {}
+    latencies = []
+    health = []
+    done = threading.Event()
+
+    def probe():
+        while not done.is_set():
+            _, dt = fetch(f"{base}/", timeout=120)
+            health.append(dt)
+            time.sleep(0.05)
+
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(fetch, f"{base}/analyze/{niks[i % len(niks)]}") for i in range(total)]
+        for fut in futures:
+            code, dt = fut.result()
+            codes[code] = codes.get(code, 0) + 1
+            if code == 200:
+                latencies.append(dt)
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+    return {
+        "throughput_rps": round(codes.get(200, 0) / elapsed, 1),
+        "analyze_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "analyze_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "health_p50_ms": round(percentile(health, 50) * 1000, 1),
+        "health_p99_ms": round(percentile(health, 99) * 1000, 1),
+        "health_mean_ms": round(statistics.mean(health) * 1000, 1) if health else 0.0,
+        "status": codes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /analyze dengan model stub")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=1.0, help="latency model stub (detik)")
+    parser.add_argument("--max-inflight", type=int, default=200)
+    parser.add_argument("--max-queue", type=int, default=256)
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    from bench_ingest import write_bundle
+    data_dir = os.path.join(ROOT, "benchmark", "data")
+    os.makedirs(data_dir, exist_ok=True)
+    bundle = os.path.join(data_dir, f"fhir_bench_{args.patients}.json")
+    if not os.path.exists(bundle):
+        write_bundle(bundle, args.patients)
+    niks = sample_niks(bundle, 200)
+
+    env = {
+        "FILENAME": bundle,
+        "LLM_STUB": "1",
+        "LLM_STUB_LATENCY": str(args.latency),
+        "LLM_MAX_INFLIGHT": str(args.max_inflight),
+        "LLM_MAX_QUEUE": str(args.max_queue),
+        # Cache dimatikan supaya yang diukur memang jalur panggilan LLM
+        "RESULT_CACHE_SIZE": "0",
+    }
+    results = {}
+    for mode in ("sync", "async"):
+        proc = start_server(args.port, dict(env, ANALYZE_ASYNC="1" if mode == "async" else "0"))
+        try:
+            results[mode] = run_load(args.port, niks, args.requests, args.concurrency)
+        finally:
+            proc.terminate()
+            proc.wait()
+        print(f"{mode:>6}: {json.dumps(results[mode])}")
+
+    gain = results["async"]["throughput_rps"] / max(results["sync"]["throughput_rps"], 1e-9)
+    print(f"⚡ Throughput async vs sync: {gain:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
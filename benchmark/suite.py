@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AI_DIR = os.path.join(ROOT, "AI")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, AI_DIR)
+
+# Suite benchmark (gaya asv): dataset dari generate_dataset.py di beberapa skala,
+# hasil disimpan sebagai JSON supaya run bisa dibandingkan dari waktu ke waktu.
+#   ingest   load_and_parse_data: waktu & peak RSS (proses terpisah per skala)
+#   lookup   baca record per NIK dari database hasil load
+#   prompt   build_prompt (konteks ringkas + template)
+#   graph    build_graph + compute_layout + render_image (PNG)
+#   analyze  /analyze end-to-end lewat uvicorn + model STUB, request bersamaan
+#
+#   python benchmark/suite.py run --scales 1000,100000
+#   python benchmark/suite.py run --scales 1000 --only ingest,lookup -o base.json
+#   python benchmark/suite.py compare base.json benchmark/results/<run>.json --threshold 0.1
+
+BENCHMARKS = ("ingest", "lookup", "prompt", "graph", "analyze")
+RESULTS_DIR = os.path.join(ROOT, "benchmark", "results")
+DATA_DIR = os.path.join(ROOT, "benchmark", "data")
+# Akhiran metrik -> arah yang lebih baik (dipakai mode compare)
+LOWER_IS_BETTER = ("_ms", "_us", "_s", "_mb")
+HIGHER_IS_BETTER = ("_rps",)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(times, unit=1000.0, suffix="ms"):
+    # Detik -> p50 / p95 / p99 / rata-rata dalam satuan suffix
+    return {
+        f"p50_{suffix}": round(percentile(times, 0.50) * unit, 3),
+        f"p95_{suffix}": round(percentile(times, 0.95) * unit, 3),
+        f"p99_{suffix}": round(percentile(times, 0.99) * unit, 3),
+        f"mean_{suffix}": round(statistics.mean(times) * unit, 3),
+    }
+
+
+def timed(fn, items):
+    times = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def dataset(scale, seed, observations):
+    import generate_dataset
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"fhir_suite_{scale}_s{seed}_o{observations}.json")
+    if not os.path.exists(path):
+        print(f"🔄 Generate {scale} pasien -> {path}")
+        generate_dataset.write_dataset(path, scale, seed=seed, workers=os.cpu_count() or 1,
+                                       observations=observations)
+    return path
+
+
+# --- BENCHMARK DI PROSES ANAK (satu skala) ---
+def run_child(path, benches, samples):
+    # Dijalankan di proses baru: peak RSS tidak tercampur skala lain, dan
+    # ai_service di-import tanpa file data (load diukur sendiri di bawah).
+    os.environ.update({"FILENAME": os.path.join(DATA_DIR, "tidak-ada.json"), "LLM_STUB": "1",
+                       "COMPILED_INDEX": "0", "INGEST": "0"})
+    from bench_ingest import peak_rss_mb
+    import ai_service
+
+    results = {}
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    database, _ = ai_service.load_and_parse_data(path)
+    load_s = time.perf_counter() - start
+    if "ingest" in benches:
+        results["ingest"] = {"load_s": round(load_s, 3), "peak_rss_mb": round(peak_rss_mb(), 1),
+                             "data_rss_mb": round(peak_rss_mb() - rss_before, 1), "pasien": len(database)}
+
+    rng = random.Random(0)
+    niks = list(database)
+    sample = [rng.choice(niks) for _ in range(samples)]
+    if "lookup" in benches:
+        results["lookup"] = summarize(timed(database.__getitem__, sample), 1e6, "us")
+    records = [database[nik] for nik in sample]
+    if "prompt" in benches:
+        # Sama dengan prepare_analysis: konteks ringkas + template
+        build = lambda d: ai_service.build_prompt(ai_service.PROMPT_BUILDER.context(d)[0])
+        results["prompt"] = summarize(timed(build, records))
+    if "graph" in benches:
+        from graph_service import build_graph, compute_layout, render_image
+        # Render PNG lambat; sampel lebih kecil
+        graphs = records[:max(1, samples // 10)]
+        results["graph"] = dict(
+            {f"layout_{k}": v for k, v in summarize(timed(lambda d: compute_layout(build_graph(d)), records)).items()},
+            **{f"render_{k}": v for k, v in
+               summarize(timed(lambda d: render_image(compute_layout(build_graph(d))), graphs)).items()},
+        )
+    print(json.dumps(results))
+
+
+def measure_in_child(path, benches, samples):
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "child", path, "--only", ",".join(benches),
+         "--samples", str(samples)],
+        check=True, capture_output=True, text=True, cwd=AI_DIR,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_analyze(path, args):
+    from load_test_analyze import run_load, sample_niks, start_server
+
+    env = {
+        "FILENAME": path,
+        "LLM_STUB": "1",
+        "LLM_STUB_LATENCY": str(args.latency),
+        "RESULT_CACHE_SIZE": "0",
+        "RULE_ENGINE": "off",
+        "ANALYZE_ASYNC": "1",
+        "COMPILED_INDEX": "0",
+    }
+    niks = sample_niks(path, 200)
+    proc = start_server(args.port, env)
+    try:
+        run_load(args.port, niks, min(20, args.requests), args.concurrency)  # pemanasan
+        r = run_load(args.port, niks, args.requests, args.concurrency)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {"throughput_rps": r["throughput_rps"], "p50_ms": r["analyze_p50_ms"], "p99_ms": r["analyze_p99_ms"],
+            "health_p99_ms": r["health_p99_ms"], "gagal": sum(v for k, v in r["status"].items() if k != 200)}
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    benches = [b for b in args.only.split(",") if b] if args.only else list(BENCHMARKS)
+    unknown = set(benches) - set(BENCHMARKS)
+    if unknown:
+        raise SystemExit(f"Benchmark tidak dikenal: {', '.join(sorted(unknown))} (pilihan: {', '.join(BENCHMARKS)})")
+    commit = git_commit()
+    report = {
+        "meta": {
+            "waktu": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu": os.cpu_count(),
+            "argumen": vars(args),
+        },
+        "hasil": {},
+    }
+    for scale in [int(s) for s in args.scales.split(",")]:
+        path = dataset(scale, args.seed, args.observations)
+        results = {}
+        in_child = [b for b in benches if b != "analyze"]
+        if in_child:
+            results.update(measure_in_child(path, in_child, args.samples))
+        if "analyze" in benches:
+            results["analyze"] = measure_analyze(path, args)
+        report["hasil"][str(scale)] = results
+        for name, metrics in results.items():
+            print(f"{scale:>9} {name:<8} {json.dumps(metrics)}")
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Hasil disimpan: {output}")
+
+
+# --- BANDINGKAN DUA RUN ---
+def flatten(report):
+    return {
+        f"{scale}/{bench}/{metric}": value
+        for scale, benches in report["hasil"].items()
+        for bench, metrics in benches.items()
+        for metric, value in metrics.items()
+        if isinstance(value, (int, float))
+    }
+
+
+def direction(metric):
+    # +1 = makin besar makin baik, -1 = makin kecil makin baik, 0 = informasi saja
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    old_metrics, new_metrics = flatten(base), flatten(new)
+    print(f"base {base['meta'].get('commit')} ({base['meta'].get('waktu')}) vs "
+          f"baru {new['meta'].get('commit')} ({new['meta'].get('waktu')})")
+    regressions = []
+    for key in sorted(old_metrics.keys() & new_metrics.keys()):
+        old, cur = old_metrics[key], new_metrics[key]
+        sign = direction(key)
+        change = (cur - old) / old if old else 0.0
+        worse = sign != 0 and -sign * change > args.threshold
+        better = sign != 0 and sign * change > args.threshold
+        mark = "❌ REGRESI" if worse else ("✅ lebih baik" if better else "")
+        print(f"{key:<40} {old:>12g} -> {cur:>12g} ({change:+7.1%}) {mark}")
+        if worse:
+            regressions.append(key)
+    # Benchmark / skala yang tidak ikut dijalankan (mis. --only) cukup disebut
+    missing = sorted({key.rsplit("/", 1)[0] for key in old_metrics.keys() - new_metrics.keys()})
+    if missing:
+        print(f"⚠️ Tidak ada di run baru: {', '.join(missing)}")
+    if regressions:
+        print(f"❌ {len(regressions)} metrik memburuk lebih dari {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"✅ Tidak ada regresi di atas {args.threshold:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite benchmark HealthBridge-AI")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="jalankan benchmark dan simpan hasil JSON")
+    p.add_argument("--scales", default="1000,100000")
+    p.add_argument("--only", help=f"subset, koma: {','.join(BENCHMARKS)}")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--observations", type=int, default=1)
+    p.add_argument("--samples", type=int, default=1000, help="sampel NIK untuk lookup / prompt / graph")
+    p.add_argument("--requests", type=int, default=400, help="request /analyze")
+    p.add_argument("--concurrency", type=int, default=50)
+    p.add_argument("--latency", type=float, default=0.2, help="latency model STUB (detik)")
+    p.add_argument("--port", type=int, default=8770)
+    p.add_argument("-o", "--output", help=f"default: {os.path.relpath(RESULTS_DIR, ROOT)}/<waktu>-<commit>.json")
+
+    p = sub.add_parser("compare", help="bandingkan dua file hasil")
+    p.add_argument("base")
+    p.add_argument("new")
+    p.add_argument("--threshold", type=float, default=0.10, help="perubahan relatif yang dianggap regresi")
+
+    p = sub.add_parser("child")
+    p.add_argument("path")
+    p.add_argument("--only", default=",".join(BENCHMARKS))
+    p.add_argument("--samples", type=int, default=1000)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    elif args.command == "compare":
+        compare(args)
+    else:
+        run_child(args.path, args.only.split(","), args.samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,200 +1,321 @@
+import argparse
 import json
+import os
 import random
+import sys
+import time
 import uuid
 from datetime import datetime, timedelta
+from functools import lru_cache, partial
+from multiprocessing import Pool
 
-# Konfigurasi
-TOTAL_DATA = 1000
+# --- GENERATOR DATASET FHIR R4 ---
+# Dataset dummy untuk dev & benchmark (sampai jutaan pasien):
+# - tiap pasien punya RNG sendiri dari (seed, nomor pasien), jadi hasilnya sama
+#   persis untuk seed yang sama, berapa pun jumlah worker / ukuran chunk
+# - pasien di-generate per chunk di multiprocessing pool dan langsung ditulis
+#   ke file berurutan, memori tetap kecil berapa pun jumlah pasiennya
+# - tanggal dihitung dari BASE_DATE (bukan datetime.now) supaya reproducible
+#
+#   python generate_dataset.py                                   # fhir_data_1000.json
+#   python generate_dataset.py -n 1000000 --format ndjson --workers 8
+#   python generate_dataset.py -n 1000000 --shards 4 --observations 12
+#   python generate_dataset.py --mix AMAN=1,HIPERTENSI_BERAT=1 --seed 7
 
 NAMA_DEPAN = ["Budi", "Siti", "Agus", "Ratna", "Eko", "Dewi", "Rudi", "Sri", "Joko", "Lestari", "Adi", "Nina", "Bambang", "Yuni"]
 NAMA_BELAKANG = ["Santoso", "Aminah", "Saputra", "Sari", "Prasetyo", "Wahyuni", "Hartono", "Kusuma", "Wijaya", "Utami", "Susanti", "Hidayat"]
 
-SKENARIO = [
-    "AMAN", "AMAN", "AMAN", "AMAN", "AMAN", 
-    "HIPERTENSI_BERAT", 
-    "INTERAKSI_JANTUNG", 
-    "ALERGI_ANTIBIOTIK", 
-    "BAHAYA_HAMIL",      
-    "DUPLIKASI_OBAT",
-    "OBESITAS"
-]
-
-def generate_nik():
-    return f"3374{random.randint(100000000000, 999999999999)}"
-
-def get_random_date(days_back=30):
-    date = datetime.now() - timedelta(days=random.randint(0, days_back))
-    return date.strftime("%Y-%m-%dT%H:%M:%S+07:00")
-
-def calculate_birthdate(age):
-    today = datetime.now()
-    birth_year = today.year - age
-    # Random bulan dan tanggal
-    birth_date = datetime(birth_year, random.randint(1, 12), random.randint(1, 28))
+# Bobot default: 5 AMAN untuk tiap skenario berisiko
+SKENARIO = {
+    "AMAN": 5,
+    "HIPERTENSI_BERAT": 1,
+    "INTERAKSI_JANTUNG": 1,
+    "ALERGI_ANTIBIOTIK": 1,
+    "BAHAYA_HAMIL": 1,
+    "DUPLIKASI_OBAT": 1,
+    "OBESITAS": 1,
+}
+
+BASE_DATE = datetime(2025, 1, 1)
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S+07:00"
+# Pasien per tugas worker (cukup besar supaya overhead pickle kecil)
+CHUNK_SIZE = 2000
+FORMATS = ("bundle", "ndjson")
+
+VITAL_CATEGORY = [{"coding": [{"system": "http://terminology.hl7.org/CodeSystem/observation-category", "code": "vital-signs", "display": "Vital Signs"}]}]
+
+OBAT_SKENARIO = {
+    "AMAN": [("Paracetamol 500mg", "93001001", "Demam Ringan")],
+    "HIPERTENSI_BERAT": [("Amlodipine 10mg", "93001006", "Hipertensi Grade 2"),
+                         ("Candesartan 8mg", "93001007", "Hipertensi Grade 2")],
+    "INTERAKSI_JANTUNG": [("Clopidogrel 75mg", "93001002", "Riwayat Pasang Ring Jantung"),
+                          ("Asam Mefenamat 500mg", "93001003", "Sakit Gigi Akut")],
+    "ALERGI_ANTIBIOTIK": [("Amoxicillin 500mg", "93001004", "Radang Tenggorokan")],
+    "BAHAYA_HAMIL": [("Isotretinoin 10mg", "93001005", "Jerawat Kistik Parah")],
+    "DUPLIKASI_OBAT": [("Paracetamol 500mg", "93001001", "Demam"),
+                       ("Sanmol (Paracetamol) 500mg", "93001001", "Pusing")],
+    "OBESITAS": [("Metformin 500mg", "93001008", "Pre-Diabetes")],
+}
+
+
+def parse_mix(text):
+    # "AMAN=5,OBESITAS=1" -> {"AMAN": 5.0, "OBESITAS": 1.0}
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        name = name.strip().upper()
+        if name not in SKENARIO:
+            raise ValueError(f"Skenario tidak dikenal: {name} (pilihan: {', '.join(SKENARIO)})")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Mix skenario kosong")
+    return mix
+
+
+# --- SATU PASIEN ---
+@lru_cache(maxsize=None)
+def nik_offset(seed):
+    return random.Random(f"nik:{seed}").randrange(10 ** 12)
+
+
+def generate_nik(index, seed):
+    # 12 digit = permutasi nomor pasien (pengali ganjil, bukan kelipatan 5 ->
+    # bijeksi modulo 10^12), jadi NIK unik tanpa perlu set NIK yang sudah dipakai
+    return f"3374{(index * 982451653 + nik_offset(seed)) % 10 ** 12:012d}"
+
+
+def new_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def format_date(date):
+    return date.strftime(DATE_FORMAT)
+
+
+def calculate_birthdate(rng, age, base_date):
+    birth_date = datetime(base_date.year - age, rng.randint(1, 12), rng.randint(1, 28))
     return birth_date.strftime("%Y-%m-%d")
 
-def create_fhir_bundle():
-    bundle = {
-        "resourceType": "Bundle",
-        "type": "collection",
-        "entry": []
+
+def observation(rng, pasien_id, code, display, waktu, **value):
+    obs_id = new_id(rng)
+    resource = {
+        "resourceType": "Observation",
+        "id": obs_id,
+        "status": "final",
+        "category": VITAL_CATEGORY,
+        "code": {"coding": [{"system": "http://loinc.org", "code": code, "display": display}]},
+        "subject": {"reference": f"urn:uuid:{pasien_id}"},
+        "effectiveDateTime": format_date(waktu),
     }
+    resource.update(value)
+    return resource
 
-    print(f"🔄 Sedang men-generate {TOTAL_DATA} data Valid FHIR R4...")
-
-    for i in range(TOTAL_DATA):
-        skenario = random.choice(SKENARIO)
-        gender = "female" if skenario == "BAHAYA_HAMIL" else random.choice(["male", "female"])
-        nama_lengkap = f"{random.choice(NAMA_DEPAN)} {random.choice(NAMA_BELAKANG)}"
-        nik = generate_nik()
-        pasien_id = str(uuid.uuid4())
-        
-        # --- LOGIKA VITAL SIGN & UMUR ---
-        age = random.randint(20, 60) # Default dewasa
-        
-        if skenario == "OBESITAS":
-            bb = random.randint(95, 120)
-            tb = random.randint(160, 175)
-        elif skenario == "INTERAKSI_JANTUNG":
-            age = random.randint(60, 80) # Lansia
-            bb = random.randint(50, 75)
-            tb = random.randint(160, 170)
-        else:
-            bb = random.randint(50, 85)
-            tb = random.randint(155, 180)
-            
-        if skenario == "HIPERTENSI_BERAT":
-            sistole = random.randint(150, 180)
-            diastole = random.randint(95, 110)
-        else:
-            sistole = random.randint(110, 125)
-            diastole = random.randint(70, 85)
-
-        riwayat_medis = []
-        alergi_list = []
-        
-        # --- LOGIKA OBAT ---
-        if skenario == "AMAN":
-            riwayat_medis.append({"obat": "Paracetamol 500mg", "kfa": "93001001", "diagnosa": "Demam Ringan"})
-        elif skenario == "HIPERTENSI_BERAT":
-            riwayat_medis.append({"obat": "Amlodipine 10mg", "kfa": "93001006", "diagnosa": "Hipertensi Grade 2"})
-            riwayat_medis.append({"obat": "Candesartan 8mg", "kfa": "93001007", "diagnosa": "Hipertensi Grade 2"})
-        elif skenario == "INTERAKSI_JANTUNG":
-            riwayat_medis.append({"obat": "Clopidogrel 75mg", "kfa": "93001002", "diagnosa": "Riwayat Pasang Ring Jantung"})
-            riwayat_medis.append({"obat": "Asam Mefenamat 500mg", "kfa": "93001003", "diagnosa": "Sakit Gigi Akut"})
-        elif skenario == "ALERGI_ANTIBIOTIK":
-            alergi_list.append("Penicillin")
-            riwayat_medis.append({"obat": "Amoxicillin 500mg", "kfa": "93001004", "diagnosa": "Radang Tenggorokan"})
-        elif skenario == "BAHAYA_HAMIL":
-            age = random.randint(20, 35) # Usia produktif
-            riwayat_medis.append({"obat": "Isotretinoin 10mg", "kfa": "93001005", "diagnosa": "Jerawat Kistik Parah"})
-        elif skenario == "DUPLIKASI_OBAT":
-            riwayat_medis.append({"obat": "Paracetamol 500mg", "kfa": "93001001", "diagnosa": "Demam"})
-            riwayat_medis.append({"obat": "Sanmol (Paracetamol) 500mg", "kfa": "93001001", "diagnosa": "Pusing"})
-        elif skenario == "OBESITAS":
-             riwayat_medis.append({"obat": "Metformin 500mg", "kfa": "93001008", "diagnosa": "Pre-Diabetes"})
-
-        # 1. Resource Patient
-        patient_resource = {
-            "fullUrl": f"urn:uuid:{pasien_id}",
-            "resource": {
-                "resourceType": "Patient",
-                "id": pasien_id,
-                "identifier": [{"system": "https://fhir.kemkes.go.id/id/nik", "value": nik}],
-                "name": [{"use": "official", "text": nama_lengkap}],
-                "gender": gender,
-                "birthDate": calculate_birthdate(age) # FIX: Umur dinamis
-            }
-        }
-        if alergi_list:
-            patient_resource["resource"]["extension"] = [{"url": "http://example.org/allergy", "valueString": ",".join(alergi_list)}]
-        bundle["entry"].append(patient_resource)
-
-        # 2. Resource Observation (Berat Badan)
-        bb_id = str(uuid.uuid4())
-        bundle["entry"].append({
-            "fullUrl": f"urn:uuid:{bb_id}",
-            "resource": {
-                "resourceType": "Observation",
-                "id": bb_id,
-                "status": "final",
-                "category": [{"coding": [{"system": "http://terminology.hl7.org/CodeSystem/observation-category", "code": "vital-signs", "display": "Vital Signs"}]}],
-                "code": {"coding": [{"system": "http://loinc.org", "code": "29463-7", "display": "Body Weight"}]},
-                "subject": {"reference": f"urn:uuid:{pasien_id}"},
-                "valueQuantity": {
-                    "value": bb, 
-                    "unit": "kg", 
-                    "system": "http://unitsofmeasure.org", 
-                    "code": "kg"
-                }
-            }
-        })
 
-        # 3. Resource Observation (Tinggi Badan)
-        tb_id = str(uuid.uuid4())
-        bundle["entry"].append({
-            "fullUrl": f"urn:uuid:{tb_id}",
-            "resource": {
-                "resourceType": "Observation",
-                "id": tb_id,
-                "status": "final",
-                "category": [{"coding": [{"system": "http://terminology.hl7.org/CodeSystem/observation-category", "code": "vital-signs", "display": "Vital Signs"}]}],
-                "code": {"coding": [{"system": "http://loinc.org", "code": "8302-2", "display": "Body Height"}]},
-                "subject": {"reference": f"urn:uuid:{pasien_id}"},
-                "valueQuantity": {
-                    "value": tb, 
-                    "unit": "cm", 
-                    "system": "http://unitsofmeasure.org", 
-                    "code": "cm"
-                }
-            }
-        })
-        
-        # 4. Resource Observation (Tekanan Darah)
-        bp_id = str(uuid.uuid4())
-        bundle["entry"].append({
-            "fullUrl": f"urn:uuid:{bp_id}",
-            "resource": {
-                "resourceType": "Observation",
-                "id": bp_id,
-                "status": "final",
-                "category": [{"coding": [{"system": "http://terminology.hl7.org/CodeSystem/observation-category", "code": "vital-signs", "display": "Vital Signs"}]}],
-                "code": {"coding": [{"system": "http://loinc.org", "code": "85354-9", "display": "Blood Pressure"}]},
-                "subject": {"reference": f"urn:uuid:{pasien_id}"},
-                "component": [
-                    {
-                        "code": {"coding": [{"system": "http://loinc.org", "code": "8480-6", "display": "Systolic"}]}, 
-                        "valueQuantity": {"value": sistole, "unit": "mmHg", "system": "http://unitsofmeasure.org", "code": "mm[Hg]"}
-                    },
-                    {
-                        "code": {"coding": [{"system": "http://loinc.org", "code": "8462-4", "display": "Diastolic"}]}, 
-                        "valueQuantity": {"value": diastole, "unit": "mmHg", "system": "http://unitsofmeasure.org", "code": "mm[Hg]"}
-                    }
-                ]
-            }
+def quantity(value, unit, code):
+    return {"value": value, "unit": unit, "system": "http://unitsofmeasure.org", "code": code}
+
+
+def generate_patient(index, seed, mix, observations=1, interval_days=30, base_date=BASE_DATE):
+    # Hasil: list resource FHIR (Patient lalu Observation & MedicationRequest).
+    # observations = jumlah pengukuran per tanda vital; yang terbaru sesuai
+    # skenario, yang lebih lama bervariasi di sekitarnya (riwayat).
+    rng = random.Random(f"{seed}:{index}")
+    skenario = rng.choices(list(mix), weights=list(mix.values()))[0]
+    gender = "female" if skenario == "BAHAYA_HAMIL" else rng.choice(["male", "female"])
+    nama_lengkap = f"{rng.choice(NAMA_DEPAN)} {rng.choice(NAMA_BELAKANG)}"
+    pasien_id = new_id(rng)
+
+    # --- LOGIKA VITAL SIGN & UMUR ---
+    age = rng.randint(20, 60)  # Default dewasa
+    if skenario == "OBESITAS":
+        bb, tb = rng.randint(95, 120), rng.randint(160, 175)
+    elif skenario == "INTERAKSI_JANTUNG":
+        age = rng.randint(60, 80)  # Lansia
+        bb, tb = rng.randint(50, 75), rng.randint(160, 170)
+    else:
+        bb, tb = rng.randint(50, 85), rng.randint(155, 180)
+    if skenario == "BAHAYA_HAMIL":
+        age = rng.randint(20, 35)  # Usia produktif
+
+    if skenario == "HIPERTENSI_BERAT":
+        sistole, diastole = rng.randint(150, 180), rng.randint(95, 110)
+    else:
+        sistole, diastole = rng.randint(110, 125), rng.randint(70, 85)
+
+    # 1. Resource Patient
+    patient = {
+        "resourceType": "Patient",
+        "id": pasien_id,
+        "identifier": [{"system": "https://fhir.kemkes.go.id/id/nik", "value": generate_nik(index, seed)}],
+        "name": [{"use": "official", "text": nama_lengkap}],
+        "gender": gender,
+        "birthDate": calculate_birthdate(rng, age, base_date),
+    }
+    if skenario == "ALERGI_ANTIBIOTIK":
+        patient["extension"] = [{"url": "http://example.org/allergy", "valueString": "Penicillin"}]
+    resources = [patient]
+
+    # 2-4. Observation BB, TB, tensi; k = 0 paling baru
+    for k in range(observations):
+        waktu = base_date - timedelta(days=k * interval_days + rng.randint(0, max(interval_days - 1, 0)),
+                                      minutes=rng.randint(0, 24 * 60 - 1))
+        drift = 0 if k == 0 else 1
+        resources.append(observation(rng, pasien_id, "29463-7", "Body Weight", waktu,
+                                     valueQuantity=quantity(bb + drift * rng.randint(-3, 3), "kg", "kg")))
+        resources.append(observation(rng, pasien_id, "8302-2", "Body Height", waktu,
+                                     valueQuantity=quantity(tb, "cm", "cm")))
+        resources.append(observation(rng, pasien_id, "85354-9", "Blood Pressure", waktu, component=[
+            {"code": {"coding": [{"system": "http://loinc.org", "code": "8480-6", "display": "Systolic"}]},
+             "valueQuantity": quantity(sistole + drift * rng.randint(-15, 10), "mmHg", "mm[Hg]")},
+            {"code": {"coding": [{"system": "http://loinc.org", "code": "8462-4", "display": "Diastolic"}]},
+             "valueQuantity": quantity(diastole + drift * rng.randint(-10, 5), "mmHg", "mm[Hg]")},
+        ]))
+
+    # 5. Resource MedicationRequest
+    for obat, kfa, diagnosa in OBAT_SKENARIO[skenario]:
+        resources.append({
+            "resourceType": "MedicationRequest",
+            "id": new_id(rng),
+            "status": "active",
+            "intent": "order",
+            "subject": {"reference": f"urn:uuid:{pasien_id}"},
+            "medicationCodeableConcept": {"coding": [{"system": "http://sys-ids.kemkes.go.id/kfa", "code": kfa, "display": obat}]},
+            "reasonCode": [{"text": diagnosa}],
+            "authoredOn": format_date(base_date - timedelta(days=rng.randint(0, 30))),
         })
+    return resources
+
+
+# --- CHUNK (DI WORKER) ---
+def render_chunk(bounds, fmt, **options):
+    # Pasien [start, end) -> (jumlah resource, baris siap tulis). Serialisasi
+    # JSON ikut dikerjakan worker, proses utama tinggal menulis.
+    start, end = bounds
+    lines = []
+    for index in range(start, end):
+        for res in generate_patient(index, **options):
+            if fmt == "bundle":
+                lines.append(json.dumps({"fullUrl": f"urn:uuid:{res['id']}", "resource": res}))
+            else:
+                lines.append(json.dumps(res))
+    return len(lines), lines
+
+
+def iter_chunks(bounds, workers, fmt, **options):
+    # Hasil berurutan sesuai bounds (imap menjaga urutan); workers <= 1 -> tanpa pool
+    job = partial(render_chunk, fmt=fmt, **options)
+    if workers <= 1:
+        yield from map(job, bounds)
+        return
+    with Pool(workers) as pool:
+        yield from pool.imap(job, bounds)
+
+
+# --- TULIS FILE ---
+class DatasetWriter:
+    # Satu file Bundle / NDJSON, ditulis bertahap
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        self.f = open(path, "w", encoding="utf-8")
+        self.first = True
+        if fmt == "bundle":
+            self.f.write('{"resourceType": "Bundle", "type": "collection", "entry": [\n')
+
+    def write(self, lines):
+        if not lines:
+            return
+        if self.fmt == "bundle":
+            self.f.write(("" if self.first else ",\n") + ",\n".join(lines))
+        else:
+            self.f.write("\n".join(lines) + "\n")
+        self.first = False
+
+    def close(self):
+        # Boleh dipanggil ulang: shard ditutup begitu shard berikutnya mulai,
+        # lalu semua writer ditutup sekali lagi di akhir
+        if self.f.closed:
+            return
+        if self.fmt == "bundle":
+            self.f.write("\n]}\n")
+        self.f.close()
+
+
+def shard_paths(output, shards):
+    if shards <= 1:
+        return [output]
+    root, ext = os.path.splitext(output)
+    return [f"{root}-{i:05d}-of-{shards:05d}{ext}" for i in range(shards)]
+
+
+def write_dataset(output, total, seed=42, fmt="bundle", workers=1, shards=1, mix=None,
+                  observations=1, interval_days=30, base_date=BASE_DATE, chunk_size=CHUNK_SIZE, progress=False):
+    # Hasil: (list path yang ditulis, jumlah resource). Shard = rentang pasien
+    # berurutan, jadi semua resource satu pasien selalu ada di shard yang sama.
+    if fmt not in FORMATS:
+        raise ValueError(f"Format harus salah satu dari {FORMATS}")
+    paths = shard_paths(output, shards)
+    # (shard, awal, akhir) per chunk; chunk tidak pernah melewati batas shard
+    per_shard = -(-total // len(paths)) if total else 0
+    bounds = []
+    for shard in range(len(paths)):
+        lo, hi = shard * per_shard, min(total, (shard + 1) * per_shard)
+        bounds.extend((shard, start, min(start + chunk_size, hi)) for start in range(lo, hi, chunk_size))
+    options = dict(seed=seed, mix=mix or SKENARIO, observations=observations,
+                   interval_days=interval_days, base_date=base_date)
+
+    writers = [None] * len(paths)
+    done = resources = 0
+    start = time.perf_counter()
+    chunks = iter_chunks([b[1:] for b in bounds], workers, fmt, **options)
+    for (shard, lo, hi), (count, lines) in zip(bounds, chunks):
+        if writers[shard] is None:
+            if shard > 0 and writers[shard - 1] is not None:
+                writers[shard - 1].close()
+            writers[shard] = DatasetWriter(paths[shard], fmt)
+        writers[shard].write(lines)
+        done += hi - lo
+        resources += count
+        if progress:
+            rate = done / max(time.perf_counter() - start, 1e-9)
+            print(f"\r🔄 {done:,}/{total:,} pasien ({rate:,.0f}/detik)", end="", file=sys.stderr, flush=True)
+    if progress:
+        print(file=sys.stderr)
+    # Shard tanpa pasien tetap dibuat (kosong) supaya jumlah file = shards
+    for shard, writer in enumerate(writers):
+        (writer or DatasetWriter(paths[shard], fmt)).close()
+    return paths, resources
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate dataset dummy FHIR R4")
+    parser.add_argument("-n", "--patients", type=int, default=1000)
+    parser.add_argument("-o", "--output", help="default: fhir_data_<n>.json / .ndjson")
+    parser.add_argument("--format", choices=FORMATS, default="bundle")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mix", help="bobot skenario, mis. AMAN=5,HIPERTENSI_BERAT=1 (default: 5 AMAN : 1 tiap skenario)")
+    parser.add_argument("--observations", type=int, default=1, help="pengukuran per tanda vital per pasien")
+    parser.add_argument("--interval-days", type=int, default=30, help="jarak antar pengukuran")
+    parser.add_argument("--base-date", default=BASE_DATE.strftime("%Y-%m-%d"), help="tanggal pengukuran terbaru")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shards", type=int, default=1)
+    args = parser.parse_args()
+
+    ext = "json" if args.format == "bundle" else "ndjson"
+    output = args.output or f"fhir_data_{args.patients}.{ext}"
+    mix = parse_mix(args.mix) if args.mix else SKENARIO
+    print(f"🔄 Sedang men-generate {args.patients:,} data Valid FHIR R4 ({args.format}, seed {args.seed}, "
+          f"{args.workers} worker)...")
+    start = time.perf_counter()
+    paths, resources = write_dataset(
+        output, args.patients, seed=args.seed, fmt=args.format, workers=args.workers,
+        shards=args.shards, mix=mix, observations=args.observations, interval_days=args.interval_days,
+        base_date=datetime.strptime(args.base_date, "%Y-%m-%d"), progress=True,
+    )
+    print(f"✅ Data Selesai! {resources:,} resource dalam {time.perf_counter() - start:.1f} detik:")
+    for path in paths:
+        print(f"   {path} ({os.path.getsize(path) / (1024 * 1024):.1f} MB)")
 
-        # 5. Resource MedicationRequest
-        for rekam in riwayat_medis:
-            med_req_id = str(uuid.uuid4())
-            bundle["entry"].append({
-                "fullUrl": f"urn:uuid:{med_req_id}",
-                "resource": {
-                    "resourceType": "MedicationRequest",
-                    "id": med_req_id,
-                    "status": "active",
-                    "intent": "order",
-                    "subject": {"reference": f"urn:uuid:{pasien_id}"},
-                    "medicationCodeableConcept": {"coding": [{"system": "http://sys-ids.kemkes.go.id/kfa", "code": rekam['kfa'], "display": rekam['obat']}]},
-                    "reasonCode": [{"text": rekam['diagnosa']}],
-                    "authoredOn": get_random_date()
-                }
-            })
-
-    return bundle
 
 if __name__ == "__main__":
-    data = create_fhir_bundle()
-    with open("fhir_data_1000.json", "w") as f:
-        json.dump(data, f, indent=2)
-    print(f"✅ Data Selesai! File 'fhir_data_1000.json' valid FHIR.")
\ No newline at end of file
+    main()
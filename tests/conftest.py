@@ -0,0 +1,66 @@
+import json
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AI_DIR = os.path.join(ROOT, "AI")
+# Modul backend di-import seperti saat dijalankan dari folder AI
+sys.path.insert(0, AI_DIR)
+sys.path.insert(0, ROOT)
+
+OBAT = [("Paracetamol 500mg", "93001001", "Demam Ringan"), ("Amlodipine 10mg", "93001006", "Hipertensi Grade 2"),
+        ("Clopidogrel 75mg", "93001002", "Riwayat Pasang Ring Jantung")]
+
+
+def vital(rng, pasien_id, code, waktu, **value):
+    return dict({"resourceType": "Observation", "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                 "code": {"coding": [{"system": "http://loinc.org", "code": code}]},
+                 "subject": {"reference": f"urn:uuid:{pasien_id}"},
+                 "effectiveDateTime": waktu.strftime("%Y-%m-%dT%H:%M:%S+07:00")}, **value)
+
+
+def make_resources(patients, observations=3, seed=7):
+    # Bundle kecil & deterministik: Patient lalu Observation (yang terbaru
+    # duluan, seperti generator) dan MedicationRequest
+    rng = random.Random(seed)
+    resources = []
+    for i in range(patients):
+        pasien_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        patient = {"resourceType": "Patient", "id": pasien_id,
+                   "identifier": [{"system": "https://fhir.kemkes.go.id/id/nik", "value": f"3374{i:012d}"}],
+                   "name": [{"text": f"Pasien {i} {rng.choice(['Budi', 'Siti', 'Dewi'])}"}],
+                   "gender": rng.choice(["male", "female"]), "birthDate": f"19{rng.randint(50, 99)}-01-15"}
+        if i % 5 == 0:
+            patient["extension"] = [{"url": "http://example.org/allergy", "valueString": "Penicillin"}]
+        resources.append(patient)
+        for k in range(observations):
+            waktu = datetime(2025, 1, 1) - timedelta(days=30 * k + rng.randint(0, 29))
+            resources.append(vital(rng, pasien_id, "29463-7", waktu,
+                                   valueQuantity={"value": rng.randint(50, 90), "unit": "kg"}))
+            resources.append(vital(rng, pasien_id, "8302-2", waktu,
+                                   valueQuantity={"value": rng.randint(150, 180), "unit": "cm"}))
+            resources.append(vital(rng, pasien_id, "85354-9", waktu, component=[
+                {"valueQuantity": {"value": rng.randint(110, 170)}}, {"valueQuantity": {"value": rng.randint(70, 100)}}]))
+        for obat, kfa, diagnosa in rng.sample(OBAT, rng.randint(1, 2)):
+            resources.append({"resourceType": "MedicationRequest", "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                              "subject": {"reference": f"urn:uuid:{pasien_id}"},
+                              "medicationCodeableConcept": {"coding": [{"code": kfa, "display": obat}]},
+                              "reasonCode": [{"text": diagnosa}]})
+    return resources
+
+
+def write_bundle(path, resources):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"resourceType": "Bundle", "type": "collection",
+                   "entry": [{"fullUrl": f"urn:uuid:{r['id']}", "resource": r} for r in resources]}, f, indent=1)
+    return path
+
+
+@pytest.fixture(scope="session")
+def bundle(tmp_path_factory):
+    return write_bundle(str(tmp_path_factory.mktemp("data") / "fhir_test.json"), make_resources(60))
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from fhir_parser import parse_bundle_file
+from llm_limiter import LLMLimiter
+from result_cache import ResultCache
+
+
+class SlowModel:
+    # LLM yang tidak pernah menjawab dalam batas waktu
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(10)
+
+
+@pytest.fixture
+def service(bundle, monkeypatch):
+    import ai_service
+    database, _ = parse_bundle_file(bundle)
+    monkeypatch.setattr(ai_service, "DATABASE_CACHE", database)
+    monkeypatch.setattr(ai_service, "RULE_ENGINE_MODE", "off")
+    monkeypatch.setattr(ai_service, "RESULT_CACHE", ResultCache(0))
+    monkeypatch.setattr(ai_service, "LLM_LIMITER", LLMLimiter(4, 16, 1))
+    monkeypatch.setattr(ai_service, "LLM_TIMEOUT", 0.05)
+    monkeypatch.setattr(ai_service, "model", SlowModel())
+    return ai_service, list(database)
+
+
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_batch_timeout_jadi_error_per_nik(service, batch_size):
+    ai_service, niks = service
+    results = asyncio.run(ai_service.analyze_batch_async(niks[:3] + ["tidak-ada"], batch_size=batch_size))
+    assert set(results) == set(niks[:3]) | {"tidak-ada"}
+    for nik in niks[:3]:
+        assert "Timeout" in results[nik]["error"]
+        assert "0.05 detik" in results[nik]["error"]
+    assert "tidak ditemukan" in results["tidak-ada"]["error"]
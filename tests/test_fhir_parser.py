@@ -0,0 +1,55 @@
+from conftest import make_resources
+from fhir_parser import parse_bundle_file, parse_resources, subject_key
+from ingest import VitalHistory
+
+
+def test_streaming_sama_dengan_json_load(bundle):
+    streamed, refs_stream = parse_bundle_file(bundle, stream=True)
+    loaded, refs_loaded = parse_bundle_file(bundle, stream=False)
+    assert len(streamed) == 60
+    assert streamed == loaded
+    assert refs_stream == refs_loaded
+
+
+def test_resource_sebelum_patient_tetap_masuk():
+    resources = make_resources(5)
+    patients = [r for r in resources if r["resourceType"] == "Patient"]
+    others = [r for r in resources if r["resourceType"] != "Patient"]
+    expected, _ = parse_resources(resources)
+    reordered, _ = parse_resources(others + patients)
+    assert reordered == expected
+    assert all(record["medis"] and record["tanda_vital"]["bb"] != "-" for record in expected.values())
+
+
+def test_resource_pasien_tidak_dikenal_dibuang():
+    resources = make_resources(2)
+    orphan = dict(resources[1], subject={"reference": "urn:uuid:tidak-ada"})
+    database, _ = parse_resources(resources + [orphan])
+    assert database == parse_resources(resources)[0]
+
+
+def test_alergi_masuk_profil(bundle):
+    database, _ = parse_bundle_file(bundle)
+    assert database["3374000000000000"]["profil"]["alergi"] == ["Penicillin"]
+    assert database["3374000000000001"]["profil"]["alergi"] == []
+
+
+def test_vital_terbaru_menang_walau_tidak_berurutan():
+    resources = make_resources(10)
+    # Observasi dibalik: yang paling lama datang terakhir
+    others = [r for r in resources if r["resourceType"] != "Observation"]
+    observations = [r for r in resources if r["resourceType"] == "Observation"]
+    expected, _ = parse_resources(others + observations, on_vital=VitalHistory().add)
+    reversed_, _ = parse_resources(others + observations[::-1], on_vital=VitalHistory().add)
+    assert reversed_ == expected
+    # Bundle menaruh pengukuran terbaru lebih dulu
+    newest = next(r for r in observations if r["code"]["coding"][0]["code"] == "29463-7")
+    nik = "3374000000000000"
+    assert expected[nik]["tanda_vital"]["bb"] == f"{newest['valueQuantity']['value']} kg"
+
+
+def test_subject_key_persis():
+    uuid = "0f8fad5b-d9cb-469f-a165-70867728950e"
+    key = subject_key(f"urn:uuid:{uuid}")
+    assert key == subject_key(f"Patient/{uuid}") == subject_key(uuid) == bytes.fromhex(uuid.replace("-", ""))
+    assert subject_key("Patient/abc") == "abc"
@@ -0,0 +1,36 @@
+import json
+
+from fhir_parser import parse_bundle_file
+from generate_dataset import write_dataset
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_seed_sama_hasil_sama_berapa_pun_worker(tmp_path):
+    one, _ = write_dataset(str(tmp_path / "a.json"), 30, seed=3, workers=1, chunk_size=7)
+    two, _ = write_dataset(str(tmp_path / "b.json"), 30, seed=3, workers=2, chunk_size=11)
+    assert read(one[0]) == read(two[0])
+    other, _ = write_dataset(str(tmp_path / "c.json"), 30, seed=4, workers=1)
+    assert read(other[0]) != read(one[0])
+
+
+def test_bundle_dan_ndjson_berisi_data_yang_sama(tmp_path):
+    bundle, resources = write_dataset(str(tmp_path / "data.json"), 25, workers=1, observations=2)
+    ndjson, resources_nd = write_dataset(str(tmp_path / "data.ndjson"), 25, fmt="ndjson", workers=1, observations=2)
+    assert resources == resources_nd
+    database, _ = parse_bundle_file(bundle[0])
+    assert len(database) == 25
+    assert parse_bundle_file(ndjson[0])[0] == database
+
+
+def test_dataset_per_shard_json_valid(tmp_path):
+    paths, resources = write_dataset(str(tmp_path / "data.json"), 50, workers=1, shards=2, chunk_size=10)
+    assert len(paths) == 2
+    total = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            total += len(json.load(f)["entry"])
+    assert total == resources
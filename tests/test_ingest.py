@@ -0,0 +1,103 @@
+import copy
+
+from ingest import Ingestor, IngestWatcher, PatientOverlay, VitalHistory, write_ndjson
+
+PATIENT = {"resourceType": "Patient", "id": "11111111-1111-1111-1111-111111111111",
+           "identifier": [{"value": "3374000000000001"}], "name": [{"text": "Budi"}]}
+
+
+def test_vital_history_terbaru_menang():
+    history = VitalHistory()
+    assert history.add("1", "tensi", "120/80 mmHg", "2024-03-01T08:00:00+07:00") is True
+    assert history.add("1", "tensi", "150/95 mmHg", "2024-01-01T08:00:00+07:00") is False
+    assert history.add("1", "tensi", "130/85 mmHg", "2024-05-01T08:00:00+07:00") is True
+    # Tanpa timestamp: tidak disimpan, urutan kedatangan yang menang
+    assert history.add("1", "bb", "70 kg", None) is True
+    rows = history.get("1")
+    assert [r["nilai"] for r in rows] == ["150/95 mmHg", "120/80 mmHg", "130/85 mmHg"]
+    assert rows[0]["waktu"] == "2024-01-01T08:00:00+07:00"
+    assert history.get("1", "bb") == []
+    assert history.get("2") == []
+    assert len(history) == 1
+
+
+def test_delta_dari_api_tidak_diterapkan_ulang_watcher(tmp_path):
+    applied = []
+
+    def apply_fn(resources):
+        applied.append(resources)
+        return {"pasien_baru": len(resources), "pasien_diubah": 0, "durasi_ms": 0}
+
+    watcher = IngestWatcher(str(tmp_path), apply_fn)
+    write_ndjson(str(tmp_path), [PATIENT], before_replace=watcher.mark_done)
+    assert watcher.scan() == []
+    assert applied == []
+
+    # File yang ditaruh langsung di folder tetap diterapkan, sekali saja
+    write_ndjson(str(tmp_path), [PATIENT], prefix="manual")
+    assert len(watcher.scan()) == 1
+    assert watcher.scan() == []
+    assert applied == [[PATIENT]]
+
+
+def test_overlay_publish_snapshot_konsisten():
+    overlay = PatientOverlay({"1": {"profil": {"nama": "Lama"}}})
+    assert overlay.publish({"1": {"profil": {"nama": "Baru"}}, "2": {"profil": {"nama": "Dua"}}}) == ["2"]
+    names = overlay.names()
+    assert next(names) == ("1", "Baru")
+    # Publish di tengah iterasi: pembaca tetap memakai snapshot lamanya
+    overlay.publish({"3": {"profil": {"nama": "Tiga"}}})
+    assert list(names) == [("2", "Dua")]
+    assert list(overlay) == ["1", "2", "3"]
+    assert len(overlay) == 3 and overlay["3"]["profil"]["nama"] == "Tiga"
+    assert overlay.base == {"1": {"profil": {"nama": "Lama"}}}
+
+
+def _obs_bb(rid, kg, waktu="2024-03-01T08:00:00+07:00", **extra):
+    return {"resourceType": "Observation", "id": rid, "subject": {"reference": f"urn:uuid:{PATIENT['id']}"},
+            "code": {"coding": [{"code": "29463-7"}]}, "effectiveDateTime": waktu,
+            "valueQuantity": {"value": kg, "unit": "kg"}, **extra}
+
+
+def _resep(rid, obat):
+    return {"resourceType": "MedicationRequest", "id": rid, "subject": {"reference": f"urn:uuid:{PATIENT['id']}"},
+            "medicationCodeableConcept": {"coding": [{"code": "93001", "display": obat}]}}
+
+
+def test_ingest_id_sama_menggantikan_versi_lama():
+    ingestor = Ingestor(PatientOverlay({}))
+    db, nik = ingestor.database, "3374000000000001"
+    # Observasi datang sebelum Patient-nya di delta yang sama
+    summary = ingestor.apply([_obs_bb("new-obs-1", 70), PATIENT, _resep("rx-1", "Amoxicillin")])
+    assert summary["pasien_baru"] == 1 and db[nik]["tanda_vital"]["bb"] == "70 kg"
+
+    # Koreksi berat badan: nilai lama dilepas dari riwayat, bukan ditumpuk
+    summary = ingestor.apply([_obs_bb("new-obs-1", 72)])
+    assert summary["diperbarui"] == 1 and summary["duplikat"] == 0
+    assert db[nik]["tanda_vital"]["bb"] == "72 kg"
+    assert [r["nilai"] for r in ingestor.history.get(nik, "bb")] == ["72 kg"]
+
+    # Resep diganti, tidak digandakan
+    ingestor.apply([_resep("rx-1", "Paracetamol")])
+    assert [m["obat"] for m in db[nik]["medis"]] == ["Paracetamol"]
+
+    # Profil diperbarui, tanda vital & obat tetap
+    renamed = copy.deepcopy(PATIENT)
+    renamed["name"] = [{"text": "Budi Santoso"}]
+    summary = ingestor.apply([renamed])
+    assert summary["diperbarui"] == 1 and summary["pasien_diubah"] == 1
+    assert db[nik]["profil"]["nama"] == "Budi Santoso" and db[nik]["tanda_vital"]["bb"] == "72 kg"
+
+    # Kiriman ulang identik dilewati
+    summary = ingestor.apply([renamed, _resep("rx-1", "Paracetamol")])
+    assert summary["duplikat"] == 2 and summary["nik"] == []
+    assert [m["obat"] for m in db[nik]["medis"]] == ["Paracetamol"]
+
+
+def test_ingest_versi_usang_dilewati():
+    ingestor = Ingestor(PatientOverlay({}))
+    baru = _obs_bb("obs-2", 80, meta={"lastUpdated": "2024-03-02T00:00:00+07:00"})
+    lama = _obs_bb("obs-2", 60, meta={"lastUpdated": "2024-03-01T00:00:00+07:00"})
+    summary = ingestor.apply([PATIENT, baru, lama])
+    assert summary["usang"] == 1
+    assert ingestor.database["3374000000000001"]["tanda_vital"]["bb"] == "80 kg"
@@ -0,0 +1,130 @@
+import os
+import shutil
+
+import pytest
+
+from fhir_parser import parse_bundle_file
+from ingest import PatientRefs, VitalHistory
+from patient_index import (SAMPLE_BLOCK, SAMPLE_SPREAD, build_index, history_path, index_paths,
+                           open_compiled_index)
+
+
+@pytest.fixture
+def source(bundle, tmp_path):
+    path = str(tmp_path / "bundle.json")
+    shutil.copy(bundle, path)
+    build_index(path)
+    return path
+
+
+def test_index_sama_dengan_parse_runtime(source):
+    # Parsing runtime: timestamp terbaru yang menang, riwayat & referensi UUID ikut
+    history = VitalHistory()
+    database, uuid_to_nik = parse_bundle_file(source, on_vital=history.add)
+    index = open_compiled_index(source)
+    assert index is not None
+    assert len(index) == len(database)
+    assert sorted(index) == sorted(database)
+    compiled = index.history()
+    refs = index.refs()
+    for nik, record in database.items():
+        assert index[nik] == record
+        assert compiled.get(nik) == history.get(nik)
+    for ref, nik in uuid_to_nik.items():
+        assert refs.resolve({"reference": ref}) == nik
+    assert refs.resolve({"reference": "urn:uuid:00000000-0000-0000-0000-000000000000"}) is None
+    assert "tidak-ada" not in index
+    assert index.get("tidak-ada") is None
+
+
+def test_riwayat_index_bisa_ditambah(source):
+    index = open_compiled_index(source)
+    history = index.history()
+    nik = next(iter(index))
+    before = len(history.get(nik, "bb"))
+    assert history.add(nik, "bb", "99 kg", "2030-01-01T00:00:00+07:00") is True
+    assert history.add(nik, "bb", "50 kg", "2000-01-01T00:00:00+07:00") is False
+    assert len(history.get(nik, "bb")) == before + 2
+    assert history.get(nik, "bb")[-1]["nilai"] == "99 kg"
+    # Baris dari file (mmap) ikut bisa dilepas lewat remove
+    oldest = history.get(nik, "bb")[1]
+    assert history.remove(nik, "bb", oldest["nilai"], oldest["waktu"]) is True
+    assert len(history.get(nik, "bb")) == before + 1
+    # File .hist tidak ikut berubah
+    assert len(open_compiled_index(source).history().get(nik, "bb")) == before
+
+
+def test_mtime_berubah_isi_sama_tetap_valid(source):
+    os.utime(source, ns=(0, 0))
+    index = open_compiled_index(source)
+    assert index is not None and not index.verified
+    assert index.verify(source) is True
+    # mtime baru tercatat: start berikutnya tanpa hash
+    assert open_compiled_index(source).verified
+
+
+def test_file_dari_build_berbeda_ditolak(source, tmp_path):
+    idx_path, rec_path = index_paths(source)
+    shutil.copy(rec_path, tmp_path / "lama.rec")
+    build_index(source)
+    assert open_compiled_index(source) is not None
+    # Rebuild yang baru setengah di-rename: .rec lama, .idx/.hist baru
+    shutil.copy(tmp_path / "lama.rec", rec_path)
+    assert open_compiled_index(source) is None
+    build_index(source)
+    os.remove(history_path(idx_path))
+    assert open_compiled_index(source) is None
+
+
+def test_ukuran_berubah_index_basi(source):
+    with open(source, "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert open_compiled_index(source) is None
+
+
+def test_edit_ukuran_sama_terdeteksi(bundle, tmp_path):
+    # Data diapit spasi 2 MB: bagian tengah file di luar sampel startup
+    with open(bundle, "rb") as f:
+        original = b" " * (2 << 20) + f.read() + b" " * (2 << 20)
+    source = str(tmp_path / "besar.json")
+
+    writes = []
+
+    def write(data):
+        # mtime selalu berbeda dari yang tercatat di index
+        writes.append(data)
+        with open(source, "wb") as f:
+            f.write(data)
+        os.utime(source, ns=(0, len(writes) * 10**9))
+
+    def digit_after(data, start):
+        return next(i for i in range(start, len(data)) if chr(data[i]).isdigit())
+
+    def edit(pos):
+        data = bytearray(original)
+        data[pos] = ord("1") if data[pos] != ord("1") else ord("2")
+        return bytes(data)
+
+    write(original)
+    build_index(source)
+    # Edit di salah satu blok sampel: langsung ditolak saat dibuka
+    spots = [len(original) * i // (SAMPLE_SPREAD + 1) for i in range(1, SAMPLE_SPREAD + 1)]
+    sampled = next(pos for spot in spots for pos in range(spot, spot + SAMPLE_BLOCK) if chr(original[pos]).isdigit())
+    write(edit(sampled))
+    assert open_compiled_index(source) is None
+    # Edit di tengah: lolos sampel, ketahuan sha256 penuh (verify) dan index
+    # tidak dipakai lagi sampai di-build ulang
+    write(edit(digit_after(original, len(original) // 2)))
+    index = open_compiled_index(source)
+    assert index is not None and not index.verified
+    assert index.verify(source) is False
+    assert open_compiled_index(source) is None
+
+
+def test_patient_refs_fallback():
+    refs = PatientRefs({"urn:uuid:11111111-1111-1111-1111-111111111111": "A"},
+                       fallback=lambda key: "B" if key == "pasien-lain" else None)
+    assert refs.resolve({"reference": "Patient/11111111-1111-1111-1111-111111111111"}) == "A"
+    assert refs.resolve({"reference": "Patient/pasien-lain"}) == "B"
+    assert refs.resolve({"identifier": {"value": "C"}}) == "C"
+    assert refs.resolve({}) is None
@@ -0,0 +1,20 @@
+import json
+
+from fhir_parser import parse_bundle_file
+from patient_record import CompactPatientDB
+
+
+def test_compact_db_round_trip(bundle):
+    database, _ = parse_bundle_file(bundle)
+    original = json.loads(json.dumps(database))
+    db = CompactPatientDB.from_database(database)
+    assert not database  # record dict dilepas saat dikonversi
+    assert len(db) == len(original)
+    assert {nik: db[nik] for nik in db} == original
+    assert "tidak-ada" not in db
+
+
+def test_compact_db_record_tidak_standar_disimpan_apa_adanya():
+    db = CompactPatientDB()
+    db.put("1", {"catatan": "tanpa profil"})
+    assert db["1"] == {"catatan": "tanpa profil"}
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from response_parser import ResponseParseError, ResponseParser, StreamExtractor
+
+HASIL = {"status": "PERINGATAN", "skor_risiko": 60, "ringkasan_pasien": "Pasien hipertensi.",
+         "analisis_obat": "Dua obat antihipertensi.", "rekomendasi": "Pantau tensi."}
+
+
+def test_json_murni():
+    parser = ResponseParser()
+    assert parser.parse(json.dumps(HASIL)) == HASIL
+    assert parser.stats()["langsung_valid"] == 1
+
+
+def test_perbaikan_fence_dan_koma_akhir():
+    text = "Berikut hasilnya:\n```json\n" + json.dumps(HASIL)[:-1] + ",}\n```"
+    parser = ResponseParser()
+    assert parser.parse(text) == HASIL
+    assert parser.stats()["diperbaiki"] == 1
+
+
+def test_normalisasi_status_dan_skor():
+    result = ResponseParser().parse(json.dumps(dict(HASIL, status=" aman ", skor_risiko="75%")))
+    assert result["status"] == "AMAN"
+    assert result["skor_risiko"] == 75
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(HASIL)[:-30],                                  # terpotong
+    json.dumps({k: v for k, v in HASIL.items() if k != "rekomendasi"}),
+    json.dumps(dict(HASIL, status="KRITIS")),
+    "maaf, tidak bisa",
+    None,
+])
+def test_jawaban_tidak_lengkap_ditolak(text):
+    parser = ResponseParser()
+    with pytest.raises(ResponseParseError):
+        parser.parse(text)
+    assert parser.stats()["gagal_parse"] == 1
+
+
+def test_batch_terpotong_menyimpan_item_lengkap():
+    items = [dict(HASIL, nik=str(i)) for i in range(3)]
+    text = json.dumps(items)[:-40]
+    results = ResponseParser().parse_batch(text)
+    assert set(results) == {"0", "1"}
+    assert results["0"]["nik"] == "0"
+
+
+def test_batch_item_tanpa_nik_dibuang():
+    parser = ResponseParser()
+    results = parser.parse_batch(json.dumps([HASIL, dict(HASIL, nik="9")]))
+    assert list(results) == ["9"]
+    assert parser.stats()["batch_item_dibuang"] == 1
+
+
+def test_stream_extractor_mengirim_field_yang_sudah_lengkap():
+    text = json.dumps(HASIL)
+    extractor = StreamExtractor()
+    sent = []
+    for i in range(0, len(text), 7):
+        sent.extend(field for field, _ in extractor.feed(text[i:i + 7]))
+    # Field terakhir baru pasti lengkap setelah divalidasi -> lewat rest()
+    assert sent == list(HASIL)[:-1]
+    assert extractor.rest(HASIL) == [("rekomendasi", HASIL["rekomendasi"])]
@@ -0,0 +1,60 @@
+import pytest
+
+from fhir_parser import parse_bundle_file
+from patient_record import CompactPatientDB
+from search_index import PatientSearchIndex
+
+PASIEN = {
+    "3374010000000001": "Budi Santoso",
+    "3374010000000002": "Siti Aminah",
+    "3374020000000003": "Budi Hartono",
+    "3275010000000004": "Dewi Lestari",
+}
+
+
+@pytest.fixture
+def index():
+    return PatientSearchIndex.build({nik: {"profil": {"nama": nama}} for nik, nama in PASIEN.items()})
+
+
+def niks(results):
+    return [r["nik"] for r in results]
+
+
+def test_nama_dan_prefix(index):
+    assert set(niks(index.search("budi"))) == {"3374010000000001", "3374020000000003"}
+    assert niks(index.search("budi hart")) == ["3374020000000003"]
+    assert niks(index.search("dew")) == ["3275010000000004"]
+
+
+def test_prefix_nik_dan_campuran(index):
+    assert niks(index.search("33740")) == ["3374010000000001", "3374010000000002", "3374020000000003"]
+    assert niks(index.search("budi 337402")) == ["3374020000000003"]
+
+
+def test_salah_ketik(index):
+    assert "3374010000000002" in niks(index.search("sitti"))
+
+
+def test_query_kosong_dan_limit(index):
+    assert len(index.search("", limit=2)) == 2
+    assert index.search("tidakada") == []
+
+
+@pytest.mark.parametrize("query", ["!!!", "-", " ?? ", "..."])
+def test_query_tanda_baca_saja(index, query):
+    assert index.search(query) == []
+
+
+def test_update_pasien_baru(index):
+    index.update({"3374990000000005": {"profil": {"nama": "Joko Wijaya"}}})
+    assert niks(index.search("joko")) == ["3374990000000005"]
+
+
+def test_index_dari_record_ringkas(bundle):
+    database, _ = parse_bundle_file(bundle)
+    siti = sorted(nik for nik, record in database.items() if "Siti" in record["profil"]["nama"])
+    index = PatientSearchIndex.build(CompactPatientDB.from_database(database))
+    assert sorted(niks(index.search("siti", limit=100))) == siti
+    assert niks(index.search("pasien 33740000000000")) == [f"33740000000000{i:02d}" for i in range(60)][:20]
+    assert index.stats()["pasien"] == 60
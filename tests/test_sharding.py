@@ -0,0 +1,91 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import router
+from fhir_parser import parse_bundle_file
+from rule_engine import RuleEngine
+from sharding import ShardSpec, shard_of
+from vital_store import VitalStore
+
+
+def test_shard_of_stabil_dan_membagi_semua_nik():
+    niks = [f"3374{i:012d}" for i in range(200)]
+    specs = [ShardSpec(i, 3) for i in range(3)]
+    for nik in niks:
+        assert sum(spec.owns(nik) for spec in specs) == 1
+        assert shard_of(nik, 3) == shard_of(nik, 3)
+    assert shard_of("123", 1) == 0
+    assert ShardSpec().keep() is None
+
+
+def test_shard_spec_tidak_valid():
+    with pytest.raises(ValueError):
+        ShardSpec(3, 3)
+
+
+def test_parser_hanya_memuat_pasien_milik_shard(bundle):
+    full, _ = parse_bundle_file(bundle)
+    parts = [parse_bundle_file(bundle, keep=ShardSpec(i, 2).keep())[0] for i in range(2)]
+    assert parts[0] and parts[1] and not set(parts[0]) & set(parts[1])
+    assert {**parts[0], **parts[1]} == full
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.data, self.status_code, self.ok = data, status_code, status_code < 400
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture
+def shards(bundle, monkeypatch):
+    # Dua shard palsu: router memanggil VitalStore masing-masing, bukan HTTP
+    engine = RuleEngine()
+    stores = {f"http://shard{i}": VitalStore.build(parse_bundle_file(bundle, keep=ShardSpec(i, 2).keep())[0], engine)
+              for i in range(2)}
+
+    def forward(base, method, path, params=None, **kwargs):
+        params = dict(params or {})
+        store = stores[base]
+        if path == "/population/histogram":
+            value_range = (float(params["lo"]), float(params["hi"])) if "lo" in params else None
+            return FakeResponse(store.histogram(params.get("field", "bmi"), bins=int(params.get("bins", 20)),
+                                                value_range=value_range))
+        if path == "/population/top-risk":
+            return FakeResponse(store.top_k(int(params.get("k", 20)), by=params.get("by", "skor")))
+        return FakeResponse({"status": "siap"})
+
+    monkeypatch.setattr(router, "SHARD_URLS", list(stores))
+    monkeypatch.setattr(router, "forward", forward)
+    full = VitalStore.build(parse_bundle_file(bundle)[0], engine)
+    return TestClient(router.app), full
+
+
+def test_router_menggabung_query_populasi(shards):
+    client, full = shards
+    merged = client.get("/population/histogram", params={"field": "bb", "bins": 7}).json()
+    lo, hi = merged["edges"][0], merged["edges"][-1]
+    assert merged["counts"] == full.histogram("bb", bins=7, value_range=(lo - 0.005, hi + 0.005))["counts"]
+    assert merged["jumlah"] == full.histogram("bb")["jumlah"]
+
+    top = client.get("/population/top-risk", params={"k": 5, "by": "sistole"}).json()
+    assert [row["sistole"] for row in top["pasien"]] == [row["sistole"] for row in full.top_k(5, by="sistole")["pasien"]]
+    assert client.get("/population/graph/neighbors", params={"jenis": "obat", "id": "x"}).status_code == 501
+
+
+def test_router_ready_503_kalau_shard_mati(monkeypatch):
+    # Port 9 (discard) tidak didengarkan: koneksi langsung ditolak
+    monkeypatch.setattr(router, "SHARD_URLS", ["http://127.0.0.1:9"])
+    response = TestClient(router.app).get("/ready")
+    assert response.status_code == 503
+    assert response.json()["shard"]["http://127.0.0.1:9"]["status"] == "tidak terhubung"
+
+
+def test_merge_metrics_label_shard():
+    text = ('# HELP healthbridge_x contoh\n# TYPE healthbridge_x counter\nhealthbridge_x{mode="a"} 1\n'
+            'healthbridge_y 2\n')
+    merged = router.merge_metrics({0: text, 1: text}).splitlines()
+    assert merged.count("# TYPE healthbridge_x counter") == 1
+    assert merged[2:4] == ['healthbridge_x{shard="0",mode="a"} 1', 'healthbridge_x{shard="1",mode="a"} 1']
+    assert 'healthbridge_y{shard="1"} 2' in merged
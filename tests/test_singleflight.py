@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_singleflight_satu_panggilan_untuk_key_sama():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "hasil"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+    threads[0].start()
+    started.wait()
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["hasil"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"leaders": 1, "deduplicated": 4, "inflight": 0}
+
+
+def test_singleflight_error_tidak_di_cache():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("gagal")
+
+    with pytest.raises(RuntimeError):
+        flight.do("k", fail)
+    assert flight.do("k", lambda: 1) == 1
+
+
+def test_async_singleflight_tahan_cancel():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "hasil"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        first.cancel()  # client pertama putus, yang lain tetap dapat hasil
+        return await second
+
+    assert asyncio.run(run()) == "hasil"
+    assert len(calls) == 1
+    assert flight.stats()["inflight"] == 0
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+import threading
+
+from fastapi.testclient import TestClient
+
+from benchmark.bench_startup import HEAVY_MODULES, import_times
+from conftest import AI_DIR
+
+# Batas longgar (mesin CI lambat); import ai_service biasanya ~200-300 ms
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+
+def test_import_tanpa_modul_berat():
+    code = ("import sys, main, api_client; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=AI_DIR, capture_output=True, text=True,
+                            env=dict(os.environ, FILENAME="tidak-ada.json"))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+
+
+def test_importtime_ai_service():
+    # python -X importtime -c "import ai_service": kumulatif per modul (ms)
+    times = import_times("import ai_service")
+    assert "ai_service" in times
+    assert times["ai_service"] < IMPORT_BUDGET_MS
+    assert not [m for m in times if m in HEAVY_MODULES]
+
+
+def test_endpoint_data_503_sampai_siap(monkeypatch):
+    import ai_service
+    import main
+    # Tanpa `with`: lifespan (load data) tidak dijalankan
+    monkeypatch.setattr(ai_service, "_ready", threading.Event())
+    client = TestClient(main.app)
+    assert client.get("/").status_code == 200
+    response = client.get("/analyze/3374010000000001")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/ready").status_code == 503
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fhir_parser import parse_bundle_file
+from llm_limiter import LLMLimiter
+from result_cache import ResultCache
+from stub_model import STUB_RESULT, StubResponse
+
+
+class SlowModel:
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(10)
+
+
+class FailingModel:
+    async def generate_content_async(self, prompt, **kwargs):
+        raise RuntimeError("kuota habis")
+
+
+class BrokenStreamModel:
+    # Stream menjawab bukan JSON, panggilan biasa menjawab benar
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        self.prompts.append((stream, prompt))
+        if stream:
+            return self._chunks()
+        return StubResponse(json.dumps(STUB_RESULT))
+
+    async def _chunks(self):
+        yield StubResponse("maaf, saya tidak bisa")
+
+
+@pytest.fixture
+def service(bundle, monkeypatch):
+    import ai_service
+    database, _ = parse_bundle_file(bundle)
+    ready = threading.Event()
+    ready.set()
+    monkeypatch.setattr(ai_service, "_ready", ready)
+    monkeypatch.setattr(ai_service, "DATABASE_CACHE", database)
+    monkeypatch.setattr(ai_service, "RULE_ENGINE_MODE", "off")
+    monkeypatch.setattr(ai_service, "RESULT_CACHE", ResultCache(0))
+    monkeypatch.setattr(ai_service, "LLM_LIMITER", LLMLimiter(4, 16, 1))
+    monkeypatch.setattr(ai_service, "LLM_TIMEOUT", 0.05)
+    return ai_service, list(database)
+
+
+@pytest.mark.parametrize("model, nik, status", [
+    (SlowModel(), None, 504),
+    (FailingModel(), None, 502),
+    (FailingModel(), "tidak-ada", 404),
+])
+def test_stream_error_pertama_jadi_status_http(service, monkeypatch, model, nik, status):
+    ai_service, niks = service
+    import main
+    monkeypatch.setattr(ai_service, "model", model)
+    response = TestClient(main.app).get(f"/analyze/{nik or niks[0]}/stream")
+    assert response.status_code == status
+
+
+def test_stream_rusak_diulang_tanpa_prepare_ulang(service, monkeypatch):
+    ai_service, niks = service
+    model = BrokenStreamModel()
+    monkeypatch.setattr(ai_service, "model", model)
+    monkeypatch.setattr(ai_service, "RULE_STATS", {"diputus_aturan": 0, "ke_llm": 0})
+
+    async def collect():
+        return [event async for event in ai_service.analyze_patient_risk_stream(niks[0])]
+
+    events = asyncio.run(collect())
+    assert events[-1] == ("done", STUB_RESULT)
+    # Satu kali ke LLM menurut statistik; ulangan memakai prompt yang sama + pengingat format
+    assert ai_service.RULE_STATS["ke_llm"] == 1
+    (_, streamed), (stream, retried) = model.prompts
+    assert stream is False and retried == streamed + ai_service.RETRY_NOTE